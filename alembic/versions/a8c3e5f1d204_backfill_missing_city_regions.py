@@ -0,0 +1,29 @@
+"""Backfill missing city regions
+
+Revision ID: a8c3e5f1d204
+Revises: f4b81d2c6e57
+Create Date: 2026-10-19 00:47:31.840226
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a8c3e5f1d204'
+down_revision: Union[str, None] = 'f4b81d2c6e57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Same as `DEFAULT_REGION`, the cities of unlisted countries were imported without one.
+    cities = sa.table('cities', sa.column('region', sa.String()))
+    op.execute(cities.update().where(cities.c.region.is_(None)).values(region='Other'))
+
+
+def downgrade() -> None:
+    # The backfilled regions are valid before this revision too.
+    pass
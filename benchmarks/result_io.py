@@ -0,0 +1,135 @@
+"""
+Measures how much saving and reading task results delays the event loop.
+
+A probe coroutine sleeps for 1ms in a loop and records by how much it oversleeps, while
+`--tasks` results of `--regions` x `--cities` cities are saved and read concurrently, first with
+blocking file I/O on the event loop (as before), then with `save_task_result` and
+`read_task_region_result` offloaded to threads.
+
+Usage:
+    PYTHONPATH=$(pwd) python benchmarks/result_io.py --tasks 20 --regions 7 --cities 2000
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List
+
+from src.api.service import save_task_result
+from src.config import get_settings
+from src.result_segments import REGIONS, get_task_file_path, read_task_region_result
+
+settings = get_settings()
+
+PROBE_INTERVAL = 0.001
+
+
+def make_task_result(regions: int, cities: int) -> Dict[str, List[Dict]]:
+    return {
+        region: [
+            {"city": f"City{city}", "temp": 10.5, "description": "scattered clouds"}
+            for city in range(cities)
+        ]
+        for region in sorted(REGIONS)[:regions]
+    }
+
+
+async def blocking_save_task_result(task_id: str, task_result: Dict) -> None:
+    for region, region_data in task_result.items():
+        file_path = get_task_file_path(region, task_id)
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(file_path, "w") as file:
+            json.dump(region_data, file)
+
+
+async def blocking_read_task_region_result(task_id: str, region: str) -> List[Dict]:
+    with open(get_task_file_path(region, task_id), "r") as file:
+        return json.load(file)
+
+
+async def offloaded_read_task_region_result(task_id: str, region: str) -> List[Dict]:
+    return await asyncio.to_thread(read_task_region_result, task_id, region)
+
+
+async def probe_event_loop(lags: List[float], stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        started_at = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append(time.perf_counter() - started_at - PROBE_INTERVAL)
+
+
+async def run(
+    name: str,
+    save: Callable[[str, Dict], Awaitable],
+    read: Callable[[str, str], Awaitable],
+    tasks: int,
+    regions: int,
+    cities: int,
+) -> None:
+    task_result = make_task_result(regions, cities)
+    lags: List[float] = []
+    stop = asyncio.Event()
+    probe = asyncio.create_task(probe_event_loop(lags, stop))
+
+    started_at = time.perf_counter()
+    await asyncio.gather(
+        *(save(f"{name}-{task}", json.loads(json.dumps(task_result))) for task in range(tasks))
+    )
+    await asyncio.gather(
+        *(
+            read(f"{name}-{task}", region)
+            for task in range(tasks)
+            for region in task_result
+        )
+    )
+    elapsed = time.perf_counter() - started_at
+
+    stop.set()
+    await probe
+
+    lags_ms = sorted(lag * 1000 for lag in lags)
+    print(
+        f"{name:>10}: {elapsed:.2f}s total, event loop lag "
+        f"p50={statistics.median(lags_ms):.2f}ms "
+        f"p99={lags_ms[int(len(lags_ms) * 0.99)]:.2f}ms "
+        f"max={lags_ms[-1]:.2f}ms over {len(lags_ms)} probes"
+    )
+
+
+async def main(tasks: int, regions: int, cities: int) -> None:
+    with tempfile.TemporaryDirectory() as weather_data_dir:
+        settings.WEATHER_DATA_DIR = Path(weather_data_dir)
+        await run(
+            "blocking",
+            blocking_save_task_result,
+            blocking_read_task_region_result,
+            tasks,
+            regions,
+            cities,
+        )
+        await run(
+            "offloaded",
+            save_task_result,
+            offloaded_read_task_region_result,
+            tasks,
+            regions,
+            cities,
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tasks", type=int, default=20)
+    parser.add_argument(
+        "--regions", type=int, default=7, choices=range(1, len(REGIONS) + 1)
+    )
+    parser.add_argument("--cities", type=int, default=2000)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    asyncio.run(main(args.tasks, args.regions, args.cities))
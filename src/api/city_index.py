@@ -0,0 +1,220 @@
+import asyncio
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import Levenshtein
+
+from src.config import get_settings
+from src.database.gazetteer import Gazetteer, get_gazetteer
+from src.log import get_logger
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+GRAM_SIZE = 2
+PADDING = " " * (GRAM_SIZE - 1)
+
+
+def _grams(word: str) -> Dict[str, int]:
+    padded = f"{PADDING}{word}{PADDING}"
+    grams: Dict[str, int] = defaultdict(int)
+    for i in range(len(padded) - GRAM_SIZE + 1):
+        grams[padded[i : i + GRAM_SIZE]] += 1
+    return grams
+
+
+class CityIndex:
+    """
+    Inverted n-gram index over the `city` and `city_ascii` names of the cities table.
+
+    Candidates are generated with the q-gram count filter: two strings within edit
+    distance `k` share at least `max(len_a, len_b) + GRAM_SIZE - 1 - k * GRAM_SIZE`
+    padded n-grams, so a match has to contain at least one of the rarest n-grams of the
+    query (prefix filtering). Only names found in the posting lists of those n-grams,
+    restricted to lengths within `k`, are scored with `Levenshtein.distance`, using the
+    same score as the former linear scan (distance to `city` plus distance to
+    `city_ascii`). The best match is therefore the same whenever its score is within
+    `max_distance`. Equal scores are ranked by `Gazetteer.rank`: the cities matching the
+    country and state/province hints, then the most populous.
+
+    Example:
+        index = CityIndex(await get_gazetteer())
+        index.best_match('Londn')  # {'city': 'London', 'city_ascii': 'London', ...}
+    """
+
+    def __init__(self, gazetteer: Gazetteer):
+        self.gazetteer = gazetteer
+        self._cities: List[int] = []
+        self._name_city: List[int] = []
+        self._postings: Dict[str, Dict[int, List[int]]] = defaultdict(
+            lambda: defaultdict(list)
+        )
+        self._gram_frequency: Dict[str, int] = defaultdict(int)
+        self._names_by_length: Dict[int, List[int]] = defaultdict(list)
+
+        for gazetteer_position, (city, city_ascii) in enumerate(
+            zip(gazetteer.city, gazetteer.city_ascii)
+        ):
+            if not city or not city_ascii:
+                continue
+
+            city_position = len(self._cities)
+            self._cities.append(gazetteer_position)
+
+            for name in {city, city_ascii}:
+                name_position = len(self._name_city)
+                self._name_city.append(city_position)
+                self._names_by_length[len(name)].append(name_position)
+
+                for gram in _grams(name):
+                    self._postings[gram][len(name)].append(name_position)
+                    self._gram_frequency[gram] += 1
+
+        logger.info(
+            f"Built city index for {len(self._cities)} cities ({len(self._name_city)} names)."
+        )
+
+    def __len__(self) -> int:
+        return len(self._cities)
+
+    def _candidates(self, city_name: str, name_distance: int) -> Set[int]:
+        """
+        Returns positions of the cities with at least one name that may lie within
+        `name_distance` edits from `city_name`.
+        """
+        query_length = len(city_name)
+        lengths = range(
+            max(query_length - name_distance, 1), query_length + name_distance + 1
+        )
+
+        # The least number of n-grams shared with any name of an allowed length.
+        required = query_length + GRAM_SIZE - 1 - GRAM_SIZE * name_distance
+
+        name_positions: List[int] = []
+        if required <= 0:
+            for length in lengths:
+                name_positions.extend(self._names_by_length.get(length, ()))
+        else:
+            query_grams = sorted(
+                _grams(city_name).items(),
+                key=lambda item: self._gram_frequency.get(item[0], 0),
+            )
+            # A name sharing `required` of the query n-grams contains at least one of
+            # the `query_gram_count - required + 1` rarest ones.
+            prefix_size = query_length + GRAM_SIZE - 1 - required + 1
+            for gram, count in query_grams:
+                if prefix_size <= 0:
+                    break
+                prefix_size -= count
+
+                postings = self._postings.get(gram)
+                if not postings:
+                    continue
+                for length in lengths:
+                    name_positions.extend(postings.get(length, ()))
+
+        return {self._name_city[name_position] for name_position in name_positions}
+
+    def top_k(
+        self,
+        city_name: str,
+        k: int = 5,
+        max_distance: Optional[int] = None,
+        country: Optional[str] = None,
+        admin_name: Optional[str] = None,
+    ) -> List[Tuple[Dict[str, Any], int]]:
+        """
+        Returns up to `k` cities most similar to `city_name` together with their scores.
+
+        Args:
+            city_name (str): The city name to look up.
+            k (int): Maximal number of matches to return.
+            max_distance (Optional[int]): Maximal score (summed Levenshtein distance to
+                                          `city` and `city_ascii`) of a match. Defaults to
+                                          `CITY_MATCH_MAX_DISTANCE` from the settings.
+            country (Optional[str]): Prefer the cities of this country among equal scores.
+            admin_name (Optional[str]): Prefer the cities of this state or province among equal scores.
+
+        Returns:
+            List[Tuple[Dict[str, Any], int]]: Pairs of city and score, best match first.
+        """
+        if max_distance is None:
+            max_distance = settings.CITY_MATCH_MAX_DISTANCE
+
+        # If the summed distance is within max_distance, one of the two names is
+        # within half of it.
+        candidates = self._candidates(city_name, max_distance // 2)
+
+        scored = []
+        for city_position in candidates:
+            gazetteer_position = self._cities[city_position]
+            distance_city = Levenshtein.distance(
+                self.gazetteer.city[gazetteer_position],
+                city_name,
+                score_cutoff=max_distance,
+            )
+            if distance_city > max_distance:
+                continue
+
+            distance_city_ascii = Levenshtein.distance(
+                self.gazetteer.city_ascii[gazetteer_position],
+                city_name,
+                score_cutoff=max_distance - distance_city,
+            )
+            total_distance = distance_city + distance_city_ascii
+            if total_distance > max_distance:
+                continue
+
+            scored.append(
+                (
+                    total_distance,
+                    self.gazetteer.rank(gazetteer_position, country, admin_name),
+                    city_position,
+                )
+            )
+
+        scored.sort()
+        return [
+            (self.gazetteer.to_dict(self._cities[city_position]), total_distance)
+            for total_distance, _, city_position in scored[:k]
+        ]
+
+    def best_match(
+        self,
+        city_name: str,
+        max_distance: Optional[int] = None,
+        country: Optional[str] = None,
+        admin_name: Optional[str] = None,
+    ) -> Optional[Dict[str, Any]]:
+        matches = self.top_k(
+            city_name,
+            k=1,
+            max_distance=max_distance,
+            country=country,
+            admin_name=admin_name,
+        )
+        if not matches:
+            return None
+        return matches[0][0]
+
+
+_city_index: Optional[CityIndex] = None
+_city_index_lock = asyncio.Lock()
+
+
+async def get_city_index() -> CityIndex:
+    """
+    Returns the process-wide city index, rebuilding it whenever the gazetteer it was
+    built from is reloaded. The index is built off the event loop, once for all the
+    requests waiting for it.
+    """
+    global _city_index
+
+    gazetteer = await get_gazetteer()
+    if _city_index is not None and _city_index.gazetteer is gazetteer:
+        return _city_index
+
+    async with _city_index_lock:
+        if _city_index is None or _city_index.gazetteer is not gazetteer:
+            _city_index = await asyncio.to_thread(CityIndex, gazetteer)
+    return _city_index
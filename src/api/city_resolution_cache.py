@@ -0,0 +1,226 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import redis
+
+from src.config import get_settings
+from src.database.models import normalize_city_name
+from src.log import get_logger
+from src.redis_client import get_redis_client
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+# Cached for the names no city was found for, city ids start at 1.
+UNRESOLVED_CITY_ID = 0
+
+
+class LocalResolutionStore:
+    """
+    In-process LRU of city ids with a TTL per entry, safe to share between threads.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: OrderedDict[str, Tuple[float, int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, int]:
+        now = time.monotonic()
+        city_ids = {}
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                if entry[0] < now:
+                    del self._entries[key]
+                    continue
+                self._entries.move_to_end(key)
+                city_ids[key] = entry[1]
+        return city_ids
+
+    def set_many(self, city_ids: Dict[str, int], ttls: Dict[str, float]) -> None:
+        now = time.monotonic()
+        with self._lock:
+            for key, city_id in city_ids.items():
+                self._entries[key] = (now + ttls[key], city_id)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RedisResolutionStore:
+    """
+    City ids shared by all API processes, one plain Redis key per name, read with a single
+    `MGET` and written with a single pipeline. Entries are bounded by their TTL only.
+    """
+
+    def __init__(self, redis_client: redis.Redis, prefix: str = "city_resolution"):
+        self.redis_client = redis_client
+        self.prefix = prefix
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}:{key}"
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, int]:
+        keys = list(keys)
+        if not keys:
+            return {}
+        values = self.redis_client.mget([self._key(key) for key in keys])
+        return {key: int(value) for key, value in zip(keys, values) if value is not None}
+
+    def set_many(self, city_ids: Dict[str, int], ttls: Dict[str, float]) -> None:
+        pipeline = self.redis_client.pipeline(transaction=False)
+        for key, city_id in city_ids.items():
+            pipeline.set(self._key(key), city_id, px=int(ttls[key] * 1000))
+        pipeline.execute()
+
+
+class CityResolutionCache:
+    """
+    Memoizes which city the requested names resolved to, so the names seen before skip the
+    transliteration, the database lookup and the fuzzy matching.
+
+    Names (with their hints, see `CityQuery.get_cache_key`) are cached by their normalized
+    form and the version of the gazetteer, so a repopulated cities table invalidates all of
+    them. An in-process LRU is checked first, then the optional Redis tier shared by all API
+    processes. Names that resolved to no city are cached too, for the shorter `negative_ttl`.
+
+    Example:
+        cache = get_city_resolution_cache()
+        city_ids = cache.get_many(["Londn", "Киев"], gazetteer.version)
+        print(city_ids)  # Output: {'Londn': 34}, 'Киев' was not cached yet
+    """
+
+    def __init__(
+        self,
+        local_store: LocalResolutionStore,
+        redis_store: Optional[RedisResolutionStore] = None,
+        ttl: float = 86400.0,
+        negative_ttl: Optional[float] = None,
+    ):
+        self.local_store = local_store
+        self.redis_store = redis_store
+        self.ttl = ttl
+        self.negative_ttl = ttl if negative_ttl is None else negative_ttl
+        self.lookups = 0
+        self.local_hits = 0
+        self.redis_hits = 0
+        self._stats_lock = threading.Lock()
+
+    @staticmethod
+    def _key(city_name: str, version: int) -> str:
+        return f"{version}:{normalize_city_name(city_name)}"
+
+    def _get_ttls(self, city_ids: Dict[str, int]) -> Dict[str, float]:
+        return {
+            key: self.negative_ttl if city_id == UNRESOLVED_CITY_ID else self.ttl
+            for key, city_id in city_ids.items()
+        }
+
+    def get_many(self, city_names: Iterable[str], version: int) -> Dict[str, int]:
+        """
+        Returns the cached city id (or `UNRESOLVED_CITY_ID`) of every cached name.
+        """
+        key_map = {self._key(city_name, version): city_name for city_name in city_names}
+        cached_city_ids = self.local_store.get_many(key_map)
+        local_hits = len(cached_city_ids)
+
+        missing_keys: List[str] = [key for key in key_map if key not in cached_city_ids]
+        redis_city_ids: Dict[str, int] = {}
+        if self.redis_store is not None and missing_keys:
+            try:
+                redis_city_ids = self.redis_store.get_many(missing_keys)
+            except redis.RedisError as e:
+                logger.warning(f"Could not read city resolutions from Redis: {e}")
+            if redis_city_ids:
+                self.local_store.set_many(redis_city_ids, self._get_ttls(redis_city_ids))
+                cached_city_ids.update(redis_city_ids)
+
+        with self._stats_lock:
+            self.lookups += len(key_map)
+            self.local_hits += local_hits
+            self.redis_hits += len(redis_city_ids)
+
+        return {key_map[key]: city_id for key, city_id in cached_city_ids.items()}
+
+    def set_many(self, city_ids: Dict[str, Optional[int]], version: int) -> None:
+        """
+        Caches the id of the city every name resolved to, None if it did not resolve.
+        """
+        keyed_city_ids = {
+            self._key(city_name, version): (
+                UNRESOLVED_CITY_ID if city_id is None else city_id
+            )
+            for city_name, city_id in city_ids.items()
+        }
+        ttls = self._get_ttls(keyed_city_ids)
+        self.local_store.set_many(keyed_city_ids, ttls)
+        if self.redis_store is not None:
+            try:
+                self.redis_store.set_many(keyed_city_ids, ttls)
+            except redis.RedisError as e:
+                logger.warning(f"Could not write city resolutions to Redis: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns the hits of both tiers in this process, without any Redis round trip.
+        """
+        with self._stats_lock:
+            hits = self.local_hits + self.redis_hits
+            return {
+                "lookups": self.lookups,
+                "local_hits": self.local_hits,
+                "redis_hits": self.redis_hits,
+                "misses": self.lookups - hits,
+                "hit_rate": round(hits / self.lookups, 3) if self.lookups else 0.0,
+                "size": len(self.local_store),
+            }
+
+
+_city_resolution_cache: Optional[CityResolutionCache] = None
+_city_resolution_cache_lock = threading.Lock()
+
+
+def create_city_resolution_cache() -> CityResolutionCache:
+    redis_store = None
+    if settings.CITY_RESOLUTION_CACHE_REDIS_ENABLED:
+        redis_client = get_redis_client()
+        try:
+            redis_client.ping()
+            redis_store = RedisResolutionStore(redis_client)
+        except redis.RedisError as e:
+            logger.warning(
+                f"Redis is unavailable, caching city resolutions in-process only: {e}"
+            )
+
+    return CityResolutionCache(
+        LocalResolutionStore(settings.CITY_RESOLUTION_CACHE_MAX_SIZE),
+        redis_store,
+        settings.CITY_RESOLUTION_CACHE_TTL,
+        settings.CITY_RESOLUTION_CACHE_NEGATIVE_TTL,
+    )
+
+
+def get_city_resolution_cache() -> Optional[CityResolutionCache]:
+    """
+    Returns the process-wide city resolution cache, or None when `CITY_RESOLUTION_CACHE_ENABLED`
+    is off. Its Redis tier is used with `CITY_RESOLUTION_CACHE_REDIS_ENABLED`, if Redis can be
+    reached.
+    """
+    global _city_resolution_cache
+
+    if not settings.CITY_RESOLUTION_CACHE_ENABLED:
+        return None
+
+    if _city_resolution_cache is None:
+        with _city_resolution_cache_lock:
+            if _city_resolution_cache is None:
+                _city_resolution_cache = create_city_resolution_cache()
+    return _city_resolution_cache
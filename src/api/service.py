@@ -1,12 +1,24 @@
+import asyncio
+import base64
 from collections import defaultdict
 import json
-import Levenshtein
-from typing import List, Dict, Any, Optional
+from typing import AsyncIterator, List, Dict, Any, Optional, Tuple
 from datetime import datetime
 from unidecode import unidecode
 
+from src.api.city_index import CityIndex
+from src.columnar_store import append_results, use_columnar_storage
 from src.config import get_settings
+from src.database.crud import (
+    build_latest_region_results_query,
+    build_region_results_query,
+    get_latest_region_results,
+    get_region_results,
+    stream_results,
+)
+from src.database.models import RESULT_TIME_FORMAT
 from src.log import get_logger
+from src.result_segments import get_task_file_path, write_json
 
 settings = get_settings()
 logger = get_logger(__name__)
@@ -79,97 +91,181 @@ def process_weatherapi_data(data: Dict) -> Dict:
 
 
 async def find_the_most_similar_cities(
-    city_name: str, cities: List[Dict[str, Any]]
+    city_name: str,
+    index: CityIndex,
+    country: Optional[str] = None,
+    admin_name: Optional[str] = None,
 ) -> Optional[Dict[str, Any]]:
     """
-        Finds the most similar city name to the provided city_name from a list of city dictionaries.
+        Finds the most similar city name to the provided city_name using the prebuilt city index.
 
         Args:
-            city_name (str): The city name to compare against the list.
-            city_dicts (List[Dict[str, Any]]): A list of dictionaries, each containing 'city' and 'city_ascii' keys.
+            city_name (str): The city name to compare against the indexed cities.
+            index (CityIndex): The index built over the 'city' and 'city_ascii' names of the cities table.
+            country (Optional[str]): Prefer the cities of this country among equally similar ones.
+            admin_name (Optional[str]): Prefer the cities of this state or province among equally similar ones.
 
         Returns:
-            Dict[str, Any]: The city that is most similar to the provided city name based on Levenshtein distance.
+            Dict[str, Any]: The city that is most similar to the provided city name based on Levenshtein distance,
+                            the most populous one among equally similar cities,
+                            or None if no city is within `CITY_MATCH_MAX_DISTANCE`.
 
         Example:
-            city_dicts = [{'city': 'New York', 'city_ascii': 'New York', ...}, {'city': 'Los Angeles', 'city_ascii': 'Los Angeles', ...}]
-            similar_city = find_most_similar_city('New York', city_dicts)
+            index = CityIndex(await get_gazetteer())
+            similar_city = find_the_most_similar_cities('New Yrok', index)
     print(similar_city)  # Output: {'city': 'New York', 'city_ascii': 'New York', ...}
     """
 
-    most_similar_city = None
-    min_distance = float("inf")
+    # The lookup is CPU-bound, keep it off the event loop.
+    return await asyncio.to_thread(
+        index.best_match, city_name, country=country, admin_name=admin_name
+    )
 
-    for city_dict in cities:
-        city = city_dict.get("city", "")
-        city_ascii = city_dict.get("city_ascii", "")
 
-        if not city or not city_ascii:
-            continue
+async def save_task_result(task_id: str, task_result: Dict) -> Dict[str, str]:
+    current_time_str = datetime.now().strftime(RESULT_TIME_FORMAT)
+    for region_data in task_result.values():
+        for i in range(len(region_data)):
+            region_data[i]["time"] = current_time_str
 
-        distance_city = Levenshtein.distance(city, city_name)
-        distance_city_ascii = Levenshtein.distance(city_ascii, city_name)
+    if use_columnar_storage():
+        return await asyncio.to_thread(append_results, task_id, task_result)
 
-        total_distance = distance_city + distance_city_ascii
+    async def save_region_result(region: str, region_data: List[Dict]) -> Tuple[str, str]:
+        file_path = get_task_file_path(region, task_id)
+        await asyncio.to_thread(write_json, file_path, region_data)
+        logger.info(
+            f"Data of task: {task_id} for region: {region} were saved into: {file_path}."
+        )
+        return region, str(file_path)
 
-        if total_distance < min_distance:
-            min_distance = total_distance
-            most_similar_city = city_dict
+    # The files are written atomically off the event loop, all regions at once.
+    region_paths = await asyncio.gather(
+        *(
+            save_region_result(region, region_data)
+            for region, region_data in task_result.items()
+        )
+    )
+    return dict(region_paths)
 
-    return most_similar_city
 
+class InvalidCursorError(ValueError):
+    pass
 
-async def save_task_result(task_id: str, task_result: Dict) -> Dict[str, str]:
-    settings.WEATHER_DATA_DIR.mkdir(parents=True, exist_ok=True)
 
-    region_path_map = {}
-    for region, region_data in task_result.items():
-        region_path = settings.WEATHER_DATA_DIR / region
-        region_path.mkdir(parents=True, exist_ok=True)
+def encode_results_cursor(cursor: Dict[str, Any]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(cursor).encode()).decode()
 
-        file_path = region_path / f"task_{task_id}.json"
 
-        current_time = datetime.now()
-        current_time_str = current_time.strftime("%Y-%m-%d %H:%M:%S")
+def decode_results_cursor(cursor: str) -> Dict[str, Any]:
+    try:
+        decoded_cursor = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursorError(f"Invalid cursor: {cursor}") from e
+    if not isinstance(decoded_cursor, dict):
+        raise InvalidCursorError(f"Invalid cursor: {cursor}")
+    return decoded_cursor
 
-        for i in range(len(region_data)):
-            region_data[i]["time"] = current_time_str
 
-        with open(file_path, "w") as file:
-            json.dump(region_data, file)
+async def read_region_results(
+    region_name: str,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    city: Optional[str] = None,
+    latest: bool = False,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """
+    Reads a page of the saved results of the region from the `weather_results` table.
+
+    Args:
+        region_name (str): The region to read the results for.
+        since (Optional[datetime]): Only results fetched at or after this time.
+        until (Optional[datetime]): Only results fetched before this time.
+        city (Optional[str]): Only results of this city.
+        latest (bool): Only the latest result of every city.
+        cursor (Optional[str]): The cursor returned with the previous page.
+        limit (Optional[int]): Maximal number of results in the page.
+
+    Returns:
+        Tuple[Optional[Dict[str, Any]], Optional[str]]: The results of every city, oldest first,
+            or None if there are none, and the cursor of the next page, or None if this is the last one.
+
+    Raises:
+        InvalidCursorError: If the cursor can not be decoded or does not point at a result.
+    """
+    after: Optional[Tuple[datetime, int]] = None
+    after_city: Optional[str] = None
+    if cursor:
+        decoded_cursor = decode_results_cursor(cursor)
+        try:
+            if latest:
+                after_city = decoded_cursor["city"]
+                if not isinstance(after_city, str):
+                    raise TypeError(f"City of the cursor is not a string: {after_city}")
+            else:
+                after = (
+                    datetime.fromisoformat(decoded_cursor["fetched_at"]),
+                    int(decoded_cursor["id"]),
+                )
+        except (KeyError, TypeError, ValueError) as e:
+            raise InvalidCursorError(f"Invalid cursor: {cursor}") from e
+
+    page_size = None if limit is None else limit + 1
+    if latest:
+        results = await get_latest_region_results(
+            region_name, since, until, city, after_city, page_size
+        )
+    else:
+        results = await get_region_results(
+            region_name, since, until, city, after, page_size
+        )
 
-        logger.info(
-            f"Data of task: {task_id} for region: {region} were saved into: {file_path}."
+    next_cursor = None
+    if limit is not None and len(results) > limit:
+        results = results[:limit]
+        last_result = results[-1]
+        next_cursor = encode_results_cursor(
+            {"city": last_result.city}
+            if latest
+            else {
+                "fetched_at": last_result.fetched_at.isoformat(),
+                "id": last_result.id,
+            }
         )
-        region_path_map[region] = str(file_path)
 
-    return region_path_map
+    if not results:
+        return None, None
 
+    data: Dict[str, List[Dict[str, Any]]] = {}
+    for result in results:
+        data.setdefault(result.city, []).append(result.to_dict())
+    return data, next_cursor
 
-async def read_task_data_from_directory(
+
+async def stream_region_results(
     region_name: str,
-) -> Optional[Dict[str, Any]]:
-    data = {}
-    files_dir = settings.WEATHER_DATA_DIR / region_name
-
-    if not files_dir.exists() or not files_dir.is_dir():
-        return
-
-    for file in files_dir.glob("*.json"):
-        with open(file, "r") as json_file:
-            file_data = json.load(json_file)
-
-            if isinstance(file_data, list):
-                for fd in file_data:
-                    if fd["city"] not in data:
-                        data[fd["city"]] = []
-                    data[fd["city"]].append(
-                        {key: value for key, value in fd.items() if key != "city"}
-                    )
-            else:
-                logger.info(f"{file.name} does not contain suitable data.")
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    city: Optional[str] = None,
+    latest: bool = False,
+) -> AsyncIterator[str]:
+    """
+    Yields the saved results of the region as NDJSON, one line per city observation, as they
+    are read from the `weather_results` table. Takes the same filters as `read_region_results`.
+
+    Example:
+        async for line in stream_region_results("Europe", latest=True):
+            print(line)  # Output: {"city": "Kyiv", "temp": 1.5, "description": "Sunny", "time": "..."}
+    """
+    if latest:
+        query = build_latest_region_results_query(region_name, since, until, city)
+    else:
+        query = build_region_results_query(region_name, since, until, city)
 
-    return data
+    async for result in stream_results(query, settings.RESULTS_STREAM_BATCH_SIZE):
+        yield json.dumps({"city": result.city, **result.to_dict()}) + "\n"
 
 
 async def process_non_latin_word(city_name: str) -> str:
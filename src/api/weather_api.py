@@ -1,30 +1,51 @@
-from celery.result import AsyncResult
-from fastapi import APIRouter, HTTPException
+import asyncio
+from datetime import datetime
+import hashlib
+import json
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from enum import Enum
+from pydantic import BaseModel, ConfigDict
+from uuid import uuid4
 
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional, Union
 import regex as re
 
+from src.api.city_index import get_city_index
+from src.api.city_resolution_cache import (
+    UNRESOLVED_CITY_ID,
+    get_city_resolution_cache,
+)
+from src.columnar_store import (
+    RESULT_COLUMNS,
+    read_results,
+    read_task_results,
+    use_columnar_storage,
+)
 from src.api.service import (
+    InvalidCursorError,
     find_the_most_similar_cities,
     process_non_latin_word,
-    read_task_data_from_directory,
-    save_task_result,
+    read_region_results,
+    stream_region_results,
 )
 from src.database.crud import (
     create_task,
-    get_all_cities,
-    get_city_by_name,
+    get_region_results,
     get_task_by_id,
-    update_task,
 )
+from src.database.models import Task
+from src.config import get_settings
 from src.tasks import (
-    celery_app,
-    fetch_weather_data_for_cities,
-    fetch_weatherapi_data_for_cities,
+    fetch_data_for_cities,
+    get_task_metrics,
+    get_task_progress,
 )
+from src.result_segments import REGIONS, read_task_region_result
+from src.task_events import get_task_event_broker
 from src.log import get_logger
 
+settings = get_settings()
 logger = get_logger(__name__)
 
 weather_router = APIRouter(tags=["weather"])
@@ -35,82 +56,394 @@ class Sources(str, Enum):
     weatherapi = "weather_api"
 
 
+class ResultsFormat(str, Enum):
+    json = "json"
+    ndjson = "ndjson"
+    parquet = "parquet"
+
+
+class CityQuery(BaseModel):
+    """
+    A requested city with optional hints, used to pick among the cities sharing its name.
+    """
+
+    model_config = ConfigDict(frozen=True)
+
+    city: str
+    country: Optional[str] = None
+    admin_name: Optional[str] = None
+
+    def get_cache_key(self) -> str:
+        if self.country is None and self.admin_name is None:
+            return self.city
+        return f"{self.city}|{self.country or ''}|{self.admin_name or ''}"
+
+
 @weather_router.post("/weather")
-async def request_weather(cities: List[str], source: Sources):
-    # Allow only letters (don't allow numbers and special symbols)
-    for city in cities:
-        if not re.match(r"^[\p{L} ]+$", city):
+async def request_weather(
+    cities: List[Union[str, CityQuery]],
+    source: Sources,
+    secondary_source: Optional[Sources] = None,
+):
+    """
+    Starts fetching the weather of the cities. A city is either a name or an object like
+    `{"city": "Paris", "country": "United States", "admin_name": "Tennessee"}`: the optional
+    `country` and `admin_name` (state or province) hints pick among the cities sharing the
+    name, like Paris, Texas and Paris, Tennessee, the most populous one is used otherwise.
+    """
+    city_queries = [
+        city if isinstance(city, CityQuery) else CityQuery(city=city) for city in cities
+    ]
+
+    # Allow only letters and the separators of names like "Нью-Йорк" or "L'Aquila"
+    # (don't allow numbers and special symbols)
+    for city_query in city_queries:
+        if not re.match(r"^\p{L}[\p{L} '\-]*$", city_query.city):
             raise HTTPException(
                 status_code=400,
-                detail=f"'{city}' contains invalid characters. Only letters and spaces are allowed.",
+                detail=f"'{city_query.city}' contains invalid characters. Only letters, spaces, hyphens and apostrophes are allowed.",
             )
 
-    all_cities = [city.to_dict() for city in await get_all_cities()]
+    city_index = await get_city_index()
+    gazetteer = city_index.gazetteer
+    resolution_cache = get_city_resolution_cache()
+    semaphore = asyncio.Semaphore(settings.CITY_RESOLUTION_CONCURRENCY)
 
-    async def fetch_city_data(city_name: str) -> Optional[Dict]:
+    async def transliterate_city_name(city_name: str) -> str:
         if not all(
             "a" <= city_name_letter.lower() <= "z" for city_name_letter in city_name
         ):
             logger.info(f"City: {city_name} has non-latin letters. Converting.")
             city_name = await process_non_latin_word(city_name)
             logger.info(f"Was converted into {city_name}")
+        return city_name
 
-        city_db = await get_city_by_name(city_name)
-        if city_db:
-            logger.info(f"Found city {city_name} in database.")
-            return city_db.to_dict()
-
-        city_db = await find_the_most_similar_cities(city_name, all_cities)
+    async def fetch_similar_city_data(
+        city_name: str, city_query: CityQuery
+    ) -> Optional[Dict]:
+        async with semaphore:
+            city_db = await find_the_most_similar_cities(
+                city_name, city_index, city_query.country, city_query.admin_name
+            )
         if city_db:
             logger.info(
-                f"Found city with similar name to {city_name} - {city_db["city"]}"
+                f"Found city with similar name to {city_name} - {city_db['city']}"
             )
-            return city_db
+        return city_db
+
+    # Every distinct city is resolved once: cities resolved by earlier requests from the
+    # resolution cache, then exact names and aliases from the precomputed candidates of the
+    # in-memory gazetteer, the rest with concurrent fuzzy lookups.
+    unique_city_queries = list(dict.fromkeys(city_queries))
+
+    city_db_map: Dict[CityQuery, Optional[Dict]] = {}
+    if resolution_cache is not None:
+        cache_key_map = {
+            city_query.get_cache_key(): city_query for city_query in unique_city_queries
+        }
+        cached_city_ids = await asyncio.to_thread(
+            resolution_cache.get_many, cache_key_map, gazetteer.version
+        )
+        for cache_key, city_id in cached_city_ids.items():
+            if city_id == UNRESOLVED_CITY_ID:
+                city_db_map[cache_key_map[cache_key]] = None
+                continue
+            position = gazetteer.find_id(city_id)
+            if position is not None:
+                city_db_map[cache_key_map[cache_key]] = gazetteer.to_dict(position)
+    uncached_city_queries = [
+        city_query for city_query in unique_city_queries if city_query not in city_db_map
+    ]
+
+    normalized_city_map = {
+        city_query: await transliterate_city_name(city_query.city)
+        for city_query in uncached_city_queries
+    }
+
+    # Localized and historical names come from the city aliases, ranked together with the
+    # exact names so a hinted alias wins over an unhinted name, before falling back to fuzzy matching.
+    for city_query, city_name in normalized_city_map.items():
+        position = gazetteer.find_name_or_alias(
+            (city_name, city_query.city), city_query.country, city_query.admin_name
+        )
+        if position is not None:
+            logger.info(f"Found city {city_query.city} in database.")
+            city_db_map[city_query] = gazetteer.to_dict(position)
+
+    unresolved_city_queries = [
+        city_query
+        for city_query in uncached_city_queries
+        if city_query not in city_db_map
+    ]
+    similar_cities = await asyncio.gather(
+        *(
+            fetch_similar_city_data(normalized_city_map[city_query], city_query)
+            for city_query in unresolved_city_queries
+        )
+    )
+    city_db_map.update(zip(unresolved_city_queries, similar_cities))
+
+    if resolution_cache is not None and uncached_city_queries:
+        await asyncio.to_thread(
+            resolution_cache.set_many,
+            {
+                city_query.get_cache_key(): (
+                    city_db_map[city_query]["id"] if city_db_map[city_query] else None
+                )
+                for city_query in uncached_city_queries
+            },
+            gazetteer.version,
+        )
 
     cities_from_db = []
-    for city in cities:
-        city_db = await fetch_city_data(city)
+    for city_query in city_queries:
+        city_db = city_db_map.get(city_query)
         if city_db:
             logger.info(f"City {city_db["city"]} was found.")
             cities_from_db.append(city_db)
             continue
-        logger.info(f"Could not find {city} in database.")
+        logger.info(f"Could not find {city_query.city} in database.")
         continue
 
-    if source is Sources.open_weather:
-        task = fetch_weather_data_for_cities.delay(cities_from_db)  # type: ignore
-    elif source is Sources.weatherapi:
-        task = fetch_weatherapi_data_for_cities.delay(cities_from_db)  # type: ignore
-    await create_task(task.id, {"status": "running", "results": None})
+    if secondary_source is source:
+        secondary_source = None
+
+    # The row is created first, so the worker always finds it when the results are saved.
+    task_id = str(uuid4())
+    await create_task(task_id, {"status": "running", "results": None})
+    fetch_data_for_cities(
+        source.value,
+        cities_from_db,
+        secondary_source.value if secondary_source else None,
+        task_id=task_id,
+    )
 
-    logger.info(f"TASK ID: {task.id}")
+    logger.info(f"TASK ID: {task_id}")
 
-    return task.id
+    return task_id
+
+
+@weather_router.get("/stats/city-resolution-cache")
+async def request_city_resolution_cache_stats() -> Dict[str, Any]:
+    """
+    Returns the lookups and hits of the city resolution cache of this API process.
+    """
+    resolution_cache = get_city_resolution_cache()
+    if resolution_cache is None:
+        raise HTTPException(status_code=404, detail="City resolution cache is disabled.")
+    return resolution_cache.stats()
+
+
+def get_etag(content: Any) -> str:
+    payload = json.dumps(content, sort_keys=True, default=str).encode()
+    return f'"{hashlib.sha1(payload).hexdigest()}"'
+
+
+def get_task_status(task_db: Task) -> Dict[str, Any]:
+    if task_db.status == "complete":
+        task_status = {"status": "complete", "results": task_db.results or {}}
+        if task_db.metrics:
+            task_status["metrics"] = task_db.metrics
+        return task_status
+    # Failures are written to the row by the `mark_task_failed` errback.
+    if task_db.status == "failed":
+        return {"status": "failed", "results": None}
+
+    task_status = {"status": "running", "results": None}
+    progress = get_task_progress(task_db.id)
+    if progress:
+        task_status["progress"] = progress
+    metrics = get_task_metrics(task_db.id)
+    if metrics:
+        task_status["metrics"] = metrics
+    return task_status
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Weak comparison of the `If-None-Match` header, "*" or a list of (possibly weak) tags, with the ETag.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(
+        tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(",")
+    )
+
+
+def format_task_event(task_status: Dict[str, Any]) -> str:
+    return f"event: {task_status['status']}\ndata: {json.dumps(task_status)}\n\n"
 
 
 @weather_router.get("/tasks/{task_id}")
-async def request_task(task_id: str) -> Optional[Dict]:
-    task = AsyncResult(task_id, app=celery_app)
+async def request_task(task_id: str, request: Request, response: Response):
+    """
+    Returns the status of the task as stored by the worker, without any side effects.
+    Polling clients can send the last `ETag` back in `If-None-Match` to get a `304`
+    while nothing has changed.
+    """
     task_db = await get_task_by_id(task_id)
     if not task_db:
         raise HTTPException(status_code=404, detail="Task not found")
-    if task.ready():
-        await update_task(task_id, {"status": "complete", "results": task.result})
-        region_path_map = await save_task_result(task_id, task.result)
-        return {"status": "complete", **region_path_map}
-    elif task.failed():
-        await update_task(task_id, {"status": "failed"})
-        return {"status": "failed", "results": None}
 
-    return {"status": "running", "results": None}
+    task_status = get_task_status(task_db)
+    etag = get_etag(task_status)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    response.headers.update(headers)
+    return task_status
+
+
+@weather_router.get("/tasks/{task_id}/events")
+async def stream_task_events(task_id: str, request: Request) -> StreamingResponse:
+    """
+    Streams the status of the task as Server-Sent Events: the current status first, then
+    every progress update pushed by the workers, until the task completes or fails.
+    """
+    task_db = await get_task_by_id(task_id)
+    if not task_db:
+        raise HTTPException(status_code=404, detail="Task not found")
+
+    broker = get_task_event_broker()
+    # Subscribe before reading the status, so no event is missed in between.
+    queue = await broker.subscribe(task_id)
+
+    async def events():
+        try:
+            task_status = get_task_status(await get_task_by_id(task_id) or task_db)
+            yield format_task_event(task_status)
+
+            while task_status["status"] == "running":
+                try:
+                    task_status = await asyncio.wait_for(
+                        queue.get(), timeout=settings.TASK_EVENTS_KEEPALIVE_INTERVAL
+                    )
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    # The row is checked again, in case the final event was missed.
+                    task_db_now = await get_task_by_id(task_id)
+                    if task_db_now is not None and task_db_now.status != "running":
+                        task_status = get_task_status(task_db_now)
+                        yield format_task_event(task_status)
+                        return
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_task_event(task_status)
+        finally:
+            broker.unsubscribe(task_id, queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@weather_router.get("/tasks/{task_id}/results/{region}")
+async def request_task_region_result(task_id: str, region: str) -> List[Dict]:
+    """
+    Returns the results of the task for the region, whether its file was compacted or not,
+    or from the columnar store.
+    """
+    if region not in REGIONS:
+        raise HTTPException(status_code=404, detail=f"{region} was not found.")
+
+    region_data = await asyncio.to_thread(read_task_region_result, task_id, region)
+    if region_data is None and use_columnar_storage():
+        region_data = await asyncio.to_thread(read_task_results, task_id, region)
+    if region_data is None:
+        raise HTTPException(
+            status_code=404, detail=f"Results of {task_id} for {region} were not found."
+        )
+    return region_data
 
 
 @weather_router.get("/results/{region}")
-async def request_region_results(region: str) -> Dict:
-    region_data = await read_task_data_from_directory(region)
+async def request_region_results(
+    region: str,
+    response: Response,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    city: Optional[str] = None,
+    latest: bool = False,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=settings.RESULTS_MAX_PAGE_SIZE),
+    format: ResultsFormat = ResultsFormat.json,
+    columns: Optional[List[str]] = Query(None),
+):
+    """
+    Returns the results of the region grouped by city. With `latest`, only the latest result
+    of every city is returned.
+
+    Without `cursor` and `limit`, all the results are returned as before. Otherwise a page of
+    at most `limit` (`RESULTS_PAGE_SIZE` by default) results is returned and, if there are more
+    results, the cursor of the next page is sent in the `X-Next-Cursor` header.
+
+    With `format=ndjson`, all the matching results are streamed instead, one observation per
+    line, as they are read from the database. `cursor` and `limit` do not apply then.
+
+    With `format=parquet`, the matching results are read from the columnar store (only with
+    `RESULTS_STORAGE_BACKEND=parquet`) and returned as a Parquet file with the requested
+    `columns`. `cursor` and `limit` do not apply either.
+    """
+    if region not in REGIONS:
+        raise HTTPException(status_code=404, detail=f"{region} was not found.")
+
+    if format is ResultsFormat.parquet:
+        if not use_columnar_storage():
+            raise HTTPException(
+                status_code=400, detail="Columnar results storage is not enabled."
+            )
+        unknown_columns = set(columns or []) - set(RESULT_COLUMNS)
+        if unknown_columns:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown columns: {', '.join(sorted(unknown_columns))}.",
+            )
+
+        region_frame = await asyncio.to_thread(
+            read_results, region, since, until, city, latest, columns
+        )
+        if region_frame.empty:
+            logger.info(f"{region} does not exist or is empty.")
+            raise HTTPException(
+                status_code=404, detail=f"{region} was not found or is empty."
+            )
+        return Response(
+            content=region_frame.to_parquet(index=False),
+            media_type="application/vnd.apache.parquet",
+        )
+
+    if format is ResultsFormat.ndjson:
+        if not await get_region_results(region, since, until, city, limit=1):
+            logger.info(f"{region} does not exist or is empty.")
+            raise HTTPException(
+                status_code=404, detail=f"{region} was not found or is empty."
+            )
+        return StreamingResponse(
+            stream_region_results(region, since, until, city, latest),
+            media_type="application/x-ndjson",
+        )
+
+    if cursor is not None and limit is None:
+        limit = settings.RESULTS_PAGE_SIZE
+
+    try:
+        region_data, next_cursor = await read_region_results(
+            region, since, until, city, latest, cursor, limit
+        )
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     if region_data is None:
         logger.info(f"{region} does not exist or is empty.")
         raise HTTPException(
             status_code=404, detail=f"{region} was not found or is empty."
         )
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return region_data
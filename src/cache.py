@@ -0,0 +1,285 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+import redis
+
+from src.config import get_settings
+from src.log import get_logger
+from src.redis_client import get_redis_client
+from src.single_flight import RedisLock, SingleFlight
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+
+def get_coordinates_cache_key(provider: str, lat: float, lng: float) -> str:
+    precision = settings.WEATHER_CACHE_COORDINATE_PRECISION
+    return f"{provider}:{round(lat, precision)}:{round(lng, precision)}"
+
+
+def get_query_cache_key(provider: str, query: str) -> str:
+    return f"{provider}:q:{query.strip().lower()}"
+
+
+class LocalWeatherCache:
+    """
+    In-process LRU cache of provider responses with a TTL, safe to share between the
+    fetch threads of one worker.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, Tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+
+class RedisWeatherCache:
+    """
+    Provider response cache shared by all Celery workers.
+
+    Values are stored as JSON strings expiring after the TTL. A sorted set keeps the last
+    access time of every key, so the least recently used entries are dropped once the
+    cache holds more than `max_size` of them. Hit and miss counters are shared too.
+    """
+
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        max_size: int,
+        ttl: float,
+        prefix: str = "weather_cache",
+    ):
+        self.redis_client = redis_client
+        self.max_size = max_size
+        self.ttl = ttl
+        self.prefix = prefix
+        self._lru_key = f"{prefix}:lru"
+        self._stats_key = f"{prefix}:stats"
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}:{key}"
+
+    def peek(self, key: str) -> Optional[Any]:
+        """
+        Returns the cached value without counting a hit or a miss.
+        """
+        value = self.redis_client.get(self._key(key))
+        if value is None:
+            return None
+        return json.loads(value)
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self.redis_client.get(self._key(key))
+
+        pipeline = self.redis_client.pipeline(transaction=False)
+        if value is None:
+            pipeline.hincrby(self._stats_key, "misses", 1)
+        else:
+            pipeline.hincrby(self._stats_key, "hits", 1)
+            pipeline.zadd(self._lru_key, {key: time.time()})
+        pipeline.execute()
+
+        if value is None:
+            return None
+        return json.loads(value)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        now = time.time()
+
+        pipeline = self.redis_client.pipeline(transaction=False)
+        pipeline.set(self._key(key), json.dumps(value), px=int(ttl * 1000))
+        pipeline.zadd(self._lru_key, {key: now})
+        pipeline.zremrangebyscore(self._lru_key, "-inf", now - self.ttl)
+        pipeline.zcard(self._lru_key)
+        size = pipeline.execute()[-1]
+
+        if size > self.max_size:
+            evicted = self.redis_client.zpopmin(self._lru_key, size - self.max_size)
+            if evicted:
+                self.redis_client.delete(*(self._key(k) for k, _ in evicted))
+
+    def stats(self) -> Dict[str, int]:
+        stats = self.redis_client.hgetall(self._stats_key)
+        return {
+            "hits": int(stats.get("hits", 0)),
+            "misses": int(stats.get("misses", 0)),
+            "size": self.redis_client.zcard(self._lru_key),
+        }
+
+
+WeatherCache = Union[LocalWeatherCache, RedisWeatherCache]
+
+
+_weather_cache: Optional[WeatherCache] = None
+_weather_cache_lock = threading.Lock()
+
+
+def create_weather_cache() -> WeatherCache:
+    max_size = settings.WEATHER_CACHE_MAX_SIZE
+    ttl = settings.WEATHER_CACHE_TTL
+
+    if settings.WEATHER_CACHE_BACKEND == "redis":
+        redis_client = get_redis_client()
+        try:
+            redis_client.ping()
+            return RedisWeatherCache(redis_client, max_size, ttl)
+        except redis.RedisError as e:
+            logger.warning(f"Redis cache is unavailable, using in-process cache: {e}")
+
+    return LocalWeatherCache(max_size, ttl)
+
+
+def get_weather_cache() -> Optional[WeatherCache]:
+    """
+    Returns the cache configured by `WEATHER_CACHE_BACKEND` ("redis" or "memory"), falling
+    back to the in-process cache when Redis cannot be reached, or None when caching is disabled.
+    """
+    global _weather_cache
+
+    if not settings.WEATHER_CACHE_ENABLED:
+        return None
+
+    if _weather_cache is None:
+        with _weather_cache_lock:
+            if _weather_cache is None:
+                _weather_cache = create_weather_cache()
+    return _weather_cache
+
+
+_single_flight = SingleFlight()
+
+
+def read_cache(cache: WeatherCache, key: str) -> Optional[Any]:
+    try:
+        return cache.get(key)
+    except redis.RedisError as e:
+        logger.warning(f"Could not read {key} from cache: {e}")
+        return None
+
+
+def write_cache(
+    cache: WeatherCache, key: str, value: Any, ttl: Optional[float] = None
+) -> None:
+    try:
+        cache.set(key, value, ttl)
+    except redis.RedisError as e:
+        logger.warning(f"Could not write {key} to cache: {e}")
+
+
+def get_cached(key: str) -> Optional[Any]:
+    cache = get_weather_cache()
+    if cache is None:
+        return None
+    return read_cache(cache, key)
+
+
+def set_cached(key: str, value: Any) -> None:
+    cache = get_weather_cache()
+    if cache is not None:
+        write_cache(cache, key, value)
+
+
+def fetch_and_cache(
+    cache: WeatherCache, key: str, fetch: Callable[[], Tuple[Any, bool]]
+) -> Any:
+    lock = None
+    if settings.WEATHER_COALESCE_ACROSS_WORKERS and isinstance(
+        cache, RedisWeatherCache
+    ):
+        lock = RedisLock(
+            cache.redis_client, key, settings.WEATHER_COALESCE_LOCK_TIMEOUT
+        )
+        try:
+            if not lock.acquire():
+                logger.info(f"{key} is being fetched by another worker, waiting.")
+                value = lock.wait_for(
+                    lambda: cache.peek(key), settings.WEATHER_COALESCE_POLL_INTERVAL
+                )
+                if value is not None:
+                    return value
+                lock = None
+        except redis.RedisError as e:
+            logger.warning(f"Could not coalesce {key} across workers: {e}")
+            lock = None
+
+    try:
+        value, cacheable = fetch()
+        if cacheable:
+            write_cache(cache, key, value)
+        return value
+    finally:
+        if lock is not None:
+            try:
+                lock.release()
+            except redis.RedisError as e:
+                logger.warning(f"Could not release the lock of {key}: {e}")
+
+
+def get_or_fetch(key: str, fetch: Callable[[], Tuple[Any, bool]]) -> Any:
+    """
+    Returns the cached value for the key, or calls `fetch` and caches its value if it
+    reports it as cacheable.
+
+    Concurrent misses for the same key within the worker share one `fetch` call. With
+    `WEATHER_COALESCE_ACROSS_WORKERS` and the Redis cache, a short Redis lock also lets
+    only one worker fetch the key while the others wait for it to be cached.
+
+    Args:
+        key (str): Cache key, see `get_coordinates_cache_key` and `get_query_cache_key`.
+        fetch (Callable[[], Tuple[Any, bool]]): Returns the value and whether it may be cached.
+
+    Returns:
+        Any: The cached or fetched value.
+    """
+    cache = get_weather_cache()
+    if cache is None:
+        return _single_flight.do(key, lambda: fetch()[0])
+
+    value = read_cache(cache, key)
+    if value is not None:
+        logger.info(f"Cache hit for {key}.")
+        return value
+
+    return _single_flight.do(key, lambda: fetch_and_cache(cache, key, fetch))
+
+
+def log_weather_cache_stats() -> None:
+    cache = get_weather_cache()
+    if cache is None:
+        return
+
+    try:
+        logger.info(f"Weather cache stats: {cache.stats()}")
+    except redis.RedisError as e:
+        logger.warning(f"Could not read cache stats: {e}")
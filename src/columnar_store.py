@@ -0,0 +1,307 @@
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+from uuid import uuid4
+
+import pandas as pd
+
+from src.config import get_settings
+from src.database.models import RESULT_TIME_FORMAT
+from src.log import get_logger
+from src.result_segments import read_json, validate_region, write_atomically, write_json
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = ds = pq = None
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+# Names the files being merged into a compacted one, the dataset readers skip it.
+COMPACTION_MANIFEST_NAME = "_compaction.json"
+
+RESULT_COLUMNS = (
+    "task_id",
+    "city",
+    "fetched_at",
+    "temp",
+    "description",
+    "code",
+    "message",
+)
+
+
+def get_result_schema() -> "pa.Schema":
+    return pa.schema(
+        [
+            ("task_id", pa.string()),
+            ("city", pa.string()),
+            ("fetched_at", pa.timestamp("s")),
+            ("temp", pa.float64()),
+            ("description", pa.string()),
+            ("code", pa.int64()),
+            ("message", pa.string()),
+        ]
+    )
+
+
+def get_date_partitioning() -> "ds.Partitioning":
+    return ds.partitioning(pa.schema([("date", pa.string())]), flavor="hive")
+
+
+@lru_cache
+def warn_pyarrow_missing() -> None:
+    logger.warning("pyarrow is not installed, storing results as JSON files.")
+
+
+def use_columnar_storage() -> bool:
+    """
+    Whether results are stored as Parquet, which needs the optional `pyarrow` package.
+    """
+    if settings.RESULTS_STORAGE_BACKEND != "parquet":
+        return False
+    if pa is None:
+        warn_pyarrow_missing()
+        return False
+    return True
+
+
+def parse_code(code: Any) -> Optional[int]:
+    """
+    Returns the error code of a result as an integer, providers send some of them as strings (e.g. "404").
+    """
+    try:
+        return int(code)
+    except (TypeError, ValueError):
+        return None
+
+
+def get_region_dir(region: str) -> Path:
+    return settings.COLUMNAR_DATA_DIR / f"region={validate_region(region)}"
+
+
+def write_table(table: "pa.Table", file_path: Path) -> None:
+    write_atomically(file_path, lambda file: pq.write_table(table, file))
+
+
+def append_results(
+    task_id: str, region_city_temp_map: Dict[str, List[Dict[str, Any]]]
+) -> Dict[str, str]:
+    """
+    Appends the results of a task to the Parquet files partitioned by region and date, as
+    `<COLUMNAR_DATA_DIR>/region=<region>/date=<YYYY-MM-DD>/part-<task_id>.parquet`.
+
+    Args:
+        task_id (str): The id of the task the results belong to.
+        region_city_temp_map (Dict[str, List[Dict[str, Any]]]): The results grouped by region,
+                                                                every city with a "time" field.
+
+    Returns:
+        Dict[str, str]: The path of the written file of every region.
+    """
+    schema = get_result_schema()
+
+    region_path_map = {}
+    for region, region_data in region_city_temp_map.items():
+        frame = pd.DataFrame(
+            [
+                {
+                    "task_id": task_id,
+                    "city": city_data["city"],
+                    "fetched_at": pd.to_datetime(city_data["time"]),
+                    "temp": city_data.get("temp"),
+                    "description": city_data.get("description"),
+                    "code": parse_code(city_data.get("code")),
+                    "message": city_data.get("message"),
+                }
+                for city_data in region_data
+            ],
+            columns=RESULT_COLUMNS,
+        )
+        if frame.empty:
+            continue
+
+        for date, date_frame in frame.groupby(frame["fetched_at"].dt.date):
+            file_path = (
+                get_region_dir(region) / f"date={date.isoformat()}" / f"part-{task_id}.parquet"
+            )
+            write_table(
+                pa.Table.from_pandas(date_frame, schema=schema, preserve_index=False),
+                file_path,
+            )
+            logger.info(
+                f"Data of task: {task_id} for region: {region} were saved into: {file_path}."
+            )
+            region_path_map[region] = str(file_path)
+
+    return region_path_map
+
+
+def finish_compaction(partition_dir: Path) -> None:
+    """
+    Removes the files merged by an interrupted compaction of the partition if its compacted
+    file was written, otherwise only the manifest of the compaction.
+    """
+    manifest_path = partition_dir / COMPACTION_MANIFEST_NAME
+    manifest = read_json(manifest_path, None)
+    if manifest is None:
+        return
+
+    if (partition_dir / manifest["compacted"]).exists():
+        for file_name in manifest["merged"]:
+            (partition_dir / file_name).unlink(missing_ok=True)
+        logger.info(f"Finished the interrupted compaction of {partition_dir}.")
+    manifest_path.unlink()
+
+
+def compact_partition(partition_dir: Path, min_files: int) -> bool:
+    """
+    Merges the files of a region/date partition into a single file once it has `min_files` or more.
+
+    The merged files are listed in a manifest first, so a compaction interrupted before they
+    are removed is finished by the next one instead of leaving their rows twice.
+
+    Returns:
+        bool: Whether the partition was compacted.
+    """
+    finish_compaction(partition_dir)
+
+    file_paths = sorted(partition_dir.glob("*.parquet"))
+    if len(file_paths) < min_files:
+        return False
+
+    compacted_path = partition_dir / f"compacted-{uuid4().hex}.parquet"
+    manifest_path = partition_dir / COMPACTION_MANIFEST_NAME
+    write_json(
+        manifest_path,
+        {
+            "compacted": compacted_path.name,
+            "merged": [file_path.name for file_path in file_paths],
+        },
+    )
+
+    table = pa.concat_tables(
+        [pq.read_table(file_path, schema=get_result_schema()) for file_path in file_paths]
+    ).sort_by([("fetched_at", "ascending")])
+    write_table(table, compacted_path)
+
+    # Readers may briefly see the rows twice, but never miss them.
+    for file_path in file_paths:
+        file_path.unlink()
+    manifest_path.unlink()
+
+    logger.info(f"Compacted {len(file_paths)} files of {partition_dir}.")
+    return True
+
+
+def compact_results(min_files: Optional[int] = None) -> int:
+    """
+    Compacts every region/date partition with at least `min_files` files.
+    Defaults to `COLUMNAR_COMPACTION_MIN_FILES`.
+
+    Returns:
+        int: The number of compacted partitions.
+    """
+    if min_files is None:
+        min_files = settings.COLUMNAR_COMPACTION_MIN_FILES
+    if pa is None or not settings.COLUMNAR_DATA_DIR.is_dir():
+        return 0
+
+    return sum(
+        compact_partition(partition_dir, min_files)
+        for partition_dir in sorted(settings.COLUMNAR_DATA_DIR.glob("region=*/date=*"))
+        if partition_dir.is_dir()
+    )
+
+
+def read_results(
+    region: str,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    city: Optional[str] = None,
+    latest: bool = False,
+    columns: Optional[Sequence[str]] = None,
+    task_id: Optional[str] = None,
+) -> pd.DataFrame:
+    """
+    Reads the results of the region from the Parquet files. The date partitions outside of
+    `since`/`until` are skipped and the filters are pushed down to the row groups, only the
+    requested columns are read.
+
+    Args:
+        region (str): The region to read the results for.
+        since (Optional[datetime]): Only results fetched at or after this time.
+        until (Optional[datetime]): Only results fetched before this time.
+        city (Optional[str]): Only results of this city.
+        latest (bool): Only the latest result of every city.
+        columns (Optional[Sequence[str]]): The columns to read, all of `RESULT_COLUMNS` by default.
+        task_id (Optional[str]): Only results of this task.
+
+    Returns:
+        pd.DataFrame: The matching results ordered by `fetched_at`, empty if there are none.
+
+    Example:
+        frame = read_results("Europe", since=datetime(2025, 2, 1), columns=["city", "temp"])
+    """
+    columns = list(columns or RESULT_COLUMNS)
+    region_dir = get_region_dir(region)
+    if not region_dir.is_dir():
+        return pd.DataFrame(columns=columns)
+
+    dataset = ds.dataset(
+        region_dir,
+        format="parquet",
+        schema=get_result_schema().append(pa.field("date", pa.string())),
+        partitioning=get_date_partitioning(),
+    )
+
+    expression = None
+    conditions = []
+    if since is not None:
+        conditions.append(ds.field("date") >= since.date().isoformat())
+        conditions.append(ds.field("fetched_at") >= pa.scalar(since, pa.timestamp("s")))
+    if until is not None:
+        conditions.append(ds.field("date") <= until.date().isoformat())
+        conditions.append(ds.field("fetched_at") < pa.scalar(until, pa.timestamp("s")))
+    if city is not None:
+        conditions.append(ds.field("city") == city)
+    if task_id is not None:
+        conditions.append(ds.field("task_id") == task_id)
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+
+    # The ordering and latest mode need a couple of columns that may not have been requested.
+    read_columns = list(dict.fromkeys([*columns, "fetched_at", "city"]))
+    frame = dataset.to_table(columns=read_columns, filter=expression).to_pandas()
+    frame = frame.sort_values("fetched_at", kind="stable")
+    if latest:
+        frame = frame.drop_duplicates("city", keep="last").sort_values("city")
+
+    return frame[columns].reset_index(drop=True)
+
+
+def read_task_results(task_id: str, region: str) -> Optional[List[Dict[str, Any]]]:
+    """
+    Reads the results of a task for a region back in the shape they were saved in.
+
+    Returns:
+        Optional[List[Dict[str, Any]]]: The results of the cities of the region, or None if not found.
+    """
+    frame = read_results(
+        region, columns=[column for column in RESULT_COLUMNS if column != "task_id"], task_id=task_id
+    )
+    if frame.empty:
+        return None
+
+    frame["time"] = frame.pop("fetched_at").dt.strftime(RESULT_TIME_FORMAT)
+    region_data = []
+    for record in frame.to_dict("records"):
+        city_data = {key: value for key, value in record.items() if not pd.isna(value)}
+        if "code" in city_data:
+            city_data["code"] = int(city_data["code"])
+        region_data.append(city_data)
+    return region_data
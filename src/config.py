@@ -8,14 +8,70 @@ class Settings(BaseSettings):
     PROJECT_ROOT: Path = Path(__file__).parent.parent.resolve()
     PROJECT_NAME: str = "Weather API"
     WEATHER_DATA_DIR: Path = PROJECT_ROOT / "weather_data"
+    COLUMNAR_DATA_DIR: Path = PROJECT_ROOT / "weather_data_columnar"
 
     OPEN_WEATHER_API_KEY: str = ""
     WEATHERAPI_API_KEY: str = ""
     SQLITE_DB_NAME: str = "db.sqlite3"
 
+    OPEN_WEATHER_API_URL: str = "https://api.openweathermap.org/data/3.0/onecall"
+    OPEN_WEATHER_CONCURRENCY: int = 10
+    OPEN_WEATHER_TIMEOUT: float = 10.0
+    OPEN_WEATHER_RATE_LIMIT: int = 60
+    OPEN_WEATHER_RATE_LIMIT_BURST: int = 10
+    WEATHERAPI_API_URL: str = "https://api.weatherapi.com/v1/current.json"
+    WEATHERAPI_CONCURRENCY: int = 10
+    WEATHERAPI_TIMEOUT: float = 10.0
+    WEATHERAPI_RATE_LIMIT: int = 0
+    WEATHERAPI_RATE_LIMIT_BURST: int = 10
+    WEATHERAPI_BULK_ENABLED: bool = False
+    WEATHERAPI_BULK_SIZE: int = 50
+    FETCH_TASK_DEADLINE: float = 120.0
+    PROVIDER_MAX_RETRIES: int = 3
+    PROVIDER_BACKOFF_BASE: float = 0.5
+    PROVIDER_BACKOFF_MAX: float = 10.0
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD: int = 5
+    CIRCUIT_BREAKER_RESET_TIMEOUT: float = 30.0
+    RATE_LIMIT_BACKEND: str = "redis"
+    HEDGE_DELAY: float = 2.0
+    HEDGE_MIN_DELAY: float = 0.2
+    HEDGE_PERCENTILE: float = 0.95
+    TASK_FAN_OUT: bool = True
+    TASK_CHUNK_SIZE: int = 50
+    TASK_EVENTS_BACKEND: str = "redis"
+    TASK_EVENTS_KEEPALIVE_INTERVAL: float = 15.0
+    RESULTS_PAGE_SIZE: int = 1000
+    RESULTS_MAX_PAGE_SIZE: int = 10000
+    RESULTS_STREAM_BATCH_SIZE: int = 500
+    RESULTS_STORAGE_BACKEND: str = "json"
+    COLUMNAR_COMPACTION_INTERVAL: float = 3600.0
+    COLUMNAR_COMPACTION_MIN_FILES: int = 8
+    WEATHER_DATA_COMPACTION_INTERVAL: float = 3600.0
+    WEATHER_DATA_COMPACTION_MIN_AGE: float = 3600.0
+    WEATHER_DATA_RETENTION_DAYS: int = 0
+
+    WEATHER_CACHE_ENABLED: bool = True
+    WEATHER_CACHE_BACKEND: str = "redis"
+    WEATHER_CACHE_TTL: float = 600.0
+    WEATHER_CACHE_MAX_SIZE: int = 10000
+    WEATHER_CACHE_COORDINATE_PRECISION: int = 2
+    WEATHER_COALESCE_ACROSS_WORKERS: bool = True
+    WEATHER_COALESCE_LOCK_TIMEOUT: float = 10.0
+    WEATHER_COALESCE_POLL_INTERVAL: float = 0.1
+
     REDIS_BROKER: str = "redis://localhost:6379/0"
     REDIS_BACKEND: str = "redis://localhost:6379/0"
 
+    CITY_MATCH_MAX_DISTANCE: int = 4
+    GAZETTEER_VERSION_CHECK_INTERVAL: float = 30.0
+    CITY_RESOLUTION_CONCURRENCY: int = 16
+    CITY_RESOLUTION_CACHE_ENABLED: bool = True
+    CITY_RESOLUTION_CACHE_REDIS_ENABLED: bool = False
+    CITY_RESOLUTION_CACHE_MAX_SIZE: int = 10000
+    CITY_RESOLUTION_CACHE_TTL: float = 86400.0
+    CITY_RESOLUTION_CACHE_NEGATIVE_TTL: float = 300.0
+    POPULATE_CHUNK_SIZE: int = 5000
+
     @field_validator("REDIS_BROKER", "REDIS_BACKEND")
     def validate_redis_url(cls, v: str):
         if not v.startswith("redis://"):
@@ -1,10 +1,36 @@
-from typing import Dict, Union, Any, Optional, Sequence, List
+from datetime import datetime
+from typing import (
+    Any,
+    AsyncIterator,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
 
-from sqlalchemy import Insert, Result, Select, Update, insert, select, update
+from sqlalchemy import (
+    Insert,
+    Result,
+    Select,
+    Update,
+    func,
+    insert,
+    select,
+    update,
+)
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database.db import AsyncSessionLocal
-from src.database.models import City, Task
+from src.database.gazetteer import get_gazetteer
+from src.database.models import (
+    RESULT_TIME_FORMAT,
+    City,
+    Task,
+    WeatherResult,
+)
 
 
 async def execute(
@@ -82,9 +108,9 @@ async def fetch_all(
 
 async def get_city_by_name(city_name: str) -> Optional[City]:
     """
-    Fetches a city row from the database based on a case-insensitive match of the provided city name.
+    Fetches a city from the in-memory gazetteer based on a case-insensitive match of the provided city name.
     The function searches for the city name in both the `city` and `city_ascii` columns,
-    returning the first match found.
+    returning the most populous match.
 
     Args:
         city_name (str): The name of the city to search for in the database.
@@ -99,17 +125,11 @@ async def get_city_by_name(city_name: str) -> Optional[City]:
         else:
             print("City not found.")
     """
-    city_name_lower = city_name.lower()
-    query = (
-        select(City)
-        .filter(
-            (City.city.ilike(city_name_lower))
-            | (City.city_ascii.ilike(city_name_lower))
-        )
-        .limit(1)
-    )
-    city_row = await fetch_one(query)
-    return city_row
+    gazetteer = await get_gazetteer()
+    position = gazetteer.find(city_name)
+    if position is None:
+        return None
+    return gazetteer.to_city(position)
 
 
 async def get_all_cities() -> List[City]:
@@ -118,7 +138,10 @@ async def get_all_cities() -> List[City]:
 
 async def create_task(task_id: str, task_data: Dict[str, Any]):
     query = insert(Task).values(
-        id=task_id, status=task_data["status"], results=task_data["results"]
+        id=task_id,
+        status=task_data["status"],
+        results=task_data["results"],
+        metrics=task_data.get("metrics"),
     )
     await execute_query(query)
 
@@ -133,6 +156,214 @@ async def update_task(task_id: str, task_data: Dict[str, Any]):
     query = (
         update(Task)
         .where(Task.id == task_id)
-        .values(status=task_data["status"], results=task_data["results"])
+        .values(
+            status=task_data["status"],
+            results=task_data["results"],
+            metrics=task_data.get("metrics"),
+        )
     )
     await execute_query(query)
+
+
+async def add_weather_results(
+    task_id: str,
+    region_city_temp_map: Dict[str, List[Dict[str, Any]]],
+    fetched_at: Optional[datetime] = None,
+):
+    """
+    Adds the results of a task to the `weather_results` table, one row per city.
+
+    Args:
+        task_id (str): The id of the task the results belong to.
+        region_city_temp_map (Dict[str, List[Dict[str, Any]]]): The results grouped by region,
+                                                                as written to the result files.
+        fetched_at (Optional[datetime]): Time of the results without a "time" field.
+                                         Defaults to now.
+    """
+    if fetched_at is None:
+        fetched_at = datetime.now()
+
+    rows = []
+    for region, region_data in region_city_temp_map.items():
+        for city_data in region_data:
+            rows.append(
+                {
+                    "task_id": task_id,
+                    "region": region,
+                    "city": city_data["city"],
+                    "fetched_at": (
+                        datetime.strptime(city_data["time"], RESULT_TIME_FORMAT)
+                        if "time" in city_data
+                        else fetched_at
+                    ),
+                    "data": {
+                        key: value
+                        for key, value in city_data.items()
+                        if key not in ("city", "time")
+                    },
+                }
+            )
+
+    if rows:
+        async with AsyncSessionLocal() as session:
+            await session.execute(insert(WeatherResult), rows)
+            await session.commit()
+
+
+def filter_region_results(
+    query: Select,
+    region: str,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    city: Optional[str] = None,
+) -> Select:
+    query = query.where(WeatherResult.region == region)
+    if since is not None:
+        query = query.where(WeatherResult.fetched_at >= since)
+    if until is not None:
+        query = query.where(WeatherResult.fetched_at < until)
+    if city is not None:
+        query = query.where(WeatherResult.city == city)
+    return query
+
+
+def build_region_results_query(
+    region: str,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    city: Optional[str] = None,
+    after: Optional[Tuple[datetime, int]] = None,
+    limit: Optional[int] = None,
+) -> Select:
+    """
+    Builds the query of the results of the region, oldest first, using the (region, fetched_at)
+    and (region, city, fetched_at) indexes.
+
+    Args:
+        region (str): The region to fetch the results for.
+        since (Optional[datetime]): Only results fetched at or after this time.
+        until (Optional[datetime]): Only results fetched before this time.
+        city (Optional[str]): Only results of this city.
+        after (Optional[Tuple[datetime, int]]): The `fetched_at` and `id` of the last result of
+                                                the previous page, only later results are fetched.
+        limit (Optional[int]): Maximal number of results to fetch.
+
+    Returns:
+        Select: The query of the matching results ordered by `fetched_at` and `id`.
+    """
+    query = filter_region_results(select(WeatherResult), region, since, until, city)
+    if after is not None:
+        after_fetched_at, after_id = after
+        query = query.where(
+            (WeatherResult.fetched_at > after_fetched_at)
+            | (
+                (WeatherResult.fetched_at == after_fetched_at)
+                & (WeatherResult.id > after_id)
+            )
+        )
+    return query.order_by(WeatherResult.fetched_at, WeatherResult.id).limit(limit)
+
+
+def build_latest_region_results_query(
+    region: str,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    city: Optional[str] = None,
+    after_city: Optional[str] = None,
+    limit: Optional[int] = None,
+) -> Select:
+    """
+    Builds the query of the latest matching result of every city of the region, ordered by city.
+    Takes the same filters as `build_region_results_query`, `after_city` is the last city of the previous page.
+
+    The latest time of every city of the page is found with `max()` over the (region, city, fetched_at)
+    index, so a page does not cost a scan of the whole history of the region.
+    """
+    latest = filter_region_results(
+        select(
+            WeatherResult.city,
+            func.max(WeatherResult.fetched_at).label("fetched_at"),
+        ),
+        region,
+        since,
+        until,
+        city,
+    )
+    if after_city is not None:
+        latest = latest.where(WeatherResult.city > after_city)
+    latest = (
+        latest.group_by(WeatherResult.city)
+        .order_by(WeatherResult.city)
+        .limit(limit)
+        .subquery()
+    )
+
+    # Several results of a city may share its latest time, the last inserted one is used.
+    latest_ids = (
+        select(func.max(WeatherResult.id).label("id"))
+        .join(
+            latest,
+            (WeatherResult.city == latest.c.city)
+            & (WeatherResult.fetched_at == latest.c.fetched_at),
+        )
+        .where(WeatherResult.region == region)
+        .group_by(WeatherResult.city)
+        .subquery()
+    )
+
+    return (
+        select(WeatherResult)
+        .join(latest_ids, WeatherResult.id == latest_ids.c.id)
+        .order_by(WeatherResult.city)
+    )
+
+
+async def get_region_results(
+    region: str,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    city: Optional[str] = None,
+    after: Optional[Tuple[datetime, int]] = None,
+    limit: Optional[int] = None,
+) -> Sequence[WeatherResult]:
+    return await fetch_all(
+        build_region_results_query(region, since, until, city, after, limit)
+    )
+
+
+async def get_latest_region_results(
+    region: str,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    city: Optional[str] = None,
+    after_city: Optional[str] = None,
+    limit: Optional[int] = None,
+) -> Sequence[WeatherResult]:
+    return await fetch_all(
+        build_latest_region_results_query(region, since, until, city, after_city, limit)
+    )
+
+
+async def stream_results(
+    query: Select, batch_size: int = 500
+) -> AsyncIterator[WeatherResult]:
+    """
+    Yields the results of the query as they are read from the database, `batch_size` rows at a
+    time, so the whole result set is never held in memory.
+
+    Example:
+        async for result in stream_results(build_region_results_query("Europe")):
+            print(result.city)
+    """
+    async with AsyncSessionLocal() as session:
+        results = await session.stream_scalars(
+            query.execution_options(yield_per=batch_size)
+        )
+        async for result in results:
+            yield result
+
+
+async def get_indexed_task_regions() -> Set[Tuple[str, str]]:
+    query = select(WeatherResult.task_id, WeatherResult.region).distinct()
+    result = await execute_query(query)
+    return {(task_id, region) for task_id, region in result.all()}
@@ -0,0 +1,313 @@
+import asyncio
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import select, update
+
+from src.config import get_settings
+from src.database.db import AsyncSessionLocal
+from src.database.models import (
+    City,
+    CityAlias,
+    GazetteerVersion,
+    normalize_city_name,
+)
+from src.log import get_logger
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+CITY_COLUMNS = (
+    "id",
+    "city",
+    "city_ascii",
+    "lat",
+    "lng",
+    "country",
+    "admin_name",
+    "region",
+    "population",
+)
+
+
+class Gazetteer:
+    """
+    Columnar in-memory copy of the cities table.
+
+    Every column is stored as a plain list and a city is addressed by its position,
+    so no ORM object or dict is kept per row. Exact-name and alias lookups go through
+    hash maps from the normalized name to the candidate cities, precomputed in order of
+    importance (most populous first), so an ambiguous name like "Paris" resolves to the
+    best known city unless a country or state/province hint says otherwise.
+
+    Example:
+        gazetteer = await get_gazetteer()
+        position = gazetteer.find("paris", country="United States")
+        if position is not None:
+            print(gazetteer.to_dict(position))
+    """
+
+    __slots__ = (
+        "version",
+        "id",
+        "city",
+        "city_ascii",
+        "lat",
+        "lng",
+        "country",
+        "admin_name",
+        "region",
+        "population",
+        "_by_name",
+        "_by_alias",
+        "_by_id",
+    )
+
+    def __init__(
+        self,
+        rows: Sequence[Sequence[Any]],
+        version: int,
+        aliases: Sequence[Tuple[str, int]] = (),
+    ):
+        self.version = version
+
+        self.id: List[int] = []
+        self.city: List[str] = []
+        self.city_ascii: List[str] = []
+        self.lat: List[float] = []
+        self.lng: List[float] = []
+        self.country: List[str] = []
+        self.admin_name: List[str] = []
+        self.region: List[Optional[str]] = []
+        self.population: List[Optional[int]] = []
+
+        self._by_name: Dict[str, List[int]] = {}
+        self._by_alias: Dict[str, List[int]] = {}
+
+        for position, row in enumerate(rows):
+            for column, value in zip(CITY_COLUMNS, row):
+                getattr(self, column).append(value)
+
+            for name in {
+                normalize_city_name(name)
+                for name in (self.city[position], self.city_ascii[position])
+                if name
+            }:
+                self._by_name.setdefault(name, []).append(position)
+
+        self._by_id: Dict[int, int] = {
+            city_id: position for position, city_id in enumerate(self.id)
+        }
+        for alias_lower, city_id in aliases:
+            position = self._by_id.get(city_id)
+            if position is not None:
+                self._by_alias.setdefault(alias_lower, []).append(position)
+
+        for candidates in (*self._by_name.values(), *self._by_alias.values()):
+            candidates.sort(key=self.rank)
+
+    def __len__(self) -> int:
+        return len(self.id)
+
+    def matches_hints(
+        self,
+        position: int,
+        country: Optional[str] = None,
+        admin_name: Optional[str] = None,
+    ) -> bool:
+        return (
+            country is None
+            or normalize_city_name(self.country[position] or "")
+            == normalize_city_name(country)
+        ) and (
+            admin_name is None
+            or normalize_city_name(self.admin_name[position] or "")
+            == normalize_city_name(admin_name)
+        )
+
+    def rank(
+        self,
+        position: int,
+        country: Optional[str] = None,
+        admin_name: Optional[str] = None,
+    ) -> Tuple[bool, int, int]:
+        """
+        Sort key of a city among the candidates for a name: the cities matching the
+        country and state/province hints first, then the most populous, then the first loaded.
+        """
+        return (
+            not self.matches_hints(position, country, admin_name),
+            -(self.population[position] or 0),
+            position,
+        )
+
+    def _best(
+        self,
+        candidate_lists: Sequence[List[int]],
+        country: Optional[str],
+        admin_name: Optional[str],
+    ) -> Optional[int]:
+        if country is not None or admin_name is not None:
+            matching = [
+                position
+                for candidates in candidate_lists
+                for position in candidates
+                if self.matches_hints(position, country, admin_name)
+            ]
+            if matching:
+                return min(matching, key=self.rank)
+        for candidates in candidate_lists:
+            if candidates:
+                return candidates[0]
+        return None
+
+    def find(
+        self,
+        city_name: str,
+        country: Optional[str] = None,
+        admin_name: Optional[str] = None,
+    ) -> Optional[int]:
+        """
+        Returns the position of the most important city whose `city` or `city_ascii` equals
+        `city_name`, ignoring case. If some of them are in the hinted country and
+        state/province (`admin_name`), the most important of those.
+        """
+        return self._best(
+            [self._by_name.get(normalize_city_name(city_name), [])], country, admin_name
+        )
+
+    def find_id(self, city_id: int) -> Optional[int]:
+        return self._by_id.get(city_id)
+
+    def find_alias(
+        self,
+        city_name: str,
+        country: Optional[str] = None,
+        admin_name: Optional[str] = None,
+    ) -> Optional[int]:
+        """
+        Returns the position of the city with the alternate name `city_name` (see `CityAlias`),
+        picked among several like `find` does.
+        """
+        return self._best(
+            [self._by_alias.get(normalize_city_name(city_name), [])], country, admin_name
+        )
+
+    def find_name_or_alias(
+        self,
+        city_names: Sequence[str],
+        country: Optional[str] = None,
+        admin_name: Optional[str] = None,
+    ) -> Optional[int]:
+        """
+        Returns the position of the city one of `city_names` is the name or an alias of.
+        The most important city matching the hints is picked across the names and the
+        aliases, otherwise the most important city of the first name found, names before aliases.
+
+        Example:
+            position = gazetteer.find_name_or_alias(["Paris"], admin_name="Tennessee")
+        """
+        normalized_names = list(dict.fromkeys(map(normalize_city_name, city_names)))
+        return self._best(
+            [
+                *(self._by_name.get(name, []) for name in normalized_names),
+                *(self._by_alias.get(name, []) for name in normalized_names),
+            ],
+            country,
+            admin_name,
+        )
+
+    def to_dict(self, position: int) -> Dict[str, Any]:
+        return {column: getattr(self, column)[position] for column in CITY_COLUMNS}
+
+    def to_city(self, position: int) -> City:
+        return City(**self.to_dict(position))
+
+
+_gazetteer: Optional[Gazetteer] = None
+_gazetteer_checked_at: float = 0.0
+_gazetteer_lock = asyncio.Lock()
+
+
+async def get_cities_version() -> int:
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            select(GazetteerVersion.version).where(GazetteerVersion.id == 1)
+        )
+        return result.scalar_one_or_none() or 0
+
+
+async def bump_cities_version() -> None:
+    """
+    Marks the cities table as changed, so every process reloads its gazetteer.
+    """
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            update(GazetteerVersion)
+            .where(GazetteerVersion.id == 1)
+            .values(version=GazetteerVersion.version + 1)
+        )
+        if result.rowcount == 0:  # type: ignore
+            session.add(GazetteerVersion(id=1, version=1))
+        await session.commit()
+
+    invalidate_gazetteer()
+
+
+def invalidate_gazetteer() -> None:
+    global _gazetteer_checked_at
+    _gazetteer_checked_at = 0.0
+
+
+async def load_gazetteer(version: int) -> Gazetteer:
+    columns = [getattr(City, column) for column in CITY_COLUMNS]
+    async with AsyncSessionLocal() as session:
+        rows = (
+            await session.execute(select(*columns).order_by(City.id))
+        ).tuples().all()
+        aliases = (
+            await session.execute(
+                select(CityAlias.alias_lower, CityAlias.city_id).order_by(CityAlias.id)
+            )
+        ).tuples().all()
+
+    # Building the name maps of a large table takes a while, keep it off the event loop.
+    gazetteer = await asyncio.to_thread(Gazetteer, rows, version, aliases)
+
+    logger.info(
+        f"Loaded gazetteer version {version} with {len(gazetteer)} cities and {len(aliases)} aliases."
+    )
+    return gazetteer
+
+
+async def get_gazetteer() -> Gazetteer:
+    """
+    Returns the process-wide gazetteer, loading it on first use.
+
+    The version stamp of the cities table is checked at most once per
+    `GAZETTEER_VERSION_CHECK_INTERVAL` seconds and the gazetteer is reloaded when
+    it has changed.
+    """
+    global _gazetteer, _gazetteer_checked_at
+
+    if (
+        _gazetteer is not None
+        and time.monotonic() - _gazetteer_checked_at
+        < settings.GAZETTEER_VERSION_CHECK_INTERVAL
+    ):
+        return _gazetteer
+
+    async with _gazetteer_lock:
+        if (
+            _gazetteer is not None
+            and time.monotonic() - _gazetteer_checked_at
+            < settings.GAZETTEER_VERSION_CHECK_INTERVAL
+        ):
+            return _gazetteer
+
+        version = await get_cities_version()
+        if _gazetteer is None or _gazetteer.version != version:
+            _gazetteer = await load_gazetteer(version)
+        _gazetteer_checked_at = time.monotonic()
+
+    return _gazetteer
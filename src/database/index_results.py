@@ -0,0 +1,73 @@
+import asyncio
+from datetime import datetime
+from pathlib import Path
+
+from src.config import get_settings
+from src.database.crud import add_weather_results, get_indexed_task_regions
+from src.log import get_logger
+from src.result_segments import SEGMENTS_DIR_NAME, read_json
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+
+async def index_result_files(weather_data_dir: Path) -> int:
+    """
+    Adds the result files (and compacted segments) written before the `weather_results` table
+    existed to it. Results of a task and region that are already indexed are skipped, so it is
+    safe to run again.
+
+    Returns:
+        int: The number of indexed files.
+    """
+    if not weather_data_dir.is_dir():
+        return 0
+
+    indexed_task_regions = await get_indexed_task_regions()
+
+    indexed_files = 0
+    for region_path in sorted(weather_data_dir.iterdir()):
+        if not region_path.is_dir():
+            continue
+
+        for file_path in sorted(region_path.glob("task_*.json")):
+            task_id = file_path.stem.removeprefix("task_")
+            if (task_id, region_path.name) in indexed_task_regions:
+                continue
+
+            region_data = await asyncio.to_thread(read_json, file_path, None)
+            if not isinstance(region_data, list):
+                logger.info(f"{file_path.name} does not contain suitable data.")
+                continue
+
+            # Old files have no "time" field, fall back to the time the file was written.
+            fetched_at = datetime.fromtimestamp(file_path.stat().st_mtime)
+            await add_weather_results(
+                task_id, {region_path.name: region_data}, fetched_at
+            )
+            indexed_files += 1
+
+        for segment_path in sorted(
+            (region_path / SEGMENTS_DIR_NAME).glob("segment_*.json")
+        ):
+            segment = await asyncio.to_thread(read_json, segment_path, {})
+
+            fetched_at = datetime.fromtimestamp(segment_path.stat().st_mtime)
+            for task_id, region_data in segment.items():
+                if (task_id, region_path.name) in indexed_task_regions:
+                    continue
+                await add_weather_results(
+                    task_id, {region_path.name: region_data}, fetched_at
+                )
+                indexed_files += 1
+
+    return indexed_files
+
+
+async def main():
+    indexed_files = await index_result_files(settings.WEATHER_DATA_DIR)
+    logger.info(f"Indexed {indexed_files} result files.")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
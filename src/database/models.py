@@ -1,17 +1,38 @@
-from sqlalchemy import Float, Integer, String, JSON
+from sqlalchemy import (
+    BigInteger,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    JSON,
+    UniqueConstraint,
+)
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
 
+from datetime import datetime
 from typing import Dict, Any
 
 
+RESULT_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
 class Base(DeclarativeBase):
     pass
 
 
+def normalize_city_name(city_name: str) -> str:
+    return city_name.strip().lower()
+
+
 class City(Base):
     __tablename__ = "cities"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    source_id: Mapped[int] = mapped_column(
+        BigInteger, index=True, unique=True, nullable=True
+    )
     city: Mapped[str] = mapped_column(String(255))
     city_ascii: Mapped[str] = mapped_column(String(255))
     lat: Mapped[float] = mapped_column(Float(precision=4))
@@ -19,6 +40,7 @@ class City(Base):
     country: Mapped[str] = mapped_column(String(255))
     admin_name: Mapped[str] = mapped_column(String(255))
     region: Mapped[str] = mapped_column(String(255), nullable=True)
+    population: Mapped[int] = mapped_column(BigInteger, nullable=True)
 
     def __repr__(self) -> str:
         return f"City(city={self.city}, lat={self.lat}, lng={self.lng}, region={self.region})"
@@ -33,15 +55,38 @@ class City(Base):
             "country": self.country,
             "admin_name": self.admin_name,
             "region": self.region,
+            "population": self.population,
         }
 
 
+class CityAlias(Base):
+    """
+    Alternate name of a city: a localized or historical name, or another transliteration.
+    """
+
+    __tablename__ = "city_aliases"
+    __table_args__ = (
+        UniqueConstraint(
+            "city_id", "alias_lower", name="uq_city_aliases_city_id_alias_lower"
+        ),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    city_id: Mapped[int] = mapped_column(ForeignKey("cities.id"), index=True)
+    alias: Mapped[str] = mapped_column(String(255))
+    alias_lower: Mapped[str] = mapped_column(String(255), index=True)
+
+    def __repr__(self) -> str:
+        return f"CityAlias(alias={self.alias}, city_id={self.city_id})"
+
+
 class Task(Base):
     __tablename__ = "tasks"
 
     id: Mapped[str] = mapped_column(String(255), primary_key=True)
     status: Mapped[str] = mapped_column(String(50))
     results: Mapped[dict] = mapped_column(JSON, nullable=True)
+    metrics: Mapped[dict] = mapped_column(JSON, nullable=True)
 
     def __repr__(self) -> str:
         return f"Task(id={self.id}, status={self.status}, results={self.results})"
@@ -51,4 +96,64 @@ class Task(Base):
             "id": self.id,
             "status": self.status,
             "results": self.results,
+            "metrics": self.metrics,
+        }
+
+
+class GazetteerVersion(Base):
+    __tablename__ = "gazetteer_version"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    version: Mapped[int] = mapped_column(Integer, default=0)
+
+    def __repr__(self) -> str:
+        return f"GazetteerVersion(version={self.version})"
+
+
+class ImportCheckpoint(Base):
+    """
+    Progress of an interrupted streaming import of a cities CSV file. It is saved in the same
+    transaction as the rows it counts, so it never disagrees with the cities table.
+    """
+
+    __tablename__ = "import_checkpoints"
+
+    file_path: Mapped[str] = mapped_column(String(1024), primary_key=True)
+    rows: Mapped[int] = mapped_column(Integer)
+    byte_offset: Mapped[int] = mapped_column(BigInteger)
+    size: Mapped[int] = mapped_column(BigInteger)
+    mtime: Mapped[float] = mapped_column(Float)
+
+    def __repr__(self) -> str:
+        return f"ImportCheckpoint(file_path={self.file_path}, rows={self.rows})"
+
+
+class WeatherResult(Base):
+    """
+    One city of a saved task result, indexed by region so the results of a region can be
+    read without going through the result files of every task.
+    """
+
+    __tablename__ = "weather_results"
+    __table_args__ = (
+        Index("ix_weather_results_region_fetched_at", "region", "fetched_at"),
+        Index(
+            "ix_weather_results_region_city_fetched_at", "region", "city", "fetched_at"
+        ),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    task_id: Mapped[str] = mapped_column(String(255), index=True)
+    region: Mapped[str] = mapped_column(String(255))
+    city: Mapped[str] = mapped_column(String(255))
+    fetched_at: Mapped[datetime] = mapped_column(DateTime)
+    data: Mapped[dict] = mapped_column(JSON)
+
+    def __repr__(self) -> str:
+        return f"WeatherResult(task_id={self.task_id}, region={self.region}, city={self.city})"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            **self.data,
+            "time": self.fetched_at.strftime(RESULT_TIME_FORMAT),
         }
@@ -1,15 +1,23 @@
+import argparse
 import asyncio
+import io
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple
 
+from sqlalchemy import Insert, bindparam, delete, insert, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
 import pandas as pd
 from pathlib import Path
 
 from src.database.db import AsyncSessionLocal
-from src.database.models import City
+from src.database.gazetteer import bump_cities_version
+from src.database.models import City, ImportCheckpoint
 from src.config import get_settings
+from src.log import get_logger
 
 settings = get_settings()
+logger = get_logger(__name__)
 
 
 continent_country_map = {
@@ -288,34 +296,341 @@ continent_country_map = {
 }
 
 
-async def populate_cities_from_csv(csv_file_path: Path, session: AsyncSession) -> None:
-    df = pd.read_csv(csv_file_path)
+# Region of the cities of the countries missing from `continent_country_map`.
+DEFAULT_REGION = "Other"
+
+# The first region listing a country wins, as some countries are listed twice.
+country_region_map: Dict[str, str] = {}
+for region, countries in continent_country_map.items():
+    for country in countries:
+        country_region_map.setdefault(country, region)
+
+# Lowercased ascii name, country, latitude and longitude of a city.
+LegacyCityKey = Tuple[str, str, float, float]
+
+CITY_COLUMNS = (
+    "source_id",
+    "city",
+    "city_ascii",
+    "lat",
+    "lng",
+    "country",
+    "admin_name",
+    "region",
+    "population",
+)
+
+
+def prepare_cities(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Derives the region (`DEFAULT_REGION` for unlisted countries) and the integer population
+    of every city of the worldcities CSV rows with vectorized operations.
+
+    Returns:
+        pd.DataFrame: The cities with the `CITY_COLUMNS` columns, missing values as None.
+    """
+    population = pd.to_numeric(
+        df["population"] if "population" in df else pd.Series(index=df.index, dtype=float),
+        errors="coerce",
+    )
     df = df.fillna("")
+    df["population"] = population.round().astype("Int64")
+
+    df = df.rename(columns={"id": "source_id"})
+    if "source_id" not in df:
+        df["source_id"] = None
+    for name_column in ("city", "city_ascii"):
+        df[name_column] = df[name_column].astype(str)
+    df["region"] = df["country"].map(country_region_map).fillna(DEFAULT_REGION)
+
+    df = df[list(CITY_COLUMNS)].astype(object)
+    return df.where(df.notna(), None)
+
+
+def read_cities_csv(csv_file_path: Path) -> pd.DataFrame:
+    return prepare_cities(pd.read_csv(csv_file_path))
+
+
+def read_csv_records(file: BinaryIO, count: int) -> bytes:
+    """
+    Reads up to `count` records of a CSV file opened in binary mode, a quoted field may span
+    several lines. The position of the file is left at the start of the next record.
+    """
+    lines = []
+    quotes = 0
+    while count:
+        line = file.readline()
+        if not line:
+            break
+        lines.append(line)
+        quotes += line.count(b'"')
+        if quotes % 2 == 0:
+            count -= 1
+    return b"".join(lines)
+
 
-    for _, row in df.iterrows():
-        city = City(
-            city=row["city"],
-            city_ascii=row["city_ascii"],
-            lat=row["lat"],
-            lng=row["lng"],
-            country=row["country"],
-            admin_name=row["admin_name"],
+def get_checkpoint_key(csv_file_path: Path) -> str:
+    return str(csv_file_path.resolve())
+
+
+async def read_checkpoint(session: AsyncSession, csv_file_path: Path) -> Tuple[int, int]:
+    """
+    Returns the number of rows of the file already loaded by an interrupted streaming import
+    and the byte offset they end at, or (0, 0) if there is none or the file has changed since.
+    """
+    checkpoint = await session.get(ImportCheckpoint, get_checkpoint_key(csv_file_path))
+    if checkpoint is None:
+        return 0, 0
+
+    file_stat = csv_file_path.stat()
+    if (checkpoint.size, checkpoint.mtime) != (file_stat.st_size, file_stat.st_mtime):
+        return 0, 0
+    return checkpoint.rows, checkpoint.byte_offset
+
+
+async def write_checkpoint(
+    session: AsyncSession, csv_file_path: Path, rows: int, byte_offset: int
+) -> None:
+    """
+    Saves the progress of a streaming import, committed along with the chunk it counts.
+    """
+    file_stat = csv_file_path.stat()
+    await session.merge(
+        ImportCheckpoint(
+            file_path=get_checkpoint_key(csv_file_path),
+            rows=rows,
+            byte_offset=byte_offset,
+            size=file_stat.st_size,
+            mtime=file_stat.st_mtime,
         )
-        for continent, countries in continent_country_map.items():
-            if city.country in countries:
-                city.region = continent
-                break
+    )
+
+
+def build_cities_insert(upsert: bool) -> Insert:
+    if not upsert:
+        return insert(City)
 
-        session.add(city)
+    query = sqlite_insert(City)
+    return query.on_conflict_do_update(
+        index_elements=[City.source_id],
+        set_={
+            column: query.excluded[column]
+            for column in CITY_COLUMNS
+            if column != "source_id"
+        },
+    )
+
+
+def get_legacy_city_key(city: Dict[str, Any]) -> LegacyCityKey:
+    return (str(city["city_ascii"]).lower(), city["country"], city["lat"], city["lng"])
+
+
+async def get_legacy_city_ids(session: AsyncSession) -> Dict[LegacyCityKey, int]:
+    """
+    Returns the ids of the cities loaded before `source_id` existed, by `get_legacy_city_key`.
+    The first loaded city wins if several match.
+    """
+    result = await session.execute(
+        select(City.id, City.city_ascii, City.country, City.lat, City.lng)
+        .where(City.source_id.is_(None))
+        .order_by(City.id)
+    )
+
+    legacy_city_ids: Dict[LegacyCityKey, int] = {}
+    for city_id, city_ascii, country, lat, lng in result.tuples():
+        legacy_city_ids.setdefault(
+            get_legacy_city_key(
+                {"city_ascii": city_ascii, "country": country, "lat": lat, "lng": lng}
+            ),
+            city_id,
+        )
+    return legacy_city_ids
+
+
+async def adopt_legacy_cities(
+    session: AsyncSession,
+    rows: List[Dict[str, Any]],
+    legacy_city_ids: Dict[LegacyCityKey, int],
+) -> int:
+    """
+    Gives the cities loaded before `source_id` existed the `source_id` of their row, so the
+    upsert of the rows updates them (e.g. fills in their population) instead of adding them
+    again. Adopted cities are removed from `legacy_city_ids`.
+
+    Returns:
+        int: The number of adopted cities.
+    """
+    matches = {
+        row["source_id"]: get_legacy_city_key(row)
+        for row in rows
+        if row["source_id"] is not None and get_legacy_city_key(row) in legacy_city_ids
+    }
+    if not matches:
+        return 0
+
+    # A city may have been loaded again with its `source_id` after the legacy one.
+    result = await session.execute(
+        select(City.source_id).where(City.source_id.in_(list(matches)))
+    )
+    for source_id in result.scalars():
+        matches.pop(source_id)
+
+    adopted = [
+        {"city_id": legacy_city_ids.pop(key), "city_source_id": source_id}
+        for source_id, key in matches.items()
+        if key in legacy_city_ids
+    ]
+    if adopted:
+        cities = City.__table__
+        await session.execute(
+            update(cities)
+            .where(cities.c.id == bindparam("city_id"))
+            .values(source_id=bindparam("city_source_id")),
+            adopted,
+        )
+    return len(adopted)
+
+
+async def populate_cities_from_csv(
+    csv_file_path: Path,
+    session: AsyncSession,
+    upsert: bool = False,
+    chunk_size: Optional[int] = None,
+) -> None:
+    """
+    Loads the cities from the worldcities CSV file into the cities table in a single transaction,
+    inserting them in chunks of `chunk_size` rows (`POPULATE_CHUNK_SIZE` by default).
+
+    Args:
+        csv_file_path (Path): Path to the CSV file.
+        session (AsyncSession): The database session to load the cities with.
+        upsert (bool): Update the cities already loaded (matched by the `id` column of the CSV,
+                       stored as `source_id`) instead of adding them again, so the file can be
+                       re-imported. Cities loaded before `source_id` existed are matched by their
+                       ascii name, country and coordinates, see `adopt_legacy_cities`.
+        chunk_size (Optional[int]): Number of rows per insert statement.
+    """
+    if chunk_size is None:
+        chunk_size = settings.POPULATE_CHUNK_SIZE
+
+    rows = read_cities_csv(csv_file_path).to_dict("records")
+    legacy_city_ids = await get_legacy_city_ids(session) if upsert else {}
+    query = build_cities_insert(upsert)
+    adopted = 0
+    for i in range(0, len(rows), chunk_size):
+        chunk = rows[i : i + chunk_size]
+        adopted += await adopt_legacy_cities(session, chunk, legacy_city_ids)
+        await session.execute(query, chunk)
     await session.commit()
 
+    logger.info(
+        f"Loaded {len(rows)} cities from {csv_file_path}, "
+        f"{adopted} of them were loaded before without their id."
+    )
+    await bump_cities_version()
 
-async def main():
-    async with AsyncSessionLocal() as session:
-        await populate_cities_from_csv(
-            settings.PROJECT_ROOT / "data" / "worldcities.csv", session
+
+async def stream_cities_from_csv(
+    csv_file_path: Path,
+    session: AsyncSession,
+    upsert: bool = False,
+    chunk_size: Optional[int] = None,
+    resume: bool = True,
+) -> int:
+    """
+    Loads the cities from a CSV file of any size, reading and committing `chunk_size` rows
+    (`POPULATE_CHUNK_SIZE` by default) at a time, so memory use does not depend on the file size.
+
+    Every chunk is committed with a checkpoint row (the number of loaded rows and the byte offset
+    they end at), so an interrupted import seeks straight to where it stopped and never loads a
+    chunk twice.
+
+    Args:
+        csv_file_path (Path): Path to the CSV file.
+        session (AsyncSession): The database session to load the cities with.
+        upsert (bool): Update the cities already loaded instead of adding them again,
+                       see `populate_cities_from_csv`.
+        chunk_size (Optional[int]): Number of rows read and inserted at a time.
+        resume (bool): Continue from the checkpoint of an interrupted import, if any.
+
+    Returns:
+        int: The number of rows of the file loaded so far, including the resumed ones.
+    """
+    if chunk_size is None:
+        chunk_size = settings.POPULATE_CHUNK_SIZE
+
+    rows_done, byte_offset = (
+        await read_checkpoint(session, csv_file_path) if resume else (0, 0)
+    )
+    if rows_done:
+        logger.info(f"Resuming the import of {csv_file_path} after {rows_done} rows.")
+
+    file_size = csv_file_path.stat().st_size
+    legacy_city_ids = await get_legacy_city_ids(session) if upsert else {}
+    query = build_cities_insert(upsert)
+    with open(csv_file_path, "rb") as file:
+        header = read_csv_records(file, 1)
+        if byte_offset:
+            file.seek(byte_offset)
+
+        while records := read_csv_records(file, chunk_size):
+            rows = prepare_cities(pd.read_csv(io.BytesIO(header + records))).to_dict(
+                "records"
+            )
+            if rows:
+                await adopt_legacy_cities(session, rows, legacy_city_ids)
+                await session.execute(query, rows)
+            rows_done += len(rows)
+            await write_checkpoint(session, csv_file_path, rows_done, file.tell())
+            await session.commit()
+
+            logger.info(
+                f"Loaded {rows_done} cities ({file.tell() / file_size:.0%} of {csv_file_path.name})."
+            )
+
+    await session.execute(
+        delete(ImportCheckpoint).where(
+            ImportCheckpoint.file_path == get_checkpoint_key(csv_file_path)
         )
+    )
+    await session.commit()
+    await bump_cities_version()
+    return rows_done
+
+
+async def main(csv_file_path: Path, upsert: bool, stream: bool, resume: bool):
+    async with AsyncSessionLocal() as session:
+        if stream:
+            await stream_cities_from_csv(
+                csv_file_path, session, upsert=upsert, resume=resume
+            )
+        else:
+            await populate_cities_from_csv(csv_file_path, session, upsert=upsert)
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="Load the cities into the database.")
+    parser.add_argument(
+        "csv_file_path",
+        nargs="?",
+        type=Path,
+        default=settings.PROJECT_ROOT / "data" / "worldcities.csv",
+    )
+    parser.add_argument(
+        "--upsert",
+        action="store_true",
+        help="Update the already loaded cities instead of adding them again.",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Read and commit the file in chunks, for files too large to load at once.",
+    )
+    parser.add_argument(
+        "--restart",
+        action="store_true",
+        help="With --stream, ignore the checkpoint of an interrupted import.",
+    )
+    args = parser.parse_args()
+
+    asyncio.run(main(args.csv_file_path, args.upsert, args.stream, not args.restart))
@@ -0,0 +1,112 @@
+import argparse
+import asyncio
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import get_settings
+from src.database.db import AsyncSessionLocal
+from src.database.gazetteer import bump_cities_version
+from src.database.models import City, CityAlias, normalize_city_name
+from src.log import get_logger
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+
+async def get_city_ids(
+    session: AsyncSession,
+) -> Tuple[Dict[int, int], Dict[Tuple[str, str], int]]:
+    """
+    Returns the ids of the cities by their `source_id` and by their normalized ascii name and
+    country. The first loaded city wins if several share the same name in a country.
+    """
+    result = await session.execute(
+        select(City.id, City.source_id, City.city_ascii, City.country).order_by(City.id)
+    )
+
+    source_id_map: Dict[int, int] = {}
+    name_country_map: Dict[Tuple[str, str], int] = {}
+    for city_id, source_id, city_ascii, country in result.tuples():
+        if source_id is not None:
+            source_id_map[source_id] = city_id
+        name_country_map.setdefault(
+            (normalize_city_name(city_ascii or ""), country), city_id
+        )
+    return source_id_map, name_country_map
+
+
+async def populate_aliases_from_csv(
+    csv_file_path: Path, session: AsyncSession, chunk_size: Optional[int] = None
+) -> int:
+    """
+    Loads the alternate city names from a CSV file into the city_aliases table in a single
+    transaction. Every row has an `alias` and identifies its city either by the `source_id`
+    column (the `id` of the worldcities CSV) or by the `city_ascii` and `country` columns.
+    Aliases already loaded are skipped, so the file can be re-imported.
+
+    Args:
+        csv_file_path (Path): Path to the CSV file.
+        session (AsyncSession): The database session to load the aliases with.
+        chunk_size (Optional[int]): Number of rows per insert statement,
+                                    `POPULATE_CHUNK_SIZE` by default.
+
+    Returns:
+        int: The number of aliases whose city was found.
+    """
+    if chunk_size is None:
+        chunk_size = settings.POPULATE_CHUNK_SIZE
+
+    df = pd.read_csv(csv_file_path, dtype=str).fillna("")
+    source_id_map, name_country_map = await get_city_ids(session)
+
+    rows: List[Dict[str, Any]] = []
+    for record in df.to_dict("records"):
+        alias = record["alias"].strip()
+        if not alias:
+            continue
+        if record.get("source_id"):
+            city_id = source_id_map.get(int(record["source_id"]))
+        else:
+            city_id = name_country_map.get(
+                (normalize_city_name(record.get("city_ascii", "")), record.get("country"))
+            )
+        if city_id is None:
+            logger.warning(f"Could not find the city of the alias {alias}, skipping it.")
+            continue
+        rows.append(
+            {"city_id": city_id, "alias": alias, "alias_lower": normalize_city_name(alias)}
+        )
+
+    query = sqlite_insert(CityAlias).on_conflict_do_nothing()
+    for i in range(0, len(rows), chunk_size):
+        await session.execute(query, rows[i : i + chunk_size])
+    await session.commit()
+
+    logger.info(f"Loaded {len(rows)} city aliases from {csv_file_path}.")
+    await bump_cities_version()
+    return len(rows)
+
+
+async def main(csv_file_path: Path):
+    async with AsyncSessionLocal() as session:
+        await populate_aliases_from_csv(csv_file_path, session)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Load the alternate city names into the database."
+    )
+    parser.add_argument(
+        "csv_file_path",
+        nargs="?",
+        type=Path,
+        default=settings.PROJECT_ROOT / "data" / "city_aliases.csv",
+    )
+    args = parser.parse_args()
+
+    asyncio.run(main(args.csv_file_path))
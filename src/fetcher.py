@@ -0,0 +1,136 @@
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, TypeVar
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.config import get_settings
+from src.log import get_logger
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+FetchResult = Tuple[Any, Optional[T], Optional[Exception]]
+
+_sessions: Dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class FetchMetrics:
+    """
+    Counts the cities of a task and the upstream requests made for them (every attempt,
+    retries and hedged requests included), and keeps the deadline of the task
+    (`FETCH_TASK_DEADLINE` from its creation by default).
+    """
+
+    def __init__(self, cities: int = 0, deadline: Optional[float] = None):
+        if deadline is None:
+            deadline = settings.FETCH_TASK_DEADLINE
+        self.cities = cities
+        self.requests = 0
+        self.finish_by = time.monotonic() + deadline
+        self._lock = threading.Lock()
+
+    def time_left(self) -> float:
+        return max(self.finish_by - time.monotonic(), 0.0)
+
+    def record_request(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        requests_per_city = self.requests / self.cities if self.cities else 0.0
+        return {
+            "cities": self.cities,
+            "requests": self.requests,
+            "requests_per_city": round(requests_per_city, 3),
+        }
+
+
+def get_session(provider: str, pool_size: int) -> requests.Session:
+    """
+    Returns a keep-alive session for the provider, shared by all tasks of the worker process,
+    so connections (and TLS handshakes) are reused between requests.
+    """
+    with _sessions_lock:
+        session = _sessions.get(provider)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _sessions[provider] = session
+        return session
+
+
+def fetch_concurrently(
+    provider: str,
+    cities: Sequence[Any],
+    fetch_city: Callable[[Any], T],
+    concurrency: int,
+    deadline: Optional[float] = None,
+) -> List[FetchResult]:
+    """
+    Runs `fetch_city` for every city on a bounded thread pool.
+
+    Args:
+        provider (str): Name of the provider, used to name the threads.
+        cities (Sequence[Any]): Cities (or batches of cities) to fetch the data for.
+        fetch_city (Callable[[Any], T]): Performs the request for one item, expected to use a
+                                         session from `get_session` and its own per-request timeout.
+        concurrency (int): Maximal number of requests in flight.
+        deadline (Optional[float]): Seconds the whole batch may take. Defaults to `FETCH_TASK_DEADLINE`.
+                                    Cities not fetched in time are reported with `DeadlineExceeded`.
+
+    Returns:
+        List[Tuple[Any, Optional[T], Optional[Exception]]]: For every city, in the input order,
+                                                             the result of `fetch_city` or the raised exception.
+    """
+    if deadline is None:
+        deadline = settings.FETCH_TASK_DEADLINE
+
+    results: List[FetchResult] = [
+        (city, None, DeadlineExceeded(f"Deadline of {deadline}s exceeded."))
+        for city in cities
+    ]
+    if not cities:
+        return results
+
+    executor = ThreadPoolExecutor(
+        max_workers=concurrency, thread_name_prefix=f"fetch-{provider}"
+    )
+    futures: Dict[Future, int] = {
+        executor.submit(fetch_city, city): position
+        for position, city in enumerate(cities)
+    }
+
+    finish_by = time.monotonic() + deadline
+    pending = set(futures)
+    try:
+        while pending:
+            remaining = finish_by - time.monotonic()
+            if remaining <= 0:
+                logger.warning(
+                    f"{provider}: {len(pending)} of {len(cities)} requests did not finish in {deadline}s."
+                )
+                break
+
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                position = futures[future]
+                try:
+                    results[position] = (cities[position], future.result(), None)
+                except Exception as e:
+                    results[position] = (cities[position], None, e)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return results
@@ -0,0 +1,390 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, List, Optional, Tuple
+
+import requests
+
+from src.api.service import process_open_weather_data, process_weatherapi_data
+from src.cache import (
+    get_cached,
+    get_coordinates_cache_key,
+    get_or_fetch,
+    get_query_cache_key,
+    set_cached,
+)
+from src.config import get_settings
+from src.fetcher import FetchMetrics, FetchResult, fetch_concurrently, get_session
+from src.log import get_logger
+from src.rate_limiter import get_rate_limiter
+from src.resilience import call_with_retries
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+
+class LatencyTracker:
+    """
+    Keeps the latencies of the last `size` upstream calls of a provider.
+    """
+
+    def __init__(self, size: int = 200):
+        self._latencies: deque = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, latency: float) -> None:
+        with self._lock:
+            self._latencies.append(latency)
+
+    def percentile(self, percentile: float, min_samples: int = 20) -> Optional[float]:
+        with self._lock:
+            if len(self._latencies) < min_samples:
+                return None
+            latencies = sorted(self._latencies)
+        return latencies[min(int(len(latencies) * percentile), len(latencies) - 1)]
+
+
+class WeatherProvider(ABC):
+    """
+    Base class of the weather providers.
+
+    A provider knows how to request the current weather of a city and how to normalize the
+    response into `{"temp": ..., "description": ...}` (or `{"code": ..., "message": ...}`).
+    Requests go through the shared cache, the retry policy and the rate limiter of the provider.
+    """
+
+    name: str = ""
+    display_name: str = ""
+
+    def __init__(
+        self,
+        api_url: str,
+        concurrency: int,
+        timeout: float,
+        rate_limit: int,
+        rate_limit_burst: int,
+    ):
+        self.api_url = api_url
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.rate_limit = rate_limit
+        self.rate_limit_burst = rate_limit_burst
+        self.latencies = LatencyTracker()
+
+    @abstractmethod
+    def get_cache_key(self, city: Dict) -> str: ...
+
+    @abstractmethod
+    def get_params(self, city: Dict) -> Dict: ...
+
+    @abstractmethod
+    def process(self, data: Dict) -> Dict: ...
+
+    def fetch(self, city: Dict, metrics: Optional[FetchMetrics] = None) -> Dict:
+        """
+        Returns the raw provider response for the city.
+        """
+
+        def fetch() -> Tuple[Dict, bool]:
+            logger.info(f"Requesting weather for {city['city']}...")
+            session = get_session(self.name, self.concurrency)
+            params = self.get_params(city)
+
+            response = self.request(
+                lambda: session.get(self.api_url, params=params, timeout=self.timeout),
+                metrics,
+            )
+            logger.info(f"Received response for {city['city']}: {response.status_code}")
+            return response.json(), response.ok
+
+        return get_or_fetch(self.get_cache_key(city), fetch)
+
+    def request(
+        self,
+        send: Callable[[], requests.Response],
+        metrics: Optional[FetchMetrics] = None,
+    ) -> requests.Response:
+        """
+        Sends an upstream request with retries and rate limiting, recording its latency.
+        Every attempt is counted in the metrics.
+        """
+        started_at = time.monotonic()
+        response = call_with_retries(
+            self.name,
+            send,
+            rate_limiter=get_rate_limiter(
+                self.name, self.rate_limit, self.rate_limit_burst
+            ),
+            metrics=metrics,
+        )
+        self.latencies.record(time.monotonic() - started_at)
+        return response
+
+    def fetch_many(
+        self, cities: List[Dict], metrics: Optional[FetchMetrics] = None
+    ) -> List[FetchResult]:
+        """
+        Fetches the raw responses for the cities, one request per city unless the provider
+        supports batch requests.
+
+        Returns:
+            List[Tuple[Dict, Optional[Tuple[WeatherProvider, Dict]], Optional[Exception]]]:
+                For every city, in the input order, the provider and its response or the raised exception.
+        """
+        return fetch_concurrently(
+            self.name,
+            cities,
+            lambda city: (self, self.fetch(city, metrics)),
+            concurrency=self.concurrency,
+        )
+
+    def get_hedge_delay(self) -> float:
+        """
+        Seconds to wait for this provider before hedging with another one: the recent
+        `HEDGE_PERCENTILE` latency, or `HEDGE_DELAY` until enough calls were made.
+        """
+        latency = self.latencies.percentile(settings.HEDGE_PERCENTILE)
+        if latency is None:
+            return settings.HEDGE_DELAY
+        return max(latency, settings.HEDGE_MIN_DELAY)
+
+
+class OpenWeatherProvider(WeatherProvider):
+    name = "open_weather"
+    display_name = "OpenWeather"
+
+    def __init__(self):
+        super().__init__(
+            settings.OPEN_WEATHER_API_URL,
+            settings.OPEN_WEATHER_CONCURRENCY,
+            settings.OPEN_WEATHER_TIMEOUT,
+            settings.OPEN_WEATHER_RATE_LIMIT,
+            settings.OPEN_WEATHER_RATE_LIMIT_BURST,
+        )
+
+    def get_cache_key(self, city: Dict) -> str:
+        return get_coordinates_cache_key(self.name, city["lat"], city["lng"])
+
+    def get_params(self, city: Dict) -> Dict:
+        return {
+            "appid": settings.OPEN_WEATHER_API_KEY,
+            "units": "metric",
+            "exclude": "minutely,hourly,daily",
+            "lon": city["lng"],
+            "lat": city["lat"],
+        }
+
+    def process(self, data: Dict) -> Dict:
+        return process_open_weather_data(data)
+
+
+class WeatherAPIProvider(WeatherProvider):
+    name = "weather_api"
+    display_name = "WeatherAPI"
+
+    def __init__(self):
+        super().__init__(
+            settings.WEATHERAPI_API_URL,
+            settings.WEATHERAPI_CONCURRENCY,
+            settings.WEATHERAPI_TIMEOUT,
+            settings.WEATHERAPI_RATE_LIMIT,
+            settings.WEATHERAPI_RATE_LIMIT_BURST,
+        )
+
+    def get_cache_key(self, city: Dict) -> str:
+        return get_query_cache_key(self.name, city["city"])
+
+    def get_params(self, city: Dict) -> Dict:
+        return {
+            "lang": "en",
+            "key": settings.WEATHERAPI_API_KEY,
+            "q": city["city"],
+        }
+
+    def process(self, data: Dict) -> Dict:
+        return process_weatherapi_data(data)
+
+    def fetch_many(
+        self, cities: List[Dict], metrics: Optional[FetchMetrics] = None
+    ) -> List[FetchResult]:
+        """
+        With `WEATHERAPI_BULK_ENABLED`, the cities missing from the cache are packed into bulk
+        requests of up to `WEATHERAPI_BULK_SIZE` locations each.
+        """
+        if not settings.WEATHERAPI_BULK_ENABLED or len(cities) < 2:
+            return super().fetch_many(cities, metrics)
+
+        city_data: Dict[int, Dict] = {}
+        for position, city in enumerate(cities):
+            cached = get_cached(self.get_cache_key(city))
+            if cached is not None:
+                city_data[position] = cached
+
+        missing = [position for position in range(len(cities)) if position not in city_data]
+        bulk_size = settings.WEATHERAPI_BULK_SIZE
+        batches = [missing[i : i + bulk_size] for i in range(0, len(missing), bulk_size)]
+
+        errors: Dict[int, Exception] = {}
+        for batch, batch_data, error in fetch_concurrently(
+            self.name,
+            batches,
+            lambda batch: self.fetch_bulk([cities[position] for position in batch], metrics),
+            concurrency=self.concurrency,
+        ):
+            for i, position in enumerate(batch):
+                if error is not None:
+                    errors[position] = error
+                else:
+                    city_data[position] = batch_data[i]
+
+        return [
+            (city, None, errors[position])
+            if position in errors
+            else (city, (self, city_data[position]), None)
+            for position, city in enumerate(cities)
+        ]
+
+    def fetch_bulk(
+        self, cities: List[Dict], metrics: Optional[FetchMetrics] = None
+    ) -> List[Dict]:
+        """
+        Requests the current weather of all the cities with one bulk request and returns the
+        response of every city, in the input order.
+        """
+        logger.info(f"Requesting weather for {len(cities)} cities in bulk...")
+        session = get_session(self.name, self.concurrency)
+        params = {"lang": "en", "key": settings.WEATHERAPI_API_KEY, "q": "bulk"}
+        body = {
+            "locations": [
+                {"q": city["city"], "custom_id": str(i)} for i, city in enumerate(cities)
+            ]
+        }
+
+        response = self.request(
+            lambda: session.post(
+                self.api_url, params=params, json=body, timeout=self.timeout
+            ),
+            metrics,
+        )
+        logger.info(f"Received bulk response for {len(cities)} cities: {response.status_code}")
+
+        data = response.json()
+        if "bulk" not in data:
+            return [data for _ in cities]
+
+        query_data = {
+            item["query"].get("custom_id"): item["query"] for item in data["bulk"]
+        }
+        cities_data = []
+        for i, city in enumerate(cities):
+            city_data = query_data.get(
+                str(i), {"code": 500, "message": "Missing from bulk response."}
+            )
+            if response.ok and "current" in city_data:
+                set_cached(self.get_cache_key(city), city_data)
+            cities_data.append(city_data)
+        return cities_data
+
+
+providers: Dict[str, WeatherProvider] = {}
+
+
+def register_provider(provider: WeatherProvider) -> WeatherProvider:
+    providers[provider.name] = provider
+    return provider
+
+
+def get_provider(name: str) -> WeatherProvider:
+    if name not in providers:
+        raise ValueError(f"Unknown weather provider: {name}")
+    return providers[name]
+
+
+register_provider(OpenWeatherProvider())
+register_provider(WeatherAPIProvider())
+
+
+_hedge_executor: Optional[ThreadPoolExecutor] = None
+_hedge_executor_lock = threading.Lock()
+
+
+def get_hedge_executor() -> ThreadPoolExecutor:
+    global _hedge_executor
+    with _hedge_executor_lock:
+        if _hedge_executor is None:
+            max_workers = 2 * sum(provider.concurrency for provider in providers.values())
+            _hedge_executor = ThreadPoolExecutor(
+                max_workers=max_workers, thread_name_prefix="hedge"
+            )
+        return _hedge_executor
+
+
+def fetch_hedged(
+    primary: WeatherProvider,
+    secondary: WeatherProvider,
+    city: Dict,
+    metrics: Optional[FetchMetrics] = None,
+) -> Tuple[WeatherProvider, Dict]:
+    """
+    Requests the city from the primary provider and, if it has not answered within its hedge
+    delay (or failed), from the secondary one too. The first successful answer wins: errors and
+    error responses (see `WeatherProvider.process`) of one provider wait for the other one.
+
+    Returns:
+        Tuple[WeatherProvider, Dict]: The provider that answered and its raw response, the error
+                                      response of a provider if neither of them succeeded.
+    """
+    executor = get_hedge_executor()
+
+    def fetch(provider: WeatherProvider) -> Tuple[WeatherProvider, Dict]:
+        return provider, provider.fetch(city, metrics)
+
+    def is_successful(result: Tuple[WeatherProvider, Dict]) -> bool:
+        provider, data = result
+        return "code" not in provider.process(data)
+
+    error: Optional[BaseException] = None
+    error_result: Optional[Tuple[WeatherProvider, Dict]] = None
+
+    primary_future = executor.submit(fetch, primary)
+    pending = {primary_future}
+    try:
+        result = primary_future.result(timeout=primary.get_hedge_delay())
+    except FutureTimeoutError:
+        logger.info(
+            f"{primary.display_name} is slow for {city['city']}, hedging with {secondary.display_name}."
+        )
+    except Exception as e:
+        logger.warning(
+            f"{primary.display_name} failed for {city['city']}, falling back to {secondary.display_name}: {e}"
+        )
+        error = e
+        pending = set()
+    else:
+        if is_successful(result):
+            return result
+        logger.warning(
+            f"{primary.display_name} answered with an error for {city['city']}, falling back to {secondary.display_name}."
+        )
+        error_result = result
+        pending = set()
+
+    pending.add(executor.submit(fetch, secondary))
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                result = future.result()
+            except Exception as e:
+                error = e
+                continue
+            if is_successful(result):
+                return result
+            error_result = result
+
+    if error_result is not None:
+        return error_result
+    raise error  # type: ignore
@@ -0,0 +1,167 @@
+import threading
+import time
+from typing import Dict, Optional, Union
+
+import redis
+
+from src.config import get_settings
+from src.log import get_logger
+from src.redis_client import get_redis_client
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+# Refills the bucket from the elapsed time and takes a token if there is one.
+# Returns 0 when a token was taken, otherwise the milliseconds until the next one.
+TOKEN_BUCKET_SCRIPT = """
+local key = KEYS[1]
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) * 1000 + math.floor(tonumber(now_parts[2]) / 1000)
+
+local bucket = redis.call('HMGET', key, 'tokens', 'updated_at')
+local tokens = tonumber(bucket[1])
+local updated_at = tonumber(bucket[2])
+if tokens == nil then
+    tokens = capacity
+    updated_at = now
+end
+
+tokens = math.min(capacity, tokens + (now - updated_at) * rate / 1000)
+
+local wait_ms = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait_ms = math.ceil((1 - tokens) * 1000 / rate)
+end
+
+redis.call('HSET', key, 'tokens', tostring(tokens), 'updated_at', now)
+redis.call('PEXPIRE', key, math.ceil(capacity * 1000 / rate) + 1000)
+return wait_ms
+"""
+
+
+class RateLimitTimeout(Exception):
+    pass
+
+
+class LocalTokenBucket:
+    """
+    Token bucket for a single process, refilled at `rate` tokens per second up to `capacity`.
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> float:
+        """
+        Takes a token if there is one and returns 0, otherwise returns the seconds until the next one.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated_at) * self.rate
+            )
+            self.updated_at = now
+
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+
+class RedisTokenBucket:
+    """
+    Token bucket shared by all Celery workers. The bucket lives in a Redis hash and is
+    updated atomically by a Lua script using the Redis clock.
+    """
+
+    def __init__(
+        self, redis_client: redis.Redis, provider: str, rate: float, capacity: int
+    ):
+        self.key = f"rate_limit:{provider}"
+        self.rate = rate
+        self.capacity = capacity
+        self._script = redis_client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    def try_acquire(self) -> float:
+        wait_ms = self._script(keys=[self.key], args=[self.rate, self.capacity])
+        return int(wait_ms) / 1000
+
+
+TokenBucket = Union[LocalTokenBucket, RedisTokenBucket]
+
+
+class RateLimiter:
+    def __init__(self, provider: str, bucket: TokenBucket, fallback: LocalTokenBucket):
+        self.provider = provider
+        self.bucket = bucket
+        self.fallback = fallback
+
+    def _try_acquire(self) -> float:
+        try:
+            return self.bucket.try_acquire()
+        except redis.RedisError as e:
+            logger.warning(
+                f"{self.provider}: shared rate limiter unavailable, limiting locally: {e}"
+            )
+            return self.fallback.try_acquire()
+
+    def acquire(self, timeout: Optional[float] = None) -> None:
+        """
+        Blocks until a token is available.
+
+        Raises:
+            RateLimitTimeout: If no token became available within `timeout` seconds.
+        """
+        give_up_at = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self._try_acquire()
+            if wait <= 0:
+                return
+            if give_up_at is not None and time.monotonic() + wait > give_up_at:
+                raise RateLimitTimeout(
+                    f"{self.provider}: no request quota left within {timeout}s."
+                )
+            time.sleep(wait)
+
+
+def create_rate_limiter(provider: str, rate_per_minute: int, burst: int) -> RateLimiter:
+    rate = rate_per_minute / 60
+    capacity = max(burst, 1)
+    fallback = LocalTokenBucket(rate, capacity)
+
+    if settings.RATE_LIMIT_BACKEND == "redis":
+        return RateLimiter(
+            provider,
+            RedisTokenBucket(get_redis_client(), provider, rate, capacity),
+            fallback,
+        )
+    return RateLimiter(provider, fallback, fallback)
+
+
+_rate_limiters: Dict[str, Optional[RateLimiter]] = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(
+    provider: str, rate_per_minute: int, burst: int
+) -> Optional[RateLimiter]:
+    """
+    Returns the process-wide rate limiter of the provider, or None if `rate_per_minute` is 0.
+    """
+    with _rate_limiters_lock:
+        if provider not in _rate_limiters:
+            _rate_limiters[provider] = (
+                create_rate_limiter(provider, rate_per_minute, burst)
+                if rate_per_minute > 0
+                else None
+            )
+        return _rate_limiters[provider]
@@ -0,0 +1,12 @@
+from functools import lru_cache
+
+import redis
+
+from src.config import get_settings
+
+settings = get_settings()
+
+
+@lru_cache
+def get_redis_client() -> redis.Redis:
+    return redis.Redis.from_url(settings.REDIS_BACKEND, decode_responses=True)
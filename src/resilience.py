@@ -0,0 +1,200 @@
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Optional
+
+import requests
+
+from src.config import get_settings
+from src.fetcher import FetchMetrics
+from src.log import get_logger
+from src.rate_limiter import RateLimiter
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Per-provider circuit breaker.
+
+    After `failure_threshold` consecutive failures the circuit opens and calls fail fast
+    with `CircuitOpenError` for `reset_timeout` seconds. Then a single trial call is let
+    through (half-open): its success closes the circuit, its failure opens it again.
+    """
+
+    def __init__(self, provider: str, failure_threshold: int, reset_timeout: float):
+        self.provider = provider
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            if self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.opened_at is not None:
+                logger.info(f"{self.provider}: circuit closed.")
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self._trial_in_flight or self.failures >= self.failure_threshold:
+                if self.opened_at is None or self._trial_in_flight:
+                    logger.warning(
+                        f"{self.provider}: circuit opened after {self.failures} failures."
+                    )
+                self.opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+
+_circuit_breakers: Dict[str, CircuitBreaker] = {}
+_circuit_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(provider: str) -> CircuitBreaker:
+    with _circuit_breakers_lock:
+        circuit_breaker = _circuit_breakers.get(provider)
+        if circuit_breaker is None:
+            circuit_breaker = CircuitBreaker(
+                provider,
+                settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+                settings.CIRCUIT_BREAKER_RESET_TIMEOUT,
+            )
+            _circuit_breakers[provider] = circuit_breaker
+        return circuit_breaker
+
+
+def parse_retry_after(response: requests.Response) -> Optional[float]:
+    retry_after = response.headers.get("Retry-After")
+    if not retry_after:
+        return None
+
+    try:
+        return max(float(retry_after), 0.0)
+    except ValueError:
+        pass
+
+    try:
+        retry_at = parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+def get_backoff_delay(attempt: int) -> float:
+    """
+    Exponential backoff with full jitter.
+    """
+    ceiling = min(
+        settings.PROVIDER_BACKOFF_MAX, settings.PROVIDER_BACKOFF_BASE * 2**attempt
+    )
+    return random.uniform(0, ceiling)
+
+
+def call_with_retries(
+    provider: str,
+    request: Callable[[], requests.Response],
+    rate_limiter: Optional[RateLimiter] = None,
+    metrics: Optional[FetchMetrics] = None,
+) -> requests.Response:
+    """
+    Performs the request, retrying timeouts, connection errors and 429/5xx responses with
+    exponential backoff and jitter, honoring `Retry-After`.
+
+    Args:
+        provider (str): Name of the provider, selects its circuit breaker.
+        request (Callable[[], requests.Response]): Performs one attempt of the request.
+        rate_limiter (Optional[RateLimiter]): Limiter to take a token from before every attempt.
+        metrics (Optional[FetchMetrics]): Metrics of the task, counting every attempt. Its deadline bounds
+                                          the wait for a token, `FETCH_TASK_DEADLINE` from the first
+                                          attempt without it.
+
+    Returns:
+        requests.Response: The first non-retryable response, or the last one once the
+                           retries are exhausted.
+
+    Raises:
+        CircuitOpenError: If the provider's circuit is open.
+        RateLimitTimeout: If no request quota was left before the deadline of the task.
+        requests.RequestException: If the last attempt failed with a timeout or a connection error.
+                                   Other errors of an attempt are raised right away.
+    """
+    circuit_breaker = get_circuit_breaker(provider)
+    max_retries = settings.PROVIDER_MAX_RETRIES
+    if metrics is None:
+        metrics = FetchMetrics()
+
+    for attempt in range(max_retries + 1):
+        # The token is taken first, so a starved bucket never holds the half-open trial.
+        if rate_limiter is not None:
+            rate_limiter.acquire(timeout=metrics.time_left())
+
+        if not circuit_breaker.allow():
+            raise CircuitOpenError(f"{provider} is unavailable, circuit is open.")
+
+        metrics.record_request()
+        try:
+            response = request()
+        except (requests.Timeout, requests.ConnectionError) as e:
+            circuit_breaker.record_failure()
+            if attempt == max_retries:
+                raise
+            delay = get_backoff_delay(attempt)
+            logger.warning(
+                f"{provider}: {type(e).__name__}, retrying in {delay:.2f}s ({attempt + 1}/{max_retries})."
+            )
+            time.sleep(delay)
+            continue
+        except BaseException:
+            # Any other error still ends the attempt, or a half-open trial would never finish.
+            circuit_breaker.record_failure()
+            raise
+
+        if response.status_code not in RETRYABLE_STATUS_CODES:
+            circuit_breaker.record_success()
+            return response
+
+        # Rate limiting means the provider is up, so it does not trip the circuit.
+        if response.status_code == 429:
+            circuit_breaker.record_success()
+        else:
+            circuit_breaker.record_failure()
+
+        if attempt == max_retries:
+            return response
+
+        retry_after = parse_retry_after(response)
+        if retry_after is not None:
+            delay = min(retry_after, settings.PROVIDER_BACKOFF_MAX)
+        else:
+            delay = get_backoff_delay(attempt)
+        logger.warning(
+            f"{provider}: status {response.status_code}, retrying in {delay:.2f}s ({attempt + 1}/{max_retries})."
+        )
+        time.sleep(delay)
+
+    return response
@@ -0,0 +1,213 @@
+import json
+import os
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import IO, Any, Callable, Dict, List, Optional
+from urllib.parse import quote
+
+from src.config import get_settings
+from src.database.populate import continent_country_map
+from src.log import get_logger
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+SEGMENTS_DIR_NAME = "segments"
+SEGMENT_INDEX_NAME = "index.json"
+SEGMENT_DATE_FORMAT = "%Y-%m-%d"
+
+REGIONS = frozenset(continent_country_map)
+
+
+class UnknownRegionError(ValueError):
+    pass
+
+
+def validate_region(region: str) -> str:
+    """
+    Returns the region if it is one of the known `REGIONS`, so a path can safely be built from it.
+
+    Raises:
+        UnknownRegionError: If the region is not known.
+    """
+    if region not in REGIONS:
+        raise UnknownRegionError(f"Unknown region: {region}.")
+    return region
+
+
+def get_task_file_path(region: str, task_id: str) -> Path:
+    return settings.WEATHER_DATA_DIR / validate_region(region) / f"task_{task_id}.json"
+
+
+def get_segments_dir(region: str) -> Path:
+    return settings.WEATHER_DATA_DIR / validate_region(region) / SEGMENTS_DIR_NAME
+
+
+def get_task_result_url(task_id: str, region: str) -> str:
+    """
+    Returns the URL the results of the task for the region are served at, whatever their storage.
+    """
+    return f"/tasks/{quote(task_id, safe='')}/results/{quote(region, safe='')}"
+
+
+def get_segment_path(region: str, segment_date: date) -> Path:
+    return get_segments_dir(region) / f"segment_{segment_date.strftime(SEGMENT_DATE_FORMAT)}.json"
+
+
+def read_json(file_path: Path, default: Any) -> Any:
+    try:
+        with open(file_path, "r") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return default
+
+
+def write_atomically(file_path: Path, write: Callable[[IO], None], mode: str = "wb") -> None:
+    """
+    Lets `write` fill a file next to the final path and renames it, so readers never see a
+    partial file.
+
+    Args:
+        file_path (Path): The final path of the file.
+        write (Callable[[IO], None]): Writes the content to the given file object.
+        mode (str): The mode the temporary file is opened with, "w" for text.
+    """
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    # A unique temporary file, so concurrent writers of the same path do not interleave.
+    with tempfile.NamedTemporaryFile(
+        mode, dir=file_path.parent, prefix=f".{file_path.name}.", suffix=".tmp", delete=False
+    ) as file:
+        try:
+            write(file)
+        except BaseException:
+            os.unlink(file.name)
+            raise
+    os.replace(file.name, file_path)
+
+
+def write_json(file_path: Path, data: Any) -> None:
+    write_atomically(file_path, lambda file: json.dump(data, file), "w")
+
+
+def read_segment_index(region: str) -> Dict[str, str]:
+    """
+    Returns the mapping from the ids of the compacted tasks of the region to their segment files.
+    """
+    return read_json(get_segments_dir(region) / SEGMENT_INDEX_NAME, {})
+
+
+def read_task_region_result(task_id: str, region: str) -> Optional[List[Dict[str, Any]]]:
+    """
+    Reads the results of a task for a region, from its own file or, once compacted, from its segment.
+    The region must be one of the known `REGIONS`.
+
+    Returns:
+        Optional[List[Dict[str, Any]]]: The results of the cities of the region, or None if not found.
+    """
+    task_data = read_json(get_task_file_path(region, task_id), None)
+    if task_data is not None:
+        return task_data
+
+    segment_name = read_segment_index(region).get(task_id)
+    if segment_name is None:
+        return None
+    return read_json(get_segments_dir(region) / segment_name, {}).get(task_id)
+
+
+def compact_region(region_path: Path, min_age: float, retention_days: int) -> int:
+    """
+    Moves the task files of the region older than `min_age` seconds into daily segments
+    (one JSON object per day, keyed by task id) and removes the segments older than
+    `retention_days` days, if it is not 0.
+
+    Returns:
+        int: The number of compacted task files.
+    """
+    region = region_path.name
+    segment_index = read_segment_index(region)
+
+    tasks_by_date: Dict[date, Dict[str, Path]] = {}
+    compact_before = time.time() - min_age
+    for file_path in region_path.glob("task_*.json"):
+        modified_at = file_path.stat().st_mtime
+        if modified_at > compact_before:
+            continue
+        task_id = file_path.stem.removeprefix("task_")
+        tasks_by_date.setdefault(datetime.fromtimestamp(modified_at).date(), {})[
+            task_id
+        ] = file_path
+
+    compacted_files = 0
+    for segment_date, task_file_paths in sorted(tasks_by_date.items()):
+        segment_path = get_segment_path(region, segment_date)
+        segment = read_json(segment_path, {})
+        for task_id, file_path in task_file_paths.items():
+            segment[task_id] = read_json(file_path, [])
+            segment_index[task_id] = segment_path.name
+
+        # The segment and the index are written before the task files are removed,
+        # so a task stays readable throughout and an interrupted run can be repeated.
+        write_json(segment_path, segment)
+        write_json(get_segments_dir(region) / SEGMENT_INDEX_NAME, segment_index)
+        for file_path in task_file_paths.values():
+            file_path.unlink(missing_ok=True)
+        compacted_files += len(task_file_paths)
+
+    if retention_days:
+        expired_segment_names = {
+            segment_path.name
+            for segment_path in get_segments_dir(region).glob("segment_*.json")
+            if datetime.strptime(
+                segment_path.stem.removeprefix("segment_"), SEGMENT_DATE_FORMAT
+            ).date()
+            < date.today() - timedelta(days=retention_days)
+        }
+        if expired_segment_names:
+            segment_index = {
+                task_id: segment_name
+                for task_id, segment_name in segment_index.items()
+                if segment_name not in expired_segment_names
+            }
+            write_json(get_segments_dir(region) / SEGMENT_INDEX_NAME, segment_index)
+            for segment_name in expired_segment_names:
+                (get_segments_dir(region) / segment_name).unlink(missing_ok=True)
+            logger.info(
+                f"Removed {len(expired_segment_names)} expired segments of {region}."
+            )
+
+    return compacted_files
+
+
+def compact_weather_data(
+    min_age: Optional[float] = None, retention_days: Optional[int] = None
+) -> int:
+    """
+    Compacts the task files of every region under `WEATHER_DATA_DIR`.
+
+    Args:
+        min_age (Optional[float]): Seconds a task file is left alone after being written.
+                                   Defaults to `WEATHER_DATA_COMPACTION_MIN_AGE`.
+        retention_days (Optional[int]): Days the segments are kept, 0 to keep them forever.
+                                        Defaults to `WEATHER_DATA_RETENTION_DAYS`.
+
+    Returns:
+        int: The number of compacted task files.
+    """
+    if min_age is None:
+        min_age = settings.WEATHER_DATA_COMPACTION_MIN_AGE
+    if retention_days is None:
+        retention_days = settings.WEATHER_DATA_RETENTION_DAYS
+    if not settings.WEATHER_DATA_DIR.is_dir():
+        return 0
+
+    compacted_files = 0
+    for region_path in sorted(settings.WEATHER_DATA_DIR.iterdir()):
+        if region_path.is_dir() and region_path.name in REGIONS:
+            compacted_files += compact_region(region_path, min_age, retention_days)
+    return compacted_files
+
+
+if __name__ == "__main__":
+    logger.info(f"Compacted {compact_weather_data()} task files.")
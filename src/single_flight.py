@@ -0,0 +1,108 @@
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+from uuid import uuid4
+
+import redis
+
+from src.log import get_logger
+
+logger = get_logger(__name__)
+
+# Deletes the lock only if it still holds the token of its owner, in one atomic step.
+RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+class _Call:
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key within a process: the first caller runs
+    the function, the others wait for it and get the same value (or exception).
+
+    Example:
+        single_flight = SingleFlight()
+        single_flight.do("open_weather:50.45:30.52", lambda: fetch_city(...))
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            call.value = fn()
+            return call.value
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+class RedisLock:
+    """
+    Short-lived lock shared by all workers, used to let a single worker fetch a key while
+    the others wait for the result to show up in the shared cache.
+    """
+
+    def __init__(self, redis_client: redis.Redis, key: str, timeout: float):
+        self.redis_client = redis_client
+        self.key = f"single_flight:{key}"
+        self.timeout = timeout
+        self.token = str(uuid4())
+        self._release_script = redis_client.register_script(RELEASE_LOCK_SCRIPT)
+
+    def acquire(self) -> bool:
+        return bool(
+            self.redis_client.set(
+                self.key, self.token, nx=True, px=int(self.timeout * 1000)
+            )
+        )
+
+    def release(self) -> None:
+        # Only delete the lock if it was not taken over after expiring.
+        self._release_script(keys=[self.key], args=[self.token])
+
+    def wait_for(
+        self, get_value: Callable[[], Optional[Any]], poll_interval: float
+    ) -> Optional[Any]:
+        """
+        Polls `get_value` until it returns a value or the lock is released or expires.
+        """
+        wait_until = time.monotonic() + self.timeout
+        while time.monotonic() < wait_until:
+            value = get_value()
+            if value is not None:
+                return value
+            if not self.redis_client.exists(self.key):
+                return get_value()
+            time.sleep(poll_interval)
+        return None
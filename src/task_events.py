@@ -0,0 +1,164 @@
+import asyncio
+import json
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import redis
+import redis.asyncio
+
+from src.config import get_settings
+from src.log import get_logger
+from src.redis_client import get_redis_client
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+TASK_EVENTS_CHANNEL_PREFIX = "task_events:"
+TASK_EVENTS_RECONNECT_DELAY = 1.0
+
+Subscriber = Tuple[asyncio.AbstractEventLoop, asyncio.Queue]
+
+
+def get_task_events_channel(task_id: str) -> str:
+    return f"{TASK_EVENTS_CHANNEL_PREFIX}{task_id}"
+
+
+class TaskEventBroker:
+    """
+    Fans task status events out to the clients of this process waiting for them.
+
+    Every client gets its own queue. Events may be published from any thread, they are
+    handed over to the event loop of the subscriber.
+
+    Example:
+        broker = get_task_event_broker()
+        queue = await broker.subscribe(task_id)
+        try:
+            event = await queue.get()
+        finally:
+            broker.unsubscribe(task_id, queue)
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[str, List[Subscriber]] = {}
+        self._lock = threading.Lock()
+
+    async def subscribe(self, task_id: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue()
+        with self._lock:
+            self._subscribers.setdefault(task_id, []).append(
+                (asyncio.get_running_loop(), queue)
+            )
+        return queue
+
+    def unsubscribe(self, task_id: str, queue: asyncio.Queue) -> None:
+        with self._lock:
+            subscribers = [
+                subscriber
+                for subscriber in self._subscribers.get(task_id, [])
+                if subscriber[1] is not queue
+            ]
+            if subscribers:
+                self._subscribers[task_id] = subscribers
+            else:
+                self._subscribers.pop(task_id, None)
+
+    def publish(self, task_id: str, event: Dict[str, Any]) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers.get(task_id, []))
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(queue.put_nowait, event)
+
+
+class RedisTaskEventBroker(TaskEventBroker):
+    """
+    Receives the events published by the workers through a single Redis pattern
+    subscription per process, however many clients are waiting.
+
+    The subscription is (re)started by the first subscriber after it was lost and
+    `subscribe` only returns once Redis has confirmed it, so events published right
+    after are not missed.
+    """
+
+    def __init__(self, redis_url: str):
+        super().__init__()
+        self.redis_url = redis_url
+        self._listener: Optional[asyncio.Task] = None
+        self._subscribed: Optional[asyncio.Event] = None
+
+    async def subscribe(self, task_id: str) -> asyncio.Queue:
+        queue = await super().subscribe(task_id)
+        if self._listener is None or self._listener.done():
+            self._subscribed = asyncio.Event()
+            self._listener = asyncio.create_task(self._listen(self._subscribed))
+
+        try:
+            await asyncio.wait_for(
+                self._subscribed.wait(), timeout=settings.TASK_EVENTS_KEEPALIVE_INTERVAL
+            )
+        except asyncio.TimeoutError:
+            logger.warning("Task events subscription is not confirmed yet.")
+        return queue
+
+    def _has_subscribers(self) -> bool:
+        with self._lock:
+            return bool(self._subscribers)
+
+    async def _listen(self, subscribed: asyncio.Event) -> None:
+        # Reconnects while anyone is waiting, the clients re-check the tasks meanwhile.
+        while True:
+            try:
+                await self._listen_once(subscribed)
+            except redis.RedisError as e:
+                logger.warning(f"Task events subscription was lost: {e}")
+            subscribed.clear()
+            if not self._has_subscribers():
+                return
+            await asyncio.sleep(TASK_EVENTS_RECONNECT_DELAY)
+
+    async def _listen_once(self, subscribed: asyncio.Event) -> None:
+        redis_client = redis.asyncio.Redis.from_url(
+            self.redis_url, decode_responses=True
+        )
+        pubsub = redis_client.pubsub()
+        try:
+            await pubsub.psubscribe(f"{TASK_EVENTS_CHANNEL_PREFIX}*")
+            async for message in pubsub.listen():
+                if message["type"] == "psubscribe":
+                    subscribed.set()
+                elif message["type"] == "pmessage":
+                    task_id = message["channel"][len(TASK_EVENTS_CHANNEL_PREFIX) :]
+                    self.publish(task_id, json.loads(message["data"]))
+        finally:
+            await pubsub.aclose()
+            await redis_client.aclose()
+
+
+_task_event_broker: Optional[TaskEventBroker] = None
+_task_event_broker_lock = threading.Lock()
+
+
+def get_task_event_broker() -> TaskEventBroker:
+    global _task_event_broker
+    with _task_event_broker_lock:
+        if _task_event_broker is None:
+            if settings.TASK_EVENTS_BACKEND == "redis":
+                _task_event_broker = RedisTaskEventBroker(settings.REDIS_BACKEND)
+            else:
+                _task_event_broker = TaskEventBroker()
+        return _task_event_broker
+
+
+def publish_task_event(task_id: str, event: Dict[str, Any]) -> None:
+    """
+    Publishes a status event of the task to the clients waiting for it. With the "local"
+    backend only subscribers of the current process (e.g. tests running tasks eagerly) get it.
+    """
+    if settings.TASK_EVENTS_BACKEND != "redis":
+        get_task_event_broker().publish(task_id, event)
+        return
+
+    try:
+        get_redis_client().publish(get_task_events_channel(task_id), json.dumps(event))
+    except redis.RedisError as e:
+        logger.warning(f"Could not publish event of task {task_id}: {e}")
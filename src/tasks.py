@@ -1,15 +1,29 @@
-from celery import Celery
-import requests
+import asyncio
+from celery import Celery, chord
+from celery.result import AsyncResult
+from concurrent.futures import ThreadPoolExecutor
 
-from typing import List, Dict, Any
+from typing import Awaitable, List, Dict, Any, Optional, TypeVar
+from uuid import uuid4
 
+from src.api.service import save_task_result
+from src.columnar_store import compact_results
 from src.config import get_settings
+from src.database.crud import add_weather_results, update_task
+from src.database.db import engine
 from src.log import get_logger
-from src.api.service import process_open_weather_data, process_weatherapi_data
+from src.cache import log_weather_cache_stats
+from src.fetcher import FetchMetrics, fetch_concurrently
+from src.providers import fetch_hedged, get_provider
+from src.redis_client import get_redis_client
+from src.result_segments import compact_weather_data, get_task_result_url
+from src.task_events import publish_task_event
 
 settings = get_settings()
 logger = get_logger(__name__)
 
+T = TypeVar("T")
+
 celery_app = Celery(
     "weather_tasks", broker=settings.REDIS_BROKER, backend=settings.REDIS_BACKEND
 )
@@ -18,30 +32,127 @@ celery_app.conf.update(
     result_expires=3600,
 )
 celery_app.autodiscover_tasks(["src"])
+celery_app.conf.beat_schedule = {}
+if settings.WEATHER_DATA_COMPACTION_INTERVAL > 0:
+    celery_app.conf.beat_schedule["compact-weather-data"] = {
+        "task": "src.tasks.compact_weather_data_files",
+        "schedule": settings.WEATHER_DATA_COMPACTION_INTERVAL,
+    }
+if settings.RESULTS_STORAGE_BACKEND == "parquet":
+    celery_app.conf.beat_schedule["compact-columnar-results"] = {
+        "task": "src.tasks.compact_columnar_results",
+        "schedule": settings.COLUMNAR_COMPACTION_INTERVAL,
+    }
+
+
+def get_task_progress_key(task_id: str) -> str:
+    return f"task_progress:{task_id}"
+
+
+def init_task_progress(task_id: str, total: int) -> None:
+    key = get_task_progress_key(task_id)
+    redis_client = get_redis_client()
+    redis_client.hset(key, mapping={"completed": 0, "total": total})
+    redis_client.expire(key, celery_app.conf.result_expires)
+
+
+def increment_task_progress(task_id: Optional[str]) -> None:
+    if task_id is None:
+        return
+    get_redis_client().hincrby(get_task_progress_key(task_id), "completed", 1)
+
+    progress = get_task_progress(task_id)
+    if progress:
+        publish_task_event(
+            task_id, {"status": "running", "results": None, "progress": progress}
+        )
+
+
+def get_task_progress(task_id: str) -> Optional[Dict[str, int]]:
+    progress = get_redis_client().hgetall(get_task_progress_key(task_id))
+    if not progress:
+        return None
+    return {key: int(value) for key, value in progress.items()}
+
+
+def get_task_metrics_key(task_id: str) -> str:
+    return f"task_metrics:{task_id}"
+
+
+def record_task_metrics(task_id: Optional[str], metrics: FetchMetrics) -> None:
+    """
+    Adds the fetch metrics of a (sub)task to the totals of the task.
+    """
+    if task_id is None:
+        return
+    key = get_task_metrics_key(task_id)
+    redis_client = get_redis_client()
+    pipeline = redis_client.pipeline(transaction=False)
+    pipeline.hincrby(key, "cities", metrics.cities)
+    pipeline.hincrby(key, "requests", metrics.requests)
+    pipeline.expire(key, celery_app.conf.result_expires)
+    pipeline.execute()
+
+
+def get_task_metrics(task_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Returns the fetch metrics of all the (sub)tasks finished so far, see `FetchMetrics.to_dict`.
+    """
+    totals = get_redis_client().hgetall(get_task_metrics_key(task_id))
+    if not totals:
+        return None
+    metrics = FetchMetrics(int(totals.get("cities", 0)))
+    metrics.requests = int(totals.get("requests", 0))
+    return metrics.to_dict()
 
 
 @celery_app.task
-def fetch_weather_data_for_cities(cities: List[Dict]) -> Dict[str, Any]:
-    logger.info("Requesting data from OpenWeather.")
-    request_url = "https://api.openweathermap.org/data/3.0/onecall?"
-    params = {
-        "appid": settings.OPEN_WEATHER_API_KEY,
-        "units": "metric",
-        "exclude": "minutely,hourly,daily",
-    }
+def fetch_weather_for_cities(
+    cities: List[Dict],
+    source: str,
+    secondary_source: Optional[str] = None,
+    progress_id: Optional[str] = None,
+    task_id: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Fetches the weather of the cities from the `source` provider and groups it by region.
+    The fetch metrics are added to those of `task_id`, see `get_task_metrics`.
+
+    With a `secondary_source`, requests are hedged: a city the primary provider has not
+    answered for within its hedge delay is requested from the secondary one too, and the
+    first answer is used.
+    """
+    provider = get_provider(source)
+    secondary_provider = get_provider(secondary_source) if secondary_source else None
+
+    if secondary_provider is None:
+        logger.info(f"Requesting data from {provider.display_name}.")
+    else:
+        logger.info(
+            f"Requesting data from {provider.display_name}, hedged with {secondary_provider.display_name}."
+        )
+
+    metrics = FetchMetrics(len(cities))
+    if secondary_provider is None:
+        results = provider.fetch_many(cities, metrics)
+    else:
+        results = fetch_concurrently(
+            provider.name,
+            cities,
+            lambda city: fetch_hedged(provider, secondary_provider, city, metrics),
+            concurrency=provider.concurrency,
+        )
 
     region_city_temp_map = {}
 
-    for city in cities:
-        logger.info(f"Requesting weather for {city['city']}...")
-        params["lon"] = city["lng"]
-        params["lat"] = city["lat"]
+    for city, result, error in results:
+        if error:
+            logger.error(f"Error while fetching data for {city['city']}: {str(error)}")
+            continue
 
         try:
-            response = requests.get(request_url, params=params)
-            logger.info(f"Received response for {city['city']}: {response.status_code}")
-
-            city_temperature_data = process_open_weather_data(response.json())
+            city_provider, city_data = result
+            city_temperature_data = city_provider.process(city_data)
             if "code" in city_temperature_data and "message" in city_temperature_data:
                 logger.warning(
                     f"Error while processing data for {city['city']}: {city_temperature_data['code']} - {city_temperature_data['message']}"
@@ -56,41 +167,165 @@ def fetch_weather_data_for_cities(cities: List[Dict]) -> Dict[str, Any]:
         except Exception as e:
             logger.error(f"Error while fetching data for {city['city']}: {str(e)}")
 
+    logger.info(f"Fetch metrics: {metrics.to_dict()}")
+    record_task_metrics(task_id, metrics)
+    log_weather_cache_stats()
+    increment_task_progress(progress_id)
     return region_city_temp_map
 
 
 @celery_app.task
-def fetch_weatherapi_data_for_cities(cities: List[Dict]) -> Dict[str, Any]:
-    logger.info("Requesting data from WeatherAPI.")
-    request_url = "https://api.weatherapi.com/v1/current.json"
-    params = {
-        "lang": "en",
-        "key": settings.WEATHERAPI_API_KEY,
-    }
+def fetch_weather_data_for_cities(
+    cities: List[Dict], progress_id: Optional[str] = None
+) -> Dict[str, Any]:
+    return fetch_weather_for_cities(cities, "open_weather", progress_id=progress_id)
 
+
+@celery_app.task
+def fetch_weatherapi_data_for_cities(
+    cities: List[Dict], progress_id: Optional[str] = None
+) -> Dict[str, Any]:
+    return fetch_weather_for_cities(cities, "weather_api", progress_id=progress_id)
+
+
+@celery_app.task
+def merge_region_city_temp_maps(
+    region_city_temp_maps: List[Dict[str, Any]],
+) -> Dict[str, Any]:
     region_city_temp_map = {}
+    for chunk_region_city_temp_map in region_city_temp_maps:
+        for region, region_data in chunk_region_city_temp_map.items():
+            if region not in region_city_temp_map:
+                region_city_temp_map[region] = []
+            region_city_temp_map[region].extend(region_data)
+
+    return region_city_temp_map
+
 
-    for city in cities:
-        logger.info(f"Requesting weather for {city['city']}...")
-        params["q"] = city["city"]
+@celery_app.task
+def compact_columnar_results() -> int:
+    compacted_partitions = compact_results()
+    logger.info(f"Compacted {compacted_partitions} partitions of columnar results.")
+    return compacted_partitions
+
+
+@celery_app.task
+def compact_weather_data_files() -> int:
+    compacted_files = compact_weather_data()
+    logger.info(f"Compacted {compacted_files} task files.")
+    return compacted_files
 
+
+def run_async(coroutine: Awaitable[T]) -> T:
+    """
+    Runs a coroutine of the async database layer from a worker task. The connections are
+    closed afterwards, as they can not be reused by the event loop of the next task.
+    """
+
+    async def run() -> T:
         try:
-            response = requests.get(request_url, params=params)
-            logger.info(f"Received response for {city['city']}: {response.status_code}")
+            return await coroutine
+        finally:
+            await engine.dispose()
 
-            city_temperature_data = process_weatherapi_data(response.json())
-            if "code" in city_temperature_data and "message" in city_temperature_data:
-                logger.warning(
-                    f"Error while processing data for {city['city']}: {city_temperature_data['code']} - {city_temperature_data['message']}"
-                )
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(run())
 
-            city_temperature_data["city"] = city["city_ascii"]
+    # Eagerly executed tasks may be called from a running event loop (e.g. the API).
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, run()).result()
 
-            if city["region"] not in region_city_temp_map:
-                region_city_temp_map[city["region"]] = []
-            region_city_temp_map[city["region"]].append(city_temperature_data)
 
-        except Exception as e:
-            logger.error(f"Error while fetching data for {city['city']}: {str(e)}")
+@celery_app.task
+def save_task_results(
+    region_city_temp_map: Dict[str, Any], task_id: str
+) -> Dict[str, Any]:
+    """
+    Final step of every weather task: writes the region files and completes the `tasks` row, once.
+    The results of the row map every region to the URL its results are served at, the fetch
+    metrics of the task are stored next to them.
+    """
 
-    return region_city_temp_map
+    async def save() -> Dict[str, Any]:
+        region_path_map = await save_task_result(task_id, region_city_temp_map)
+        await add_weather_results(task_id, region_city_temp_map)
+
+        task_data = {
+            "status": "complete",
+            "results": {
+                region: get_task_result_url(task_id, region)
+                for region in region_path_map
+            },
+            "metrics": get_task_metrics(task_id),
+        }
+        await update_task(task_id, task_data)
+        return task_data
+
+    task_data = run_async(save())
+    logger.info(f"Results of task {task_id} were saved.")
+    task_status = {key: value for key, value in task_data.items() if value is not None}
+    publish_task_event(task_id, task_status)
+    return task_status
+
+
+@celery_app.task
+def mark_task_failed(request, exc, traceback, task_id: str) -> None:
+    logger.error(f"Task {task_id} failed: {exc}")
+    run_async(update_task(task_id, {"status": "failed", "results": None}))
+    publish_task_event(task_id, {"status": "failed", "results": None})
+
+
+def fetch_data_for_cities(
+    source: str,
+    cities: List[Dict],
+    secondary_source: Optional[str] = None,
+    task_id: Optional[str] = None,
+) -> AsyncResult:
+    """
+    Starts fetching the weather of the cities from the `source` provider.
+
+    With `TASK_FAN_OUT` enabled, the cities are split into chunks of `TASK_CHUNK_SIZE`, each
+    fetched by its own subtask, and the per-region maps are merged by a chord callback. The
+    number of completed chunks is available through `get_task_progress`.
+
+    Either way the results are persisted by a final `save_task_results` step, which carries the
+    task id and marks the `tasks` row as complete. A failure of any step marks it as failed.
+
+    Args:
+        source (str): Name of the provider, e.g. "open_weather".
+        cities (List[Dict]): Cities to fetch the data for.
+        secondary_source (Optional[str]): Provider to hedge the requests with.
+        task_id (Optional[str]): Id of the task, its `tasks` row is expected to exist already.
+                                 A new one is generated if not provided.
+
+    Returns:
+        AsyncResult: The result of the final step of the task.
+    """
+    if task_id is None:
+        task_id = str(uuid4())
+
+    chunk_size = settings.TASK_CHUNK_SIZE
+    if not settings.TASK_FAN_OUT or len(cities) <= chunk_size:
+        fetch = fetch_weather_for_cities.s(
+            cities, source, secondary_source, task_id=task_id
+        )
+    else:
+        chunks = [
+            cities[i : i + chunk_size] for i in range(0, len(cities), chunk_size)
+        ]
+        init_task_progress(task_id, len(chunks))
+
+        logger.info(f"Splitting {len(cities)} cities into {len(chunks)} subtasks.")
+        header = [
+            fetch_weather_for_cities.s(
+                chunk, source, secondary_source, progress_id=task_id, task_id=task_id
+            )
+            for chunk in chunks
+        ]
+        fetch = chord(header, merge_region_city_temp_maps.s())
+
+    workflow = fetch | save_task_results.s(task_id)
+    workflow.on_error(mark_task_failed.s(task_id))
+    return workflow.apply_async(task_id=task_id)
@@ -0,0 +1,69 @@
+import asyncio
+import io
+
+import pandas as pd
+import pytest
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from src.api import city_index
+from src.database import crud, gazetteer
+from src.database.models import Base, City
+from src.database.populate import prepare_cities
+
+CITIES_CSV = """city,city_ascii,lat,lng,country,admin_name,population,id
+Tokyo,Tokyo,35.6897,139.6922,Japan,Tōkyō,37732000,1
+New York,New York,40.6943,-73.9249,United States,New York,18908608,2
+London,London,51.5072,-0.1275,United Kingdom,"London, City of",11262000,3
+Kyiv,Kyiv,50.45,30.5236,Ukraine,"Kyyiv, Misto",2952301,4
+Paris,Paris,48.8567,2.3522,France,Île-de-France,11208440,5
+Paris,Paris,33.6688,-95.5461,United States,Texas,24476,6
+Paris,Paris,36.302,-88.326,United States,Tennessee,10156,7
+Moscow,Moscow,55.7558,37.6178,Russia,Moskva,17332000,8
+Kraków,Krakow,50.0614,19.9372,Poland,Małopolskie,766683,9
+Lviv,Lviv,49.8419,24.0311,Ukraine,L’vivs’ka Oblast’,717273,10
+"""
+
+
+@pytest.fixture
+def database(monkeypatch, tmp_path) -> async_sessionmaker:
+    """
+    A fresh SQLite database with all the tables, used by the crud and gazetteer functions.
+    Connections are not pooled, so every test can drive it from its own event loop.
+    """
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'db.sqlite3'}", poolclass=NullPool
+    )
+
+    async def create_tables() -> None:
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+
+    asyncio.run(create_tables())
+    session_maker = async_sessionmaker(
+        bind=engine, class_=AsyncSession, expire_on_commit=False
+    )
+    for module in (crud, gazetteer):
+        monkeypatch.setattr(module, "AsyncSessionLocal", session_maker)
+    # The process-wide gazetteer and index are loaded again from this database.
+    monkeypatch.setattr(gazetteer, "_gazetteer", None)
+    monkeypatch.setattr(city_index, "_city_index", None)
+    yield session_maker
+    asyncio.run(engine.dispose())
+
+
+@pytest.fixture
+def cities(database) -> pd.DataFrame:
+    """
+    The cities of `CITIES_CSV`, loaded into the database.
+    """
+    rows = prepare_cities(pd.read_csv(io.StringIO(CITIES_CSV)))
+
+    async def add_cities() -> None:
+        async with database() as session:
+            await session.execute(insert(City), rows.to_dict("records"))
+            await session.commit()
+
+    asyncio.run(add_cities())
+    return rows
@@ -0,0 +1,64 @@
+import pytest
+
+from src import cache
+from src.cache import LocalWeatherCache, RedisWeatherCache, get_or_fetch
+
+
+def test_local_cache_evicts_least_recently_used_entries():
+    weather_cache = LocalWeatherCache(max_size=2, ttl=60.0)
+    weather_cache.set("kyiv", 1)
+    weather_cache.set("lviv", 2)
+    assert weather_cache.get("kyiv") == 1
+
+    weather_cache.set("odesa", 3)
+
+    assert weather_cache.get("lviv") is None
+    assert weather_cache.get("kyiv") == 1
+    assert weather_cache.get("odesa") == 3
+    assert weather_cache.stats() == {"hits": 3, "misses": 1, "size": 2}
+
+
+def test_local_cache_entries_expire(monkeypatch):
+    now = 1000.0
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now)
+    weather_cache = LocalWeatherCache(max_size=10, ttl=60.0)
+    weather_cache.set("kyiv", 1)
+    weather_cache.set("lviv", 2, ttl=600.0)
+
+    now += 61.0
+
+    assert weather_cache.get("kyiv") is None
+    assert weather_cache.get("lviv") == 2
+    assert weather_cache.stats()["size"] == 1
+
+
+def test_redis_cache_evicts_least_recently_used_entries():
+    fakeredis = pytest.importorskip("fakeredis")
+    weather_cache = RedisWeatherCache(
+        fakeredis.FakeRedis(decode_responses=True), max_size=2, ttl=60.0
+    )
+    weather_cache.set("kyiv", {"temp": 1})
+    weather_cache.set("lviv", {"temp": 2})
+    assert weather_cache.get("kyiv") == {"temp": 1}
+
+    weather_cache.set("odesa", {"temp": 3})
+
+    assert weather_cache.peek("lviv") is None
+    assert weather_cache.peek("kyiv") == {"temp": 1}
+    assert weather_cache.stats() == {"hits": 1, "misses": 0, "size": 2}
+
+
+def test_only_cacheable_values_are_cached(monkeypatch):
+    weather_cache = LocalWeatherCache(max_size=10, ttl=60.0)
+    monkeypatch.setattr(cache, "get_weather_cache", lambda: weather_cache)
+    monkeypatch.setattr(cache.settings, "WEATHER_COALESCE_ACROSS_WORKERS", False)
+    fetches = []
+
+    def fetch(value, cacheable):
+        fetches.append(value)
+        return value, cacheable
+
+    assert get_or_fetch("kyiv", lambda: fetch({"cod": 500}, False)) == {"cod": 500}
+    assert get_or_fetch("kyiv", lambda: fetch({"temp": 1}, True)) == {"temp": 1}
+    assert get_or_fetch("kyiv", lambda: fetch({"temp": 2}, True)) == {"temp": 1}
+    assert fetches == [{"cod": 500}, {"temp": 1}]
@@ -0,0 +1,133 @@
+import asyncio
+import random
+import string
+import threading
+import time
+
+import Levenshtein
+import pytest
+
+from src.api import city_index
+from src.api.city_index import CityIndex
+from src.database.gazetteer import Gazetteer
+
+NAMES = [
+    "London",
+    "Londrina",
+    "Paris",
+    "Parys",
+    "Kyiv",
+    "Kiev",
+    "Lviv",
+    "São Paulo",
+    "Kraków",
+    "New York",
+]
+
+
+def mutate(name: str, rng: random.Random) -> str:
+    position = rng.randrange(len(name))
+    letter = rng.choice(string.ascii_lowercase)
+    return rng.choice(
+        [
+            name[:position] + letter + name[position + 1 :],
+            name[:position] + letter + name[position:],
+            name[:position] + name[position + 1 :],
+        ]
+    )
+
+
+@pytest.fixture(scope="module")
+def gazetteer() -> Gazetteer:
+    rng = random.Random(42)
+    rows = []
+    for city_id in range(1, 501):
+        city = mutate(rng.choice(NAMES), rng) if city_id > len(NAMES) else NAMES[city_id - 1]
+        rows.append(
+            (
+                city_id,
+                city,
+                city.encode("ascii", "ignore").decode() or city,
+                0.0,
+                0.0,
+                rng.choice(["France", "United States", "Ukraine"]),
+                rng.choice(["Texas", "Tennessee", ""]),
+                "Europe",
+                rng.choice([None, rng.randrange(1_000_000)]),
+            )
+        )
+    return Gazetteer(rows, version=1)
+
+
+def linear_top_k(gazetteer, city_name, k, max_distance, country=None, admin_name=None):
+    scored = []
+    for position in range(len(gazetteer)):
+        score = Levenshtein.distance(gazetteer.city[position], city_name) + Levenshtein.distance(
+            gazetteer.city_ascii[position], city_name
+        )
+        if score <= max_distance:
+            scored.append((score, gazetteer.rank(position, country, admin_name), position))
+    scored.sort()
+    return [(gazetteer.id[position], score) for score, _, position in scored[:k]]
+
+
+@pytest.mark.parametrize("max_distance", [0, 2, 4, 6])
+def test_top_k_matches_linear_scan(gazetteer, max_distance):
+    index = CityIndex(gazetteer)
+    rng = random.Random(max_distance)
+    queries = [*NAMES, *(mutate(rng.choice(NAMES), rng) for _ in range(50)), "Xyz", "A"]
+
+    for query in queries:
+        for country, admin_name in [(None, None), ("Ukraine", None), ("United States", "Texas")]:
+            matches = index.top_k(query, 5, max_distance, country, admin_name)
+            assert [(city["id"], score) for city, score in matches] == linear_top_k(
+                gazetteer, query, 5, max_distance, country, admin_name
+            ), query
+
+
+def test_best_match_prefers_hinted_city_among_equal_scores():
+    gazetteer = Gazetteer(
+        [
+            (1, "Paris", "Paris", 0.0, 0.0, "France", "Île-de-France", "Europe", 11208440),
+            (2, "Paris", "Paris", 0.0, 0.0, "United States", "Tennessee", "North America", 10156),
+        ],
+        version=1,
+    )
+    index = CityIndex(gazetteer)
+
+    assert index.best_match("Pariss", max_distance=2)["id"] == 1
+    assert index.best_match("Pariss", max_distance=2, admin_name="tennessee")["id"] == 2
+    assert index.best_match("Berlin", max_distance=2) is None
+
+
+def test_concurrent_requests_share_one_build_off_the_event_loop(database, monkeypatch):
+    builds = []
+
+    class SlowCityIndex(CityIndex):
+        def __init__(self, gazetteer: Gazetteer):
+            builds.append(threading.get_ident())
+            time.sleep(0.2)
+            super().__init__(gazetteer)
+
+    monkeypatch.setattr(city_index, "CityIndex", SlowCityIndex)
+
+    async def get_city_indexes():
+        ticks = 0
+
+        async def tick() -> None:
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker = asyncio.create_task(tick())
+        indexes = await asyncio.gather(*(city_index.get_city_index() for _ in range(5)))
+        ticker.cancel()
+        return indexes, ticks
+
+    indexes, ticks = asyncio.run(get_city_indexes())
+
+    assert len({id(index) for index in indexes}) == 1
+    assert len(builds) == 1 and builds[0] != threading.get_ident()
+    # The event loop kept running while the index was built.
+    assert ticks >= 10
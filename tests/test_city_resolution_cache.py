@@ -0,0 +1,47 @@
+import pytest
+
+from src.api.city_resolution_cache import (
+    UNRESOLVED_CITY_ID,
+    CityResolutionCache,
+    LocalResolutionStore,
+    RedisResolutionStore,
+)
+
+
+def test_names_are_cached_by_normalized_form_and_version():
+    cache = CityResolutionCache(LocalResolutionStore(10))
+    cache.set_many({"London": 34, "Atlantis": None}, version=1)
+
+    assert cache.get_many([" london ", "ATLANTIS", "Kyiv"], version=1) == {
+        " london ": 34,
+        "ATLANTIS": UNRESOLVED_CITY_ID,
+    }
+    assert cache.get_many(["London"], version=2) == {}
+
+
+def test_expired_and_least_recently_used_names_are_dropped():
+    cache = CityResolutionCache(LocalResolutionStore(2), negative_ttl=-1.0)
+    cache.set_many({"Atlantis": None}, version=1)
+    assert cache.get_many(["Atlantis"], version=1) == {}
+
+    cache.set_many({"London": 1, "Kyiv": 2}, version=1)
+    cache.get_many(["London"], version=1)
+    cache.set_many({"Paris": 3}, version=1)
+    assert cache.get_many(["London", "Kyiv", "Paris"], version=1) == {"London": 1, "Paris": 3}
+
+
+def test_hit_rate_counts_both_tiers():
+    fakeredis = pytest.importorskip("fakeredis")
+    redis_store = RedisResolutionStore(fakeredis.FakeRedis(decode_responses=True))
+    CityResolutionCache(LocalResolutionStore(10), redis_store).set_many(
+        {"London": 34}, version=1
+    )
+
+    cache = CityResolutionCache(LocalResolutionStore(10), redis_store)
+    assert cache.get_many(["London", "Kyiv"], version=1) == {"London": 34}
+    assert cache.get_many(["London"], version=1) == {"London": 34}
+
+    stats = cache.stats()
+    assert (stats["lookups"], stats["local_hits"], stats["redis_hits"]) == (3, 1, 1)
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == round(2 / 3, 3)
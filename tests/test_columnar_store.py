@@ -0,0 +1,101 @@
+from pathlib import Path
+
+import pytest
+
+from src import columnar_store
+from src.columnar_store import (
+    COMPACTION_MANIFEST_NAME,
+    append_results,
+    compact_results,
+    read_results,
+)
+
+pytest.importorskip("pyarrow")
+
+TIME = "2025-02-23 16:20:00"
+
+
+@pytest.fixture(autouse=True)
+def columnar_data_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(columnar_store.settings, "COLUMNAR_DATA_DIR", tmp_path)
+    return tmp_path
+
+
+def test_string_error_code_is_stored():
+    append_results(
+        "task",
+        {
+            "Europe": [
+                {"city": "Kyiv", "temp": 1.5, "description": "Sunny", "time": TIME},
+                {"city": "Nowhere", "code": "404", "message": "City not found.", "time": TIME},
+                {"city": "Elsewhere", "code": "unknown", "message": "Error.", "time": TIME},
+            ]
+        },
+    )
+
+    frame = read_results("Europe", columns=["city", "code", "message"])
+
+    codes = dict(zip(frame["city"], frame["code"]))
+    assert codes["Nowhere"] == 404
+    assert codes["Kyiv"] != codes["Kyiv"]  # NaN
+    assert len(frame) == 3
+
+
+def test_missing_pyarrow_is_reported_once(monkeypatch, caplog):
+    monkeypatch.setattr(columnar_store.settings, "RESULTS_STORAGE_BACKEND", "parquet")
+    monkeypatch.setattr(columnar_store, "pa", None)
+    columnar_store.warn_pyarrow_missing.cache_clear()
+
+    assert not columnar_store.use_columnar_storage()
+    assert not columnar_store.use_columnar_storage()
+    assert caplog.text.count("pyarrow is not installed") == 1
+
+
+def append_cities(*cities):
+    for city in cities:
+        append_results(
+            f"task-{city}",
+            {"Europe": [{"city": city, "temp": 1.5, "description": "Sunny", "time": TIME}]},
+        )
+
+
+def get_partition_files(columnar_data_dir):
+    return sorted(
+        path.name for path in (columnar_data_dir / "region=Europe" / "date=2025-02-23").iterdir()
+    )
+
+
+def test_partition_files_are_compacted(columnar_data_dir):
+    append_cities("Kyiv", "Lviv", "Odesa")
+
+    assert compact_results(min_files=4) == 0
+    assert compact_results(min_files=3) == 1
+
+    files = get_partition_files(columnar_data_dir)
+    assert len(files) == 1 and files[0].startswith("compacted-")
+    assert sorted(read_results("Europe")["city"]) == ["Kyiv", "Lviv", "Odesa"]
+
+
+def test_interrupted_compaction_is_finished_by_the_next_one(columnar_data_dir, monkeypatch):
+    append_cities("Kyiv", "Lviv", "Odesa")
+    unlink = Path.unlink
+    interrupted = []
+
+    def interrupted_unlink(path, missing_ok=False):
+        if not interrupted:
+            interrupted.append(path)
+            raise KeyboardInterrupt
+        unlink(path, missing_ok=missing_ok)
+
+    monkeypatch.setattr(Path, "unlink", interrupted_unlink)
+    with pytest.raises(KeyboardInterrupt):
+        compact_results(min_files=2)
+    assert COMPACTION_MANIFEST_NAME in get_partition_files(columnar_data_dir)
+    # The merged rows are not lost, only seen twice.
+    assert len(read_results("Europe")) == 6
+
+    assert compact_results(min_files=10) == 0
+
+    files = get_partition_files(columnar_data_dir)
+    assert len(files) == 1 and files[0].startswith("compacted-")
+    assert sorted(read_results("Europe")["city"]) == ["Kyiv", "Lviv", "Odesa"]
@@ -0,0 +1,117 @@
+import json
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from src import cache, resilience
+from src.fetcher import DeadlineExceeded, FetchMetrics, fetch_concurrently, get_session
+from src.providers import WeatherProvider
+
+
+class StubWeatherHandler(BaseHTTPRequestHandler):
+    """
+    Answers like OpenWeather: a 503 on the first request of "Flaky", a 404 for "Nowhere".
+    """
+
+    def do_GET(self):
+        city = parse_qs(urlparse(self.path).query)["q"][0]
+        self.server.requests[city] += 1
+
+        if city == "Flaky" and self.server.requests[city] == 1:
+            self.send_json(503, {"cod": 503, "message": "Service unavailable."})
+        elif city == "Nowhere":
+            self.send_json(404, {"cod": "404", "message": "City not found."})
+        else:
+            self.send_json(200, {"current": {"temp": len(city), "weather": []}})
+
+    def send_json(self, status_code: int, data: Dict):
+        body = json.dumps(data).encode()
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServerProvider(WeatherProvider):
+    name = "stub_server"
+
+    def get_cache_key(self, city: Dict) -> str:
+        return f"{self.name}:{city['city']}"
+
+    def get_params(self, city: Dict) -> Dict:
+        return {"q": city["city"]}
+
+    def process(self, data: Dict) -> Dict:
+        if "cod" in data:
+            return {"code": data["cod"], "message": data["message"]}
+        return {"temp": data["current"]["temp"], "description": ""}
+
+
+@pytest.fixture
+def stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubWeatherHandler)
+    server.requests = Counter()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def provider(monkeypatch, stub_server) -> StubServerProvider:
+    monkeypatch.setattr(cache.settings, "WEATHER_CACHE_ENABLED", False)
+    monkeypatch.setattr(resilience.settings, "PROVIDER_BACKOFF_BASE", 0.0)
+    monkeypatch.setitem(
+        resilience._circuit_breakers,
+        "stub_server",
+        resilience.CircuitBreaker("stub_server", failure_threshold=10, reset_timeout=60.0),
+    )
+    host, port = stub_server.server_address
+    return StubServerProvider(f"http://{host}:{port}/weather", 4, 2.0, 0, 1)
+
+
+def test_cities_are_fetched_in_order_with_retries(provider, stub_server):
+    cities = [{"city": name} for name in ("Kyiv", "Flaky", "Nowhere", "London")]
+    metrics = FetchMetrics(cities=len(cities))
+
+    results = provider.fetch_many(cities, metrics)
+
+    assert [city for city, _, _ in results] == cities
+    assert all(error is None for _, _, error in results)
+    processed = [result[0].process(result[1]) for _, result, _ in results]
+    assert processed == [
+        {"temp": 4, "description": ""},
+        {"temp": 5, "description": ""},
+        {"code": "404", "message": "City not found."},
+        {"temp": 6, "description": ""},
+    ]
+    assert stub_server.requests["Flaky"] == 2
+    assert metrics.requests == 5
+
+
+def test_session_is_reused_per_provider():
+    assert get_session("stub_server", 4) is get_session("stub_server", 4)
+    assert get_session("stub_server", 4) is not get_session("other_stub_server", 4)
+
+
+def test_cities_not_fetched_before_deadline_are_reported():
+    def fetch_city(city: str) -> str:
+        if city == "slow":
+            time.sleep(0.5)
+        return city.upper()
+
+    results = fetch_concurrently("test", ["fast", "slow"], fetch_city, concurrency=2, deadline=0.1)
+
+    assert results[0] == ("fast", "FAST", None)
+    assert results[1][1] is None
+    assert isinstance(results[1][2], DeadlineExceeded)
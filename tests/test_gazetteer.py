@@ -0,0 +1,49 @@
+import pytest
+
+from src.database.gazetteer import Gazetteer
+
+CITIES = [
+    (1, "Paris", "Paris", 48.8567, 2.3522, "France", "Île-de-France", "Europe", 11208440),
+    (2, "Paris", "Paris", 33.6688, -95.5461, "United States", "Texas", "North America", 24476),
+    (3, "Paris", "Paris", 36.3020, -88.3260, "United States", "Tennessee", "North America", 10156),
+    (4, "Moscow", "Moscow", 55.7558, 37.6178, "Russia", "Moskva", "Europe", 17332000),
+    (5, "Moscow", "Moscow", 46.7324, -117.0002, "United States", "Idaho", "North America", 25435),
+    (6, "Kyiv", "Kyiv", 50.45, 30.5236, "Ukraine", "Kyyiv, Misto", "Europe", 2952301),
+    (7, "Kiev", "Kiev", 35.0, -100.0, "United States", "Texas", "North America", 50),
+]
+ALIASES = [("москва", 4), ("kiev", 6)]
+
+
+@pytest.fixture
+def gazetteer():
+    return Gazetteer(CITIES, version=1, aliases=ALIASES)
+
+
+def city_id(gazetteer, position):
+    return None if position is None else gazetteer.id[position]
+
+
+@pytest.mark.parametrize(
+    "country, admin_name, expected_id",
+    [
+        (None, None, 1),
+        ("united states", None, 2),
+        ("United States", "Tennessee", 3),
+        (None, "texas", 2),
+        ("Narnia", None, 1),
+    ],
+)
+def test_find_prefers_hinted_then_most_populous(gazetteer, country, admin_name, expected_id):
+    assert city_id(gazetteer, gazetteer.find(" PARIS ", country, admin_name)) == expected_id
+
+
+def test_find_alias(gazetteer):
+    assert city_id(gazetteer, gazetteer.find_alias("Москва")) == 4
+    assert gazetteer.find_alias("Moscow") is None
+
+
+def test_find_name_or_alias_prefers_hinted_alias_over_name(gazetteer):
+    assert city_id(gazetteer, gazetteer.find_name_or_alias(["Kiev"])) == 7
+    assert city_id(gazetteer, gazetteer.find_name_or_alias(["Kiev"], "Ukraine")) == 6
+    assert city_id(gazetteer, gazetteer.find_name_or_alias(["Москва", "Moskva"])) == 4
+    assert gazetteer.find_name_or_alias(["Atlantis"]) is None
@@ -0,0 +1,42 @@
+import asyncio
+import json
+from datetime import datetime
+
+from src.database.crud import get_region_results
+from src.database.index_results import index_result_files
+from src.result_segments import SEGMENTS_DIR_NAME
+
+
+def write_json(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(data))
+
+
+def test_result_files_and_segments_are_indexed_once(database, tmp_path):
+    write_json(
+        tmp_path / "Europe" / "task_a.json",
+        [{"city": "Kyiv", "temperature": 1.5, "time": "2025-01-02 03:04:05"}],
+    )
+    write_json(tmp_path / "Europe" / "task_b.json", [{"city": "Lviv", "temperature": 2.5}])
+    write_json(tmp_path / "Europe" / "task_broken.json", {"code": 500})
+    write_json(
+        tmp_path / "Europe" / SEGMENTS_DIR_NAME / "segment_2025-01-01.json",
+        {"c": [{"city": "Odesa", "temperature": 3.5}]},
+    )
+
+    assert asyncio.run(index_result_files(tmp_path)) == 3
+    assert asyncio.run(index_result_files(tmp_path)) == 0
+
+    results = asyncio.run(get_region_results("Europe"))
+    assert sorted((result.task_id, result.city) for result in results) == [
+        ("a", "Kyiv"),
+        ("b", "Lviv"),
+        ("c", "Odesa"),
+    ]
+    kyiv = next(result for result in results if result.city == "Kyiv")
+    assert kyiv.fetched_at == datetime(2025, 1, 2, 3, 4, 5)
+    assert kyiv.data == {"temperature": 1.5}
+
+
+def test_missing_weather_data_dir_is_skipped(database, tmp_path):
+    assert asyncio.run(index_result_files(tmp_path / "missing")) == 0
@@ -0,0 +1,228 @@
+import asyncio
+import io
+
+import pandas as pd
+import pytest
+from sqlalchemy import func, insert, select
+
+from src.database import populate
+from src.database.models import City, ImportCheckpoint
+from src.database.populate import (
+    CITY_COLUMNS,
+    DEFAULT_REGION,
+    populate_cities_from_csv,
+    prepare_cities,
+    read_csv_records,
+    stream_cities_from_csv,
+)
+from src.result_segments import validate_region
+
+HEADER = "city,city_ascii,lat,lng,country,admin_name,population,id\n"
+
+
+def write_cities_csv(csv_file_path, count):
+    with open(csv_file_path, "w") as file:
+        file.write(HEADER)
+        for i in range(1, count + 1):
+            file.write(f'"City {i}","City {i}",1.5,2.5,"Ukraine","Oblast, {i}",{i * 10},{i}\n')
+
+
+def test_cities_of_unlisted_countries_get_the_default_region():
+    df = pd.read_csv(
+        io.StringIO(
+            HEADER
+            + '"Laayoune","Laayoune",27.15,-13.2,"Western Sahara","",217732,1\n'
+            + '"Kyiv","Kyiv",50.45,30.52,"Ukraine","Kyyiv, Misto",2952301,2\n'
+        )
+    )
+
+    cities = prepare_cities(df)
+
+    assert list(cities["region"]) == [DEFAULT_REGION, "Europe"]
+    assert validate_region(DEFAULT_REGION) == DEFAULT_REGION
+
+
+def test_prepare_cities():
+    df = pd.read_csv(
+        io.StringIO(
+            HEADER
+            + '"Kraków","Krakow",50.06,19.94,"Poland","Małopolskie",766683.0,1\n'
+            + '"Kyiv","Kyiv",50.45,30.52,"Ukraine","Kyyiv, Misto",,2\n'
+        )
+    )
+
+    cities = prepare_cities(df)
+
+    assert list(cities.columns) == list(CITY_COLUMNS)
+    assert cities.to_dict("records")[0] == {
+        "source_id": 1,
+        "city": "Kraków",
+        "city_ascii": "Krakow",
+        "lat": 50.06,
+        "lng": 19.94,
+        "country": "Poland",
+        "admin_name": "Małopolskie",
+        "region": "Europe",
+        "population": 766683,
+    }
+    assert cities["population"][1] is None
+
+
+def test_prepare_cities_without_id_and_population():
+    cities = prepare_cities(
+        pd.DataFrame(
+            [
+                {
+                    "city": "Kyiv",
+                    "city_ascii": "Kyiv",
+                    "lat": 50.45,
+                    "lng": 30.52,
+                    "country": "Ukraine",
+                    "admin_name": "Kyyiv, Misto",
+                }
+            ]
+        )
+    )
+
+    assert cities["source_id"][0] is None
+    assert cities["population"][0] is None
+
+
+def test_read_csv_records_keeps_quoted_newlines_together():
+    file = io.BytesIO(b'a,b\n"multi\nline",1\n"say ""hi""",2\nlast,3\n')
+
+    assert read_csv_records(file, 1) == b"a,b\n"
+    assert read_csv_records(file, 2) == b'"multi\nline",1\n"say ""hi""",2\n'
+    assert read_csv_records(file, 2) == b"last,3\n"
+    assert read_csv_records(file, 2) == b""
+
+
+def count_rows(database, model):
+    async def count() -> int:
+        async with database() as session:
+            result = await session.execute(select(func.count()).select_from(model))
+            return result.scalar()
+
+    return asyncio.run(count())
+
+
+def stream(database, csv_file_path, **kwargs):
+    async def run() -> int:
+        async with database() as session:
+            return await stream_cities_from_csv(
+                csv_file_path, session, chunk_size=10, **kwargs
+            )
+
+    return asyncio.run(run())
+
+
+@pytest.fixture
+def interrupt_after(monkeypatch):
+    def interrupt(chunks: int) -> None:
+        prepared_chunks = []
+
+        def prepare_cities_until_interrupted(df: pd.DataFrame) -> pd.DataFrame:
+            if len(prepared_chunks) == chunks:
+                raise KeyboardInterrupt
+            prepared_chunks.append(df)
+            return prepare_cities(df)
+
+        monkeypatch.setattr(populate, "prepare_cities", prepare_cities_until_interrupted)
+
+    return interrupt
+
+
+def test_interrupted_import_resumes_without_duplicates(database, tmp_path, interrupt_after):
+    csv_file_path = tmp_path / "cities.csv"
+    write_cities_csv(csv_file_path, 45)
+
+    interrupt_after(2)
+    with pytest.raises(KeyboardInterrupt):
+        stream(database, csv_file_path)
+    assert count_rows(database, City) == 20
+    assert count_rows(database, ImportCheckpoint) == 1
+
+    interrupt_after(100)
+    assert stream(database, csv_file_path) == 45
+
+    assert count_rows(database, City) == 45
+    assert count_rows(database, ImportCheckpoint) == 0
+
+
+def test_changed_file_is_imported_from_the_start(database, tmp_path, interrupt_after):
+    csv_file_path = tmp_path / "cities.csv"
+    write_cities_csv(csv_file_path, 25)
+
+    interrupt_after(1)
+    with pytest.raises(KeyboardInterrupt):
+        stream(database, csv_file_path)
+
+    write_cities_csv(csv_file_path, 30)
+    interrupt_after(100)
+    assert stream(database, csv_file_path, upsert=True) == 30
+    assert count_rows(database, City) == 30
+
+
+def test_restart_ignores_checkpoint(database, tmp_path, interrupt_after):
+    csv_file_path = tmp_path / "cities.csv"
+    write_cities_csv(csv_file_path, 25)
+
+    interrupt_after(1)
+    with pytest.raises(KeyboardInterrupt):
+        stream(database, csv_file_path)
+
+    interrupt_after(100)
+    assert stream(database, csv_file_path, upsert=True, resume=False) == 25
+    assert count_rows(database, City) == 25
+
+
+@pytest.fixture
+def legacy_cities(database, tmp_path):
+    """
+    The cities of a CSV file, loaded without their `source_id` and population as by the
+    imports before those columns existed.
+    """
+    csv_file_path = tmp_path / "cities.csv"
+    write_cities_csv(csv_file_path, 25)
+    rows = prepare_cities(pd.read_csv(csv_file_path)).to_dict("records")
+
+    async def add_cities() -> None:
+        async with database() as session:
+            await session.execute(
+                insert(City),
+                [{**row, "source_id": None, "population": None} for row in rows],
+            )
+            await session.commit()
+
+    asyncio.run(add_cities())
+    return csv_file_path
+
+
+def get_cities(database):
+    async def run():
+        async with database() as session:
+            result = await session.execute(
+                select(City.id, City.source_id, City.population).order_by(City.id)
+            )
+            return result.all()
+
+    return asyncio.run(run())
+
+
+def test_upsert_adopts_cities_loaded_without_source_id(database, legacy_cities):
+    async def run() -> None:
+        async with database() as session:
+            await populate_cities_from_csv(legacy_cities, session, upsert=True, chunk_size=10)
+
+    asyncio.run(run())
+
+    assert get_cities(database) == [(i, i, i * 10) for i in range(1, 26)]
+
+
+def test_streamed_upsert_adopts_cities_loaded_without_source_id(
+    database, legacy_cities, interrupt_after
+):
+    interrupt_after(100)
+    assert stream(database, legacy_cities, upsert=True) == 25
+
+    assert get_cities(database) == [(i, i, i * 10) for i in range(1, 26)]
@@ -0,0 +1,49 @@
+import asyncio
+
+from sqlalchemy import select
+
+from src.database.models import CityAlias
+from src.database.populate_aliases import populate_aliases_from_csv
+
+ALIASES_CSV = """source_id,city_ascii,country,alias
+2,,,Big Apple
+, krakow ,Poland,Cracow
+,Krakow,Poland,Краків
+4,,,
+,Atlantis,Nowhere,Atlantida
+"""
+
+
+def populate_aliases(database, csv_file_path) -> int:
+    async def run() -> int:
+        async with database() as session:
+            return await populate_aliases_from_csv(csv_file_path, session, chunk_size=2)
+
+    return asyncio.run(run())
+
+
+def get_aliases(database):
+    async def run():
+        async with database() as session:
+            result = await session.execute(
+                select(CityAlias.city_id, CityAlias.alias, CityAlias.alias_lower).order_by(
+                    CityAlias.alias
+                )
+            )
+            return result.all()
+
+    return asyncio.run(run())
+
+
+def test_aliases_are_loaded_once(database, cities, tmp_path):
+    csv_file_path = tmp_path / "city_aliases.csv"
+    csv_file_path.write_text(ALIASES_CSV)
+
+    assert populate_aliases(database, csv_file_path) == 3
+    assert populate_aliases(database, csv_file_path) == 3
+
+    assert get_aliases(database) == [
+        (2, "Big Apple", "big apple"),
+        (9, "Cracow", "cracow"),
+        (9, "Краків", "краків"),
+    ]
@@ -0,0 +1,136 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+import pytest
+
+from src import cache, providers, resilience
+from src.cache import LocalWeatherCache
+from src.fetcher import FetchMetrics
+from src.providers import WeatherAPIProvider, WeatherProvider, fetch_hedged
+
+
+class StubProvider(WeatherProvider):
+    def __init__(self, name: str, data: Dict, delay: float = 0.0):
+        super().__init__("http://localhost", 1, 1.0, 0, 1)
+        self.name = self.display_name = name
+        self.data = data
+        self.delay = delay
+
+    def get_cache_key(self, city: Dict) -> str:
+        return f"{self.name}:{city['city']}"
+
+    def get_params(self, city: Dict) -> Dict:
+        return {"q": city["city"]}
+
+    def process(self, data: Dict) -> Dict:
+        if "cod" in data:
+            return {"code": data["cod"], "message": data["message"]}
+        return {"temp": data["temp"], "description": ""}
+
+    def fetch(self, city: Dict, metrics: Optional[FetchMetrics] = None) -> Dict:
+        time.sleep(self.delay)
+        return self.data
+
+
+CITY = {"city": "Kyiv"}
+
+
+def test_weather_provider_is_abstract():
+    with pytest.raises(TypeError):
+        WeatherProvider("http://localhost", 1, 1.0, 0, 1)
+
+
+def test_fast_error_response_does_not_beat_hedge():
+    primary = StubProvider("primary", {"cod": 429, "message": "Too many requests."})
+    secondary = StubProvider("secondary", {"temp": 1.5}, delay=0.05)
+
+    provider, data = fetch_hedged(primary, secondary, CITY)
+
+    assert provider is secondary
+    assert data == {"temp": 1.5}
+
+
+def test_error_response_is_returned_when_no_provider_succeeds():
+    primary = StubProvider("primary", {"cod": 500, "message": "Internal error."})
+    secondary = StubProvider("secondary", {"cod": "404", "message": "Not found."})
+
+    provider, data = fetch_hedged(primary, secondary, CITY)
+
+    assert "cod" in data
+
+
+class StubBulkHandler(BaseHTTPRequestHandler):
+    """
+    Answers like the WeatherAPI bulk endpoint, leaving "Nowhere" out of the response.
+    """
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.bulk_requests.append([location["q"] for location in body["locations"]])
+        data = {
+            "bulk": [
+                {"query": {**location, "current": {"temp_c": len(location["q"])}}}
+                for location in body["locations"]
+                if location["q"] != "Nowhere"
+            ]
+        }
+
+        payload = json.dumps(data).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def bulk_provider(monkeypatch) -> WeatherAPIProvider:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubBulkHandler)
+    server.bulk_requests = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    weather_cache = LocalWeatherCache(max_size=10, ttl=60.0)
+    monkeypatch.setattr(cache, "get_weather_cache", lambda: weather_cache)
+    monkeypatch.setattr(providers.settings, "WEATHERAPI_BULK_ENABLED", True)
+    monkeypatch.setattr(providers.settings, "WEATHERAPI_BULK_SIZE", 2)
+    monkeypatch.setitem(
+        resilience._circuit_breakers,
+        "weather_api",
+        resilience.CircuitBreaker("weather_api", failure_threshold=10, reset_timeout=60.0),
+    )
+    provider = WeatherAPIProvider()
+    host, port = server.server_address
+    provider.api_url = f"http://{host}:{port}/bulk.json"
+    provider.bulk_requests = server.bulk_requests
+    yield provider
+    server.shutdown()
+    server.server_close()
+
+
+def test_uncached_cities_are_fetched_in_bulk(bulk_provider):
+    cache.set_cached(bulk_provider.get_cache_key({"city": "Kyiv"}), {"current": {"temp_c": 0}})
+    cities = [{"city": name} for name in ["Lviv", "Kyiv", "Odesa", "Nowhere", "Dnipro"]]
+    metrics = FetchMetrics(len(cities))
+
+    results = bulk_provider.fetch_many(cities, metrics)
+
+    assert sorted(bulk_provider.bulk_requests) == [["Lviv", "Odesa"], ["Nowhere", "Dnipro"]]
+    assert metrics.requests == 2
+    assert [city for city, _, _ in results] == cities
+    assert [data.get("current") for _, (_, data), _ in results] == [
+        {"temp_c": 4},
+        {"temp_c": 0},
+        {"temp_c": 5},
+        None,
+        {"temp_c": 6},
+    ]
+    # Only the answered cities are cached.
+    assert cache.get_cached(bulk_provider.get_cache_key({"city": "Odesa"})) is not None
+    assert cache.get_cached(bulk_provider.get_cache_key({"city": "Nowhere"})) is None
@@ -0,0 +1,58 @@
+import pytest
+import redis
+
+from src import rate_limiter
+from src.rate_limiter import (
+    LocalTokenBucket,
+    RateLimiter,
+    RateLimitTimeout,
+    RedisTokenBucket,
+)
+
+
+def test_local_bucket_allows_a_burst_and_refills(monkeypatch):
+    now = 1000.0
+    monkeypatch.setattr(rate_limiter.time, "monotonic", lambda: now)
+    bucket = LocalTokenBucket(rate=2.0, capacity=3)
+
+    assert [bucket.try_acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.try_acquire() == pytest.approx(0.5)
+
+    now += 1.0
+    assert [bucket.try_acquire() for _ in range(2)] == [0.0, 0.0]
+    assert bucket.try_acquire() > 0
+
+
+def test_redis_bucket_is_shared_by_its_clients():
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    redis_client = fakeredis.FakeRedis(decode_responses=True)
+    bucket = RedisTokenBucket(redis_client, "test", rate=1.0, capacity=2)
+    other_bucket = RedisTokenBucket(redis_client, "test", rate=1.0, capacity=2)
+
+    assert bucket.try_acquire() == 0
+    assert other_bucket.try_acquire() == 0
+    assert 0 < bucket.try_acquire() <= 1.0
+
+
+class UnavailableBucket:
+    def try_acquire(self) -> float:
+        raise redis.ConnectionError("Connection refused.")
+
+
+def test_local_bucket_is_used_while_redis_is_unavailable():
+    fallback = LocalTokenBucket(rate=1.0, capacity=1)
+    limiter = RateLimiter("test", UnavailableBucket(), fallback)
+
+    limiter.acquire()
+
+    assert fallback.tokens < 1
+
+
+def test_acquire_gives_up_after_timeout():
+    bucket = LocalTokenBucket(rate=0.1, capacity=1)
+    limiter = RateLimiter("test", bucket, bucket)
+    limiter.acquire()
+
+    with pytest.raises(RateLimitTimeout):
+        limiter.acquire(timeout=1.0)
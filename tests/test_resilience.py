@@ -0,0 +1,166 @@
+import time
+
+import pytest
+import requests
+
+from src import resilience
+from src.fetcher import FetchMetrics
+from src.rate_limiter import RateLimitTimeout
+from src.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    call_with_retries,
+    parse_retry_after,
+)
+
+
+def make_response(status_code: int, headers=None) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers.update(headers or {})
+    return response
+
+
+@pytest.fixture
+def circuit_breaker(monkeypatch) -> CircuitBreaker:
+    monkeypatch.setattr(resilience.settings, "PROVIDER_MAX_RETRIES", 2)
+    monkeypatch.setattr(resilience.settings, "PROVIDER_BACKOFF_BASE", 0.0)
+    circuit_breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0.0)
+    monkeypatch.setitem(resilience._circuit_breakers, "test", circuit_breaker)
+    return circuit_breaker
+
+
+def test_half_open_trial_failing_with_other_error_reopens_circuit(circuit_breaker):
+    circuit_breaker.record_failure()
+    assert circuit_breaker.opened_at is not None
+
+    def request() -> requests.Response:
+        raise requests.exceptions.ChunkedEncodingError("Connection broken.")
+
+    with pytest.raises(requests.exceptions.ChunkedEncodingError):
+        call_with_retries("test", request)
+    assert circuit_breaker.opened_at is not None
+
+    # The trial is over, so the next call is let through and closes the circuit.
+    assert call_with_retries("test", lambda: make_response(200)).status_code == 200
+    assert circuit_breaker.opened_at is None
+
+
+class StarvedRateLimiter:
+    def __init__(self):
+        self.timeouts = []
+
+    def acquire(self, timeout=None):
+        self.timeouts.append(timeout)
+        raise RateLimitTimeout("No request quota left.")
+
+
+def test_rate_limit_wait_does_not_hold_half_open_trial(circuit_breaker):
+    circuit_breaker.record_failure()
+    rate_limiter = StarvedRateLimiter()
+
+    with pytest.raises(RateLimitTimeout):
+        call_with_retries(
+            "test",
+            lambda: make_response(200),
+            rate_limiter=rate_limiter,
+            metrics=FetchMetrics(deadline=5.0),
+        )
+
+    assert 0 < rate_limiter.timeouts[0] <= 5.0
+    assert circuit_breaker.allow()
+
+
+def test_every_attempt_is_counted(circuit_breaker):
+    circuit_breaker.failure_threshold = 10
+    responses = iter([make_response(500), make_response(503), make_response(200)])
+    metrics = FetchMetrics(cities=1)
+
+    response = call_with_retries("test", lambda: next(responses), metrics=metrics)
+
+    assert response.status_code == 200
+    assert metrics.to_dict() == {"cities": 1, "requests": 3, "requests_per_city": 3.0}
+
+
+def test_circuit_opens_after_threshold_and_closes_after_successful_trial():
+    circuit_breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=0.05)
+
+    circuit_breaker.record_failure()
+    assert circuit_breaker.allow()
+    circuit_breaker.record_failure()
+    assert not circuit_breaker.allow()
+
+    time.sleep(0.06)
+    assert circuit_breaker.allow()
+    # Only one trial is let through while half-open.
+    assert not circuit_breaker.allow()
+
+    circuit_breaker.record_success()
+    assert circuit_breaker.opened_at is None
+    assert circuit_breaker.allow()
+
+
+def test_failed_trial_reopens_circuit():
+    circuit_breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0.05)
+    circuit_breaker.record_failure()
+
+    time.sleep(0.06)
+    assert circuit_breaker.allow()
+    circuit_breaker.record_failure()
+    assert not circuit_breaker.allow()
+
+
+def test_open_circuit_fails_fast(circuit_breaker):
+    circuit_breaker.reset_timeout = 60.0
+    circuit_breaker.record_failure()
+
+    with pytest.raises(CircuitOpenError):
+        call_with_retries("test", lambda: make_response(200))
+
+
+def test_connection_errors_are_retried(circuit_breaker):
+    circuit_breaker.failure_threshold = 10
+    attempts = []
+
+    def request() -> requests.Response:
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise requests.ConnectionError("Connection refused.")
+        return make_response(200)
+
+    assert call_with_retries("test", request).status_code == 200
+    assert len(attempts) == 3
+    assert circuit_breaker.failures == 0
+
+
+def test_last_retryable_response_is_returned(circuit_breaker):
+    circuit_breaker.failure_threshold = 10
+
+    response = call_with_retries("test", lambda: make_response(503))
+
+    assert response.status_code == 503
+    assert circuit_breaker.failures == 3
+
+
+def test_rate_limited_responses_do_not_trip_circuit(circuit_breaker):
+    response = call_with_retries(
+        "test", lambda: make_response(429, {"Retry-After": "0"})
+    )
+
+    assert response.status_code == 429
+    assert circuit_breaker.opened_at is None
+
+
+@pytest.mark.parametrize(
+    "retry_after, expected",
+    [
+        ("2", 2.0),
+        ("-1", 0.0),
+        ("Wed, 21 Oct 2015 07:28:00 GMT", 0.0),
+        ("soon", None),
+        (None, None),
+    ],
+)
+def test_parse_retry_after(retry_after, expected):
+    headers = {"Retry-After": retry_after} if retry_after is not None else {}
+    assert parse_retry_after(make_response(429, headers)) == expected
@@ -0,0 +1,43 @@
+import pytest
+
+from src import result_segments
+from src.result_segments import (
+    UnknownRegionError,
+    get_task_file_path,
+    get_task_result_url,
+    read_task_region_result,
+    write_json,
+)
+
+
+@pytest.fixture(autouse=True)
+def weather_data_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(result_segments.settings, "WEATHER_DATA_DIR", tmp_path)
+    return tmp_path
+
+
+def test_write_json_leaves_no_temporary_file(weather_data_dir):
+    file_path = get_task_file_path("Europe", "task")
+    write_json(file_path, [{"city": "Kyiv"}])
+    write_json(file_path, [{"city": "Lviv"}])
+
+    assert read_task_region_result("task", "Europe") == [{"city": "Lviv"}]
+    assert [path.name for path in file_path.parent.iterdir()] == [file_path.name]
+
+
+def test_write_json_removes_temporary_file_on_error(weather_data_dir):
+    file_path = get_task_file_path("Europe", "task")
+    with pytest.raises(TypeError):
+        write_json(file_path, {"city": object()})
+
+    assert list(file_path.parent.iterdir()) == []
+
+
+@pytest.mark.parametrize("region", ["../..", "Europe/../..", "Atlantis"])
+def test_unknown_region_is_rejected(region):
+    with pytest.raises(UnknownRegionError):
+        get_task_file_path(region, "task")
+
+
+def test_task_result_url_is_quoted():
+    assert get_task_result_url("task", "North America") == "/tasks/task/results/North%20America"
@@ -0,0 +1,97 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.api.service import InvalidCursorError, read_region_results
+from src.database.crud import add_weather_results
+from src.database.models import RESULT_TIME_FORMAT
+
+CITIES = ["Kyiv", "London", "Paris", "Lviv", "Berlin"]
+STARTED_AT = datetime(2025, 2, 23, 16, 0)
+
+
+@pytest.fixture
+def results(database):
+    async def add_results() -> None:
+        for task in range(3):
+            time = (STARTED_AT + timedelta(hours=task)).strftime(RESULT_TIME_FORMAT)
+            await add_weather_results(
+                f"task-{task}",
+                {
+                    # Two results of Kyiv share the time of the task.
+                    "Europe": [
+                        {"city": city, "temp": task, "description": "", "time": time}
+                        for city in [*CITIES, "Kyiv"]
+                    ],
+                    "Asia": [{"city": "Tokyo", "temp": task, "time": time}],
+                },
+            )
+
+    asyncio.run(add_results())
+
+
+def read_all_pages(limit, **filters):
+    pages = []
+    cursor = None
+    while True:
+        data, cursor = asyncio.run(
+            read_region_results("Europe", cursor=cursor, limit=limit, **filters)
+        )
+        pages.append(data)
+        if cursor is None:
+            return pages
+
+
+def merge_pages(pages):
+    merged = {}
+    for page in pages:
+        for city, city_results in (page or {}).items():
+            merged.setdefault(city, []).extend(city_results)
+    return merged
+
+
+@pytest.mark.parametrize("limit", [1, 2, 5, 18, 100])
+def test_pages_add_up_to_all_results(results, limit):
+    all_results, cursor = asyncio.run(read_region_results("Europe"))
+    assert cursor is None
+    assert sum(map(len, all_results.values())) == 18
+
+    pages = read_all_pages(limit)
+
+    assert all(sum(map(len, page.values())) <= limit for page in pages)
+    assert merge_pages(pages) == all_results
+
+
+@pytest.mark.parametrize("limit", [1, 2, 5])
+def test_latest_pages_have_the_latest_result_of_every_city(results, limit):
+    pages = read_all_pages(limit, latest=True)
+
+    latest = merge_pages(pages)
+    assert sorted(latest) == sorted(CITIES)
+    assert all(
+        city_results == [{"temp": 2, "description": "", "time": "2025-02-23 18:00:00"}]
+        for city_results in latest.values()
+    )
+
+
+def test_filters_apply_to_pages(results):
+    pages = read_all_pages(1, city="Kyiv", since=STARTED_AT + timedelta(hours=1))
+
+    assert [result["temp"] for result in merge_pages(pages)["Kyiv"]] == [1, 1, 2, 2]
+
+
+def test_missing_region_has_no_results(results):
+    assert asyncio.run(read_region_results("Oceania", limit=10)) == (None, None)
+
+
+@pytest.mark.parametrize("cursor", ["not a cursor", "bnVsbA==", "eyJpZCI6IDF9", "e30="])
+def test_invalid_cursor_is_rejected(results, cursor):
+    with pytest.raises(InvalidCursorError):
+        asyncio.run(read_region_results("Europe", cursor=cursor, limit=2))
+
+
+@pytest.mark.parametrize("cursor", ["e30=", "eyJjaXR5IjogMX0="])
+def test_invalid_latest_cursor_is_rejected(results, cursor):
+    with pytest.raises(InvalidCursorError):
+        asyncio.run(read_region_results("Europe", latest=True, cursor=cursor, limit=2))
@@ -0,0 +1,92 @@
+import threading
+import time
+
+import pytest
+
+from src.single_flight import RedisLock, SingleFlight
+
+
+def test_concurrent_calls_for_one_key_share_one_call():
+    single_flight = SingleFlight()
+    calls = []
+    started = threading.Event()
+
+    def fetch():
+        calls.append(1)
+        started.set()
+        time.sleep(0.1)
+        return len(calls)
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(single_flight.do("kyiv", fetch)))
+        for _ in range(5)
+    ]
+    threads[0].start()
+    started.wait()
+    for thread in threads[1:]:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert calls == [1]
+    assert results == [1] * 5
+    # The key is released once the call is over.
+    assert single_flight.do("kyiv", fetch) == 2
+
+
+def test_waiting_callers_get_the_error_of_the_call():
+    single_flight = SingleFlight()
+    started = threading.Event()
+    errors = []
+
+    def fetch():
+        started.set()
+        time.sleep(0.1)
+        raise ValueError("upstream")
+
+    def call():
+        try:
+            single_flight.do("kyiv", fetch)
+        except ValueError as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=call) for _ in range(3)]
+    threads[0].start()
+    started.wait()
+    for thread in threads[1:]:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == ["upstream"] * 3
+
+
+@pytest.fixture
+def redis_client():
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    return fakeredis.FakeRedis(decode_responses=True)
+
+
+def test_redis_lock_is_exclusive(redis_client):
+    lock = RedisLock(redis_client, "kyiv", timeout=10.0)
+    other_lock = RedisLock(redis_client, "kyiv", timeout=10.0)
+
+    assert lock.acquire()
+    assert not other_lock.acquire()
+    lock.release()
+    assert other_lock.acquire()
+
+
+def test_redis_lock_does_not_release_a_lock_taken_over(redis_client):
+    lock = RedisLock(redis_client, "kyiv", timeout=10.0)
+    other_lock = RedisLock(redis_client, "kyiv", timeout=10.0)
+    assert lock.acquire()
+
+    # The lock expired and was taken by another worker.
+    redis_client.delete(lock.key)
+    assert other_lock.acquire()
+    lock.release()
+
+    assert redis_client.get(lock.key) == other_lock.token
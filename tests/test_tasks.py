@@ -0,0 +1,112 @@
+import asyncio
+
+import pytest
+from celery.canvas import _chain, _chord
+
+from src import tasks
+from src.api.weather_api import get_task_status
+from src.database import crud
+
+CITIES = [{"city": f"City{i}", "city_ascii": f"City{i}", "region": "Europe"} for i in range(5)]
+
+
+@pytest.fixture
+def redis_client(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    redis_client = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(tasks, "get_redis_client", lambda: redis_client)
+    return redis_client
+
+
+@pytest.fixture
+def events(monkeypatch):
+    events = []
+    monkeypatch.setattr(
+        tasks, "publish_task_event", lambda task_id, event: events.append((task_id, event))
+    )
+    return events
+
+
+@pytest.fixture
+def submit(monkeypatch):
+    # The workflow is returned instead of being sent to the broker.
+    monkeypatch.setattr(_chain, "apply_async", lambda self, *args, **kwargs: self)
+    monkeypatch.setattr(_chord, "apply_async", lambda self, *args, **kwargs: self)
+    monkeypatch.setattr(tasks.settings, "TASK_FAN_OUT", True)
+    monkeypatch.setattr(tasks.settings, "TASK_CHUNK_SIZE", 2)
+
+
+def test_large_city_lists_are_fanned_out_in_chunks(submit, redis_client):
+    workflow = tasks.fetch_data_for_cities("open_weather", CITIES, task_id="task")
+
+    assert isinstance(workflow, _chord)
+    assert [subtask.args[0] for subtask in workflow.tasks] == [
+        CITIES[0:2],
+        CITIES[2:4],
+        CITIES[4:5],
+    ]
+    assert all(subtask.kwargs["progress_id"] == "task" for subtask in workflow.tasks)
+    merge, save = workflow.body.tasks
+    assert merge.task == tasks.merge_region_city_temp_maps.name
+    assert save.task == tasks.save_task_results.name
+    assert tasks.get_task_progress("task") == {"completed": 0, "total": 3}
+
+
+def test_small_city_lists_are_fetched_by_one_task(submit, redis_client):
+    workflow = tasks.fetch_data_for_cities("open_weather", CITIES[:2], task_id="task")
+
+    assert isinstance(workflow, _chain)
+    fetch, save = workflow.tasks
+    assert fetch.args[0] == CITIES[:2]
+    assert save.task == tasks.save_task_results.name
+    assert tasks.get_task_progress("task") is None
+
+
+def test_completed_chunks_are_counted_and_published(redis_client, events):
+    tasks.init_task_progress("task", 3)
+    tasks.increment_task_progress("task")
+    tasks.increment_task_progress("task")
+    tasks.increment_task_progress(None)
+
+    assert tasks.get_task_progress("task") == {"completed": 2, "total": 3}
+    assert [event["progress"] for _, event in events] == [
+        {"completed": 1, "total": 3},
+        {"completed": 2, "total": 3},
+    ]
+    assert redis_client.ttl(tasks.get_task_progress_key("task")) > 0
+
+
+def test_chunk_maps_are_merged_by_region():
+    merged = tasks.merge_region_city_temp_maps(
+        [
+            {"Europe": [{"city": "Kyiv"}]},
+            {"Asia": [{"city": "Tokyo"}], "Europe": [{"city": "Lviv"}]},
+            {},
+        ]
+    )
+
+    assert merged == {
+        "Europe": [{"city": "Kyiv"}, {"city": "Lviv"}],
+        "Asia": [{"city": "Tokyo"}],
+    }
+
+
+def test_saved_task_keeps_its_metrics_apart_from_its_regions(
+    database, monkeypatch, tmp_path, events
+):
+    monkeypatch.setattr(tasks.settings, "WEATHER_DATA_DIR", tmp_path)
+    metrics = {"cities": 2, "requests": 3, "requests_per_city": 1.5}
+    monkeypatch.setattr(tasks, "get_task_metrics", lambda task_id: metrics)
+    asyncio.run(crud.create_task("task", {"status": "running", "results": None}))
+
+    tasks.save_task_results(
+        {"Europe": [{"city": "Kyiv", "temperature": 1.5, "description": "Clear"}]}, "task"
+    )
+
+    task_status = get_task_status(asyncio.run(crud.get_task_by_id("task")))
+    assert task_status == {
+        "status": "complete",
+        "results": {"Europe": tasks.get_task_result_url("task", "Europe")},
+        "metrics": metrics,
+    }
+    assert events == [("task", task_status)]
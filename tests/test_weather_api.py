@@ -0,0 +1,272 @@
+import asyncio
+import json
+import threading
+import time
+from typing import Callable, Dict, List
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.api import weather_api
+from src.api import service
+from src.database import crud
+from src.database.models import CityAlias
+from src.main import app
+from src.task_events import TaskEventBroker
+
+
+@pytest.fixture
+def fetched_cities(monkeypatch, cities) -> List[List[Dict]]:
+    """
+    The cities every POST /weather started a task for, no task is actually started.
+    """
+    monkeypatch.setattr(weather_api.settings, "CITY_RESOLUTION_CACHE_ENABLED", False)
+    started = []
+    monkeypatch.setattr(
+        weather_api,
+        "fetch_data_for_cities",
+        lambda source, cities, secondary_source=None, task_id=None: started.append(cities),
+    )
+    return started
+
+
+@pytest.fixture
+def aliases(database, cities) -> None:
+    async def add_aliases() -> None:
+        async with database() as session:
+            session.add_all(
+                [
+                    CityAlias(city_id=2, alias="Big Apple", alias_lower="big apple"),
+                    CityAlias(city_id=9, alias="Краків", alias_lower="краків"),
+                ]
+            )
+            await session.commit()
+
+    asyncio.run(add_aliases())
+
+
+@pytest.fixture
+def client(fetched_cities) -> TestClient:
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def task_progress(monkeypatch) -> Dict:
+    """
+    The progress of the running tasks, as the workers would report it.
+    """
+    progress = {}
+    monkeypatch.setattr(weather_api, "get_task_progress", lambda task_id: progress.get(task_id))
+    monkeypatch.setattr(weather_api, "get_task_metrics", lambda task_id: None)
+    return progress
+
+
+def request_weather(client: TestClient, cities: List) -> List[str]:
+    response = client.post("/weather", params={"source": "open_weather"}, json=cities)
+    assert response.status_code == 200, response.json()
+    return response.json()
+
+
+def test_cities_are_resolved_once_and_returned_in_order(client, fetched_cities, monkeypatch):
+    fuzzy_lookups = []
+    find_the_most_similar_cities = weather_api.find_the_most_similar_cities
+
+    async def counting_find_the_most_similar_cities(city_name, *args):
+        fuzzy_lookups.append(city_name)
+        return await find_the_most_similar_cities(city_name, *args)
+
+    monkeypatch.setattr(
+        weather_api, "find_the_most_similar_cities", counting_find_the_most_similar_cities
+    )
+
+    request_weather(client, ["Londn", "Kyiv", "Londn", "Atlantis", "Kyiv", "Londn"])
+
+    assert [city["city"] for city in fetched_cities[0]] == [
+        "London",
+        "Kyiv",
+        "London",
+        "Kyiv",
+        "London",
+    ]
+    assert sorted(fuzzy_lookups) == ["Atlantis", "Londn"]
+
+
+def test_fuzzy_lookups_are_bounded(client, fetched_cities, monkeypatch):
+    monkeypatch.setattr(weather_api.settings, "CITY_RESOLUTION_CONCURRENCY", 2)
+    in_flight = 0
+    max_in_flight = 0
+
+    async def slow_find_the_most_similar_cities(city_name, *args):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.02)
+        in_flight -= 1
+        return None
+
+    monkeypatch.setattr(
+        weather_api, "find_the_most_similar_cities", slow_find_the_most_similar_cities
+    )
+
+    request_weather(client, ["Aaa", "Bbb", "Ccc", "Ddd", "Eee", "Fff"])
+
+    assert max_in_flight == 2
+    assert fetched_cities == [[]]
+
+
+def test_unchanged_task_status_is_not_modified(client, task_progress):
+    asyncio.run(crud.create_task("task", {"status": "running", "results": None}))
+    task_progress["task"] = {"completed": 1, "total": 2}
+
+    response = client.get("/tasks/task")
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+
+    for if_none_match in [etag, f"W/{etag}", f'"other", {etag}', "*"]:
+        response = client.get("/tasks/task", headers={"If-None-Match": if_none_match})
+        assert response.status_code == 304
+        assert response.headers["ETag"] == etag
+
+    task_progress["task"] = {"completed": 2, "total": 2}
+    response = client.get("/tasks/task", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.json()["progress"] == {"completed": 2, "total": 2}
+    # Polling is a pure read.
+    assert asyncio.run(crud.get_task_by_id("task")).status == "running"
+
+
+def test_unknown_task_is_not_found(client):
+    assert client.get("/tasks/unknown").status_code == 404
+
+
+class SignallingTaskEventBroker(TaskEventBroker):
+    def __init__(self):
+        super().__init__()
+        self.subscribed = threading.Event()
+
+    async def subscribe(self, task_id: str) -> asyncio.Queue:
+        queue = await super().subscribe(task_id)
+        self.subscribed.set()
+        return queue
+
+
+@pytest.fixture
+def task_events(monkeypatch) -> SignallingTaskEventBroker:
+    broker = SignallingTaskEventBroker()
+    monkeypatch.setattr(weather_api, "get_task_event_broker", lambda: broker)
+    return broker
+
+
+def stream_task_events(
+    client: TestClient, broker: SignallingTaskEventBroker, on_subscribed: Callable[[], None]
+) -> str:
+    """
+    Returns the whole event stream of the task, `on_subscribed` is called from another thread
+    once the stream is waiting for events (the test client buffers the response).
+    """
+
+    def run():
+        broker.subscribed.wait()
+        on_subscribed()
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    response = client.get("/tasks/task/events")
+    thread.join()
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    return response.text
+
+
+def parse_events(text: str) -> List[Dict]:
+    return [
+        json.loads(line.removeprefix("data: "))
+        for line in text.splitlines()
+        if line.startswith("data: ")
+    ]
+
+
+def test_task_events_are_streamed_until_complete(client, task_progress, task_events):
+    asyncio.run(crud.create_task("task", {"status": "running", "results": None}))
+    progress = {"completed": 1, "total": 2}
+
+    def publish():
+        task_events.publish("task", {"status": "running", "results": None, "progress": progress})
+        task_events.publish("task", {"status": "complete", "results": {}})
+
+    text = stream_task_events(client, task_events, publish)
+
+    assert parse_events(text) == [
+        {"status": "running", "results": None},
+        {"status": "running", "results": None, "progress": progress},
+        {"status": "complete", "results": {}},
+    ]
+    assert "event: complete" in text
+
+
+def test_missed_final_event_is_found_on_keep_alive(
+    client, task_progress, task_events, monkeypatch
+):
+    monkeypatch.setattr(weather_api.settings, "TASK_EVENTS_KEEPALIVE_INTERVAL", 0.05)
+    asyncio.run(crud.create_task("task", {"status": "running", "results": None}))
+
+    def fail():
+        time.sleep(0.2)
+        asyncio.run(crud.update_task("task", {"status": "failed", "results": None}))
+
+    text = stream_task_events(client, task_events, fail)
+
+    assert ": keep-alive" in text
+    assert parse_events(text) == [
+        {"status": "running", "results": None},
+        {"status": "failed", "results": None},
+    ]
+
+
+def test_finished_task_streams_a_single_event(client, task_progress, task_events):
+    asyncio.run(crud.create_task("task", {"status": "failed", "results": None}))
+
+    text = stream_task_events(client, task_events, lambda: None)
+
+    assert parse_events(text) == [{"status": "failed", "results": None}]
+
+
+@pytest.mark.parametrize("params", [{"cursor": "e30="}, {"cursor": "e30=", "latest": True}])
+def test_cursor_without_position_is_a_bad_request(client, params):
+    assert client.get("/results/Europe", params=params).status_code == 400
+
+
+def test_region_results_are_streamed_as_ndjson(client, monkeypatch):
+    monkeypatch.setattr(service.settings, "RESULTS_STREAM_BATCH_SIZE", 2)
+    region_data = [
+        {"city": city, "temp": temp, "description": "", "time": f"2025-02-23 1{temp}:00:00"}
+        for temp, city in enumerate(["Kyiv", "Lviv", "Kyiv", "Odesa", "Kyiv"])
+    ]
+    asyncio.run(crud.add_weather_results("task", {"Europe": region_data}))
+
+    response = client.get("/results/Europe", params={"format": "ndjson"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert [json.loads(line) for line in response.text.splitlines()] == region_data
+
+    response = client.get("/results/Europe", params={"format": "ndjson", "latest": True})
+    assert sorted(json.loads(line)["temp"] for line in response.text.splitlines()) == [1, 3, 4]
+
+
+def test_empty_region_is_not_streamed(client):
+    assert client.get("/results/Europe", params={"format": "ndjson"}).status_code == 404
+
+
+def test_cities_are_resolved_by_their_aliases(aliases, client, fetched_cities, monkeypatch):
+    async def no_find_the_most_similar_cities(city_name, *args):
+        raise AssertionError(f"{city_name} was matched fuzzily.")
+
+    monkeypatch.setattr(
+        weather_api, "find_the_most_similar_cities", no_find_the_most_similar_cities
+    )
+
+    request_weather(client, ["big apple", "Краків"])
+
+    assert [city["city"] for city in fetched_cities[0]] == ["New York", "Kraków"]